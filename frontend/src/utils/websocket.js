@@ -32,6 +32,8 @@ export class WebSocketClient {
         this.listeners = new Map();
         this.subscriptions = new Set();
         this.dashboardId = null;
+        // Metric names by frame index (assigned per session by the server)
+        this._metricNames = [];
 
         // Performance: Batch metric updates to reduce re-renders
         this._metricUpdateBuffer = {};
@@ -70,6 +72,25 @@ export class WebSocketClient {
         }, this._metricUpdateDebounceMs);
     }
 
+    /**
+     * Decode a metrics frame ({t, u: [index, value, ...]}) into
+     * {metric: {metric, value, timestamp}}
+     * @private
+     */
+    _handleMetricFrame(frame) {
+        const updates = {};
+        const pairs = frame?.u || [];
+        for (let i = 0; i + 1 < pairs.length; i += 2) {
+            const metric = this._metricNames[pairs[i]];
+            if (metric !== undefined) {
+                updates[metric] = { metric, value: pairs[i + 1], timestamp: frame.t };
+            }
+        }
+        if (Object.keys(updates).length > 0) {
+            this._handleMetricUpdate(updates);
+        }
+    }
+
     /**
      * Connect to WebSocket server
      *
@@ -232,6 +253,9 @@ export class WebSocketClient {
             this.reconnectAttempts = 0;
             this._emitStateChange();
 
+            // Frame indices are per session
+            this._metricNames = [];
+
             // Re-subscribe to previous subscriptions
             if (this.subscriptions.size > 0 || this.dashboardId) {
                 this.socket.emit('subscribe', {
@@ -280,11 +304,22 @@ export class WebSocketClient {
             this._handleMetricUpdate(data);
         });
 
+        this.socket.on('metrics', (frame, ack) => {
+            this._handleMetricFrame(frame);
+            // The server sends the next frame after the acknowledgement
+            if (typeof ack === 'function') {
+                ack();
+            }
+        });
+
         this.socket.on('dashboard_update', (data) => {
             this._emit('dashboard_update', data);
         });
 
         this.socket.on('subscribed', (data) => {
+            Object.entries(data?.index || {}).forEach(([metric, index]) => {
+                this._metricNames[index] = metric;
+            });
             this._emit('subscribed', data);
         });
 
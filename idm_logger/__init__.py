@@ -1 +1,11 @@
 # SPDX-License-Identifier: MIT
+import os
+
+# WEB_ASYNC_MODE=gevent serves the web UI and websocket connections on
+# greenlets instead of one OS thread per connection. The standard library
+# has to be patched before any other module is imported, so this is done
+# here and not in web.py (see INSTALL.md, "Many websocket clients")
+if os.environ.get("WEB_ASYNC_MODE", "").lower() == "gevent":
+    from gevent import monkey
+
+    monkey.patch_all()
@@ -4,6 +4,7 @@ import time
 import logging
 import uuid
 from typing import Dict, Any
+from .config import config
 from .db import db
 from .notifications import notification_manager
 
@@ -61,11 +62,27 @@ class AlertManager:
             db.delete_alert(alert_id)
             self.alerts = [a for a in self.alerts if a["id"] != alert_id]
 
-    def check_alerts(self, current_data: Dict[str, Any]):
+    def check_alerts(
+        self,
+        current_data: Dict[str, Any],
+        device: str | None = None,
+        changed: set | None = None,
+    ):
         """
         Check all alerts against current data.
         Should be called periodically (e.g. every loop or every minute).
+
+        Args:
+            current_data: Sensor values of one heat pump
+            device: Name of the heat pump the data belongs to (multi-device
+                setups), available as {device} in alert messages.
+            changed: Sensors that changed since the previous cycle. With
+                alerts.only_changed, threshold alerts on other sensors are
+                not re-evaluated until the next full refresh.
         """
+        if not config.get("alerts.only_changed", False):
+            changed = None
+
         with self.lock:
             now = time.time()
             triggered_alerts_ids = []
@@ -101,6 +118,8 @@ class AlertManager:
 
                         if sensor not in current_data:
                             continue
+                        if changed is not None and sensor not in changed:
+                            continue
 
                         current_val = current_data[sensor]
                         trigger_value = current_val
@@ -127,7 +146,7 @@ class AlertManager:
                                 should_trigger = val_s != threshold_str
 
                     if should_trigger:
-                        self._trigger_alert(alert, trigger_value)
+                        self._trigger_alert(alert, trigger_value, device)
 
                         # Update last_triggered in memory and batch update for db
                         # Optimization: Batch DB updates to prevent N+1 write performance issue
@@ -140,15 +159,16 @@ class AlertManager:
             if triggered_alerts_ids:
                 db.update_alerts_last_triggered(triggered_alerts_ids, now)
 
-    def _trigger_alert(self, alert, value):
+    def _trigger_alert(self, alert, value, device=None):
         logger.info(f"Triggering alert: {alert['name']}")
 
         message_template = alert.get("message", "")
 
         # Replace placeholders
-        # Supported: {value}, {sensor}, {name}, {time}
+        # Supported: {value}, {sensor}, {name}, {time}, {device}
         msg = message_template.replace("{name}", alert["name"])
         msg = msg.replace("{time}", time.strftime("%H:%M:%S"))
+        msg = msg.replace("{device}", device or "")
 
         if value is not None:
             msg = msg.replace("{value}", str(value))
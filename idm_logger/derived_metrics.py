@@ -0,0 +1,262 @@
+# SPDX-License-Identifier: MIT
+"""
+Derived metrics computed from every Modbus snapshot.
+
+Definitions live in ``derived_metrics`` in the config and use the expression
+syntax of the dashboards (``ExpressionParser``): single uppercase letters
+refer to sensors mapped in ``inputs``::
+
+    derived_metrics:
+      - name: cop
+        expression: "A/B"
+        inputs: {A: power_current, B: power_current_draw}
+      - name: energy_consumed
+        expression: "A"
+        inputs: {A: power_current_draw}
+        operator: integral      # kW -> kWh
+        unit: h
+
+Optional stateful operators are applied to the expression result:
+
+- ``rate``: change per ``unit`` (s, m, h, d) between two snapshots
+- ``integral``: trapezoidal integration over time, divided by ``unit``.
+  Segments longer than ``max_gap`` seconds are skipped. Totals survive
+  restarts (saved to DATA_DIR/derived_metrics_state.json).
+- ``moving_average``: mean over the last ``window`` seconds
+
+Inputs may also name derived metrics defined earlier in the list. Values
+are written by MetricsWriter like sensors (``idm_heatpump_<name>``), so
+names of sensors (of any heating circuit or zone) cannot be used.
+"""
+
+import functools
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import deque
+
+import numpy as np
+
+from .config import DATA_DIR, config
+from .expression_parser import compile_expression
+from .sensor_addresses import (
+    BINARY_SENSOR_ADDRESSES,
+    COMMON_SENSORS,
+    ZONE_OFFSETS,
+    HeatingCircuit,
+    heating_circuit_sensors,
+    zone_sensors,
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = os.path.join(DATA_DIR, "derived_metrics_state.json")
+# Min seconds between writes of the integral totals
+STATE_SAVE_INTERVAL = 300
+
+OPERATORS = ("rate", "integral", "moving_average")
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]{0,63}$")
+
+
+@functools.cache
+def _sensor_names() -> frozenset:
+    """Names a snapshot may contain: all sensors, circuits and zones."""
+    sensors = list(COMMON_SENSORS) + list(BINARY_SENSOR_ADDRESSES.values())
+    for circuit in HeatingCircuit:
+        sensors += heating_circuit_sensors(circuit)
+    for zone in range(len(ZONE_OFFSETS)):
+        sensors += zone_sensors(zone)
+    names = {sensor.name for sensor in sensors}
+    # Enum and flag sensors also provide their text as <name>_str
+    return frozenset(names | {f"{name}_str" for name in names})
+
+
+class DerivedMetric:
+    """One validated definition with its state per device."""
+
+    def __init__(self, entry: dict):
+        self.name = entry.get("name", "")
+        if not _NAME_PATTERN.match(str(self.name)):
+            raise ValueError(f"invalid name '{self.name}'")
+        if self.name in _sensor_names():
+            raise ValueError(f"name '{self.name}' is used by a sensor")
+        self.compiled = compile_expression(str(entry.get("expression", "")))
+        self.inputs = dict(entry.get("inputs") or {})
+        missing = self.compiled.labels - self.inputs.keys()
+        if missing:
+            raise ValueError(f"no input for {', '.join(sorted(missing))}")
+        self.operator = entry.get("operator")
+        if self.operator is not None and self.operator not in OPERATORS:
+            raise ValueError(f"unknown operator '{self.operator}'")
+        unit = entry.get("unit", "h" if self.operator == "integral" else "s")
+        if unit not in UNITS:
+            raise ValueError(f"unknown unit '{unit}'")
+        self.unit_seconds = UNITS[unit]
+        self.window = float(entry.get("window", 900))
+        self.max_gap = float(entry.get("max_gap", 900))
+        # device -> operator state
+        self.state = {}
+
+    def compute(self, values: dict, device, timestamp: float) -> float | None:
+        env = {}
+        for label in self.compiled.labels:
+            value = values.get(self.inputs[label])
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                return None
+            env[label] = np.float64(value)
+        value = float(self.compiled(env))
+        if not math.isfinite(value):
+            return None
+
+        if self.operator == "rate":
+            previous = self.state.get(device)
+            self.state[device] = (timestamp, value)
+            if previous is None or timestamp <= previous[0]:
+                return None
+            return (value - previous[1]) / (timestamp - previous[0]) * self.unit_seconds
+
+        if self.operator == "integral":
+            total, last_ts, last_value = self.state.get(device, (0.0, None, None))
+            if last_ts is not None and 0 < timestamp - last_ts <= self.max_gap:
+                area = (value + last_value) / 2 * (timestamp - last_ts)
+                total += area / self.unit_seconds
+            if last_ts is None or timestamp > last_ts:
+                self.state[device] = (total, timestamp, value)
+            return total
+
+        if self.operator == "moving_average":
+            window = self.state.setdefault(device, deque())
+            window.append((timestamp, value))
+            while window and window[0][0] <= timestamp - self.window:
+                window.popleft()
+            return sum(v for _, v in window) / len(window)
+
+        return value
+
+
+class DerivedMetrics:
+    """Registry of the configured derived metrics."""
+
+    def __init__(self, state_file: str = STATE_FILE):
+        self.state_file = state_file
+        self.metrics: list[DerivedMetric] = []
+        self._definitions = None
+        self._last_save = time.monotonic()
+        self._dirty = False
+        self.errors = 0
+        self.refresh()
+        self._load_state()
+
+    def refresh(self):
+        """Reload the definitions if the config changed (state is kept)."""
+        definitions = config.get("derived_metrics", None) or []
+        if definitions == self._definitions:
+            return
+        self._definitions = definitions
+
+        previous = {metric.name: metric for metric in self.metrics}
+        metrics = []
+        for entry in definitions:
+            try:
+                metric = DerivedMetric(entry)
+            except (ValueError, TypeError, AttributeError) as e:
+                logger.error(f"Invalid derived metric {entry!r}: {e}")
+                continue
+            old = previous.get(metric.name)
+            if old and old.operator == metric.operator:
+                metric.state = old.state
+            metrics.append(metric)
+        self.metrics = metrics
+        if metrics:
+            logger.info(f"Derived metrics: {', '.join(m.name for m in metrics)}")
+
+    def evaluate(self, data: dict, device=None, timestamp: float | None = None) -> dict:
+        """
+        Derived values for a snapshot.
+
+        Args:
+            data: Sensor values
+            device: Heat pump name (operator state is kept per device)
+            timestamp: Read time (unix seconds)
+
+        Returns:
+            {name: value} of the metrics that could be computed
+        """
+        self.refresh()
+        if not self.metrics:
+            return {}
+        if timestamp is None:
+            timestamp = time.time()
+
+        values = dict(data)
+        derived = {}
+        for metric in self.metrics:
+            try:
+                value = metric.compute(values, device, timestamp)
+            except Exception:
+                self.errors += 1
+                logger.debug(f"Derived metric {metric.name} failed", exc_info=True)
+                continue
+            if value is not None:
+                derived[metric.name] = value
+                values[metric.name] = value
+            if metric.operator == "integral":
+                self._dirty = True
+
+        if self._dirty and time.monotonic() - self._last_save >= STATE_SAVE_INTERVAL:
+            self.save_state()
+        return derived
+
+    def _load_state(self):
+        try:
+            with open(self.state_file) as f:
+                saved = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load derived metrics state: {e}")
+            return
+        for metric in self.metrics:
+            if metric.operator != "integral":
+                continue
+            for entry in saved.get(metric.name, []):
+                metric.state[entry.get("device")] = (
+                    float(entry["total"]),
+                    float(entry["timestamp"]),
+                    float(entry["value"]),
+                )
+
+    def save_state(self):
+        """Write the integral totals (atomic replace)."""
+        state = {
+            metric.name: [
+                {"device": device, "total": s[0], "timestamp": s[1], "value": s[2]}
+                for device, s in metric.state.items()
+            ]
+            for metric in self.metrics
+            if metric.operator == "integral"
+        }
+        if not state:
+            return
+        self._last_save = time.monotonic()
+        self._dirty = False
+        try:
+            tmp = f"{self.state_file}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.state_file)
+        except OSError as e:
+            logger.warning(f"Failed to save derived metrics state: {e}")
+
+    def get_stats(self) -> dict:
+        return {
+            "metrics": [m.name for m in self.metrics],
+            "errors": self.errors,
+        }
@@ -0,0 +1,179 @@
+# SPDX-License-Identifier: MIT
+"""
+Multi heat pump support.
+
+A single collector can poll several IDM heat pumps (e.g. a cascade). Devices
+are configured as a list under ``idm.devices``::
+
+    idm:
+      devices:
+        - name: wp1
+          host: 192.168.1.10
+          circuits: ["A", "B"]
+        - name: wp2
+          host: 192.168.1.11
+          port: 502
+
+Without a device list the legacy ``idm.host``/``idm.port`` settings describe
+a single unnamed device, and data is written exactly as before (no device tag).
+"""
+
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .config import config
+from .modbus import ModbusClient
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for concurrently polled devices
+MAX_PARALLEL_POLLS = config.get("idm.max_parallel_polls", 8)
+
+_DEVICE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+
+
+@dataclass
+class DeviceConfig:
+    """Connection and sensor settings for one heat pump."""
+
+    name: str | None
+    host: str
+    port: int = 502
+    circuits: list = field(default_factory=list)
+    zones: list = field(default_factory=list)
+    firmware_version: str = ""
+
+
+def load_device_configs() -> list[DeviceConfig]:
+    """
+    Returns the configured devices.
+
+    Invalid entries (missing host, duplicate or malformed names) are skipped
+    with a warning. Falls back to the single legacy device if no valid
+    entries remain.
+    """
+    devices = []
+    names = set()
+    for idx, entry in enumerate(config.get("idm.devices", []) or []):
+        if not isinstance(entry, dict) or not entry.get("host"):
+            logger.warning(f"Ignoring device entry {idx}: host is required")
+            continue
+
+        name = str(entry.get("name") or f"device{idx + 1}")
+        if not _DEVICE_NAME_PATTERN.match(name) or name in names:
+            logger.warning(f"Ignoring device entry {idx}: invalid or duplicate name")
+            continue
+        names.add(name)
+
+        devices.append(
+            DeviceConfig(
+                name=name,
+                host=entry["host"],
+                port=int(entry.get("port", 502)),
+                circuits=entry.get("circuits", config.get("idm.circuits", [])),
+                zones=entry.get("zones", config.get("idm.zones", [])),
+                firmware_version=entry.get(
+                    "firmware_version", config.get("idm.firmware_version", "")
+                ),
+            )
+        )
+
+    if devices:
+        return devices
+
+    return [
+        DeviceConfig(
+            name=None,
+            host=config.get("idm.host"),
+            port=config.get("idm.port", 502),
+            circuits=config.get("idm.circuits", []),
+            zones=config.get("idm.zones", []),
+            firmware_version=config.get("idm.firmware_version", ""),
+        )
+    ]
+
+
+class DevicePool:
+    """Polls all configured heat pumps concurrently on a shared thread pool."""
+
+    def __init__(self, device_configs: list[DeviceConfig]):
+        self.clients: list[ModbusClient] = []
+        for dev in device_configs:
+            try:
+                client = ModbusClient(
+                    host=dev.host,
+                    port=dev.port,
+                    name=dev.name,
+                    circuits=dev.circuits,
+                    zones=dev.zones,
+                    firmware_version=dev.firmware_version,
+                )
+                self.clients.append(client)
+                label = f"'{dev.name}' " if dev.name else ""
+                logger.info(
+                    f"Modbus client {label}initialized for {dev.host}:{dev.port}"
+                )
+            except Exception:
+                logger.exception(f"Failed to initialize Modbus client for {dev.host}")
+
+        self._executor = None
+        if len(self.clients) > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, min(len(self.clients), MAX_PARALLEL_POLLS)),
+                thread_name_prefix="modbus-poll",
+            )
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> ModbusClient | None:
+        """The first device. Control, scheduling and the web UI use it."""
+        return self.clients[0] if self.clients else None
+
+    @property
+    def poll_interval(self) -> float | None:
+        """Shortest poll interval of all devices (None without devices)."""
+        if not self.clients:
+            return None
+        return min(client.poll_interval for client in self.clients)
+
+    def get(self, name) -> ModbusClient | None:
+        for client in self.clients:
+            if client.name == name:
+                return client
+        return None
+
+    def _poll(self, client: ModbusClient) -> dict:
+        try:
+            return client.read_sensors()
+        except Exception:
+            label = client.name or client.host
+            logger.exception(f"Failed to read sensors from {label}")
+            return {}
+
+    def read_all(self) -> list[tuple[ModbusClient, dict]]:
+        """
+        Reads all devices and returns (client, data) pairs in device order.
+
+        With a single device the read runs on the calling thread.
+        """
+        if not self._executor:
+            return [(client, self._poll(client)) for client in self.clients]
+
+        with self._lock:
+            futures = [
+                (client, self._executor.submit(self._poll, client))
+                for client in self.clients
+            ]
+            return [(client, future.result()) for client, future in futures]
+
+    def close(self):
+        for client in self.clients:
+            try:
+                client.close()
+            except Exception as e:
+                logger.debug(f"Error closing Modbus client: {e}", exc_info=True)
+        if self._executor:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,178 @@
+# SPDX-License-Identifier: MIT
+"""
+Downsampling of range query results for charts.
+
+A chart cannot show more points than it is wide in pixels, so
+``/api/metrics/query_range`` can reduce every series to ``max_points``
+before returning it:
+
+- ``lttb``: Largest-Triangle-Three-Buckets keeps the point of each bucket
+  that spans the largest triangle with the point kept before and the mean
+  of the next bucket. Preserves the visual shape of the line.
+- ``minmax``: the minimum and maximum of each time bucket (two per pixel
+  column), so no peak is lost.
+
+Both keep the first and the last point and return the original
+``[timestamp, "value"]`` pairs of VictoriaMetrics.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points kept by LTTB (sorted, ``threshold`` of them)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.intp)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[1 : n - 1], edges[:-1] - 1) / counts
+    mean_y = np.add.reduceat(y[1 : n - 1], edges[:-1] - 1) / counts
+    # Third point of the triangle: mean of the next bucket, the last point
+    # for the last bucket
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs(
+            (ax - next_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (next_y[i] - ay)
+        )
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the min and max per time bucket (sorted, <= threshold)."""
+    n = len(x)
+    buckets = (threshold - 2) // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+
+    duration = x[-1] - x[0]
+    if duration <= 0:
+        bucket = np.arange(n) * buckets // n
+    else:
+        bucket = np.minimum(
+            ((x - x[0]) * (buckets / duration)).astype(np.intp), buckets - 1
+        )
+    # Sorted by bucket, then value: the first and last of each bucket run
+    # are its min and max
+    order = np.lexsort((y, bucket))
+    runs = bucket[order]
+    starts = np.flatnonzero(np.r_[True, runs[1:] != runs[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends])))
+
+
+METHODS: dict[str, Callable] = {"lttb": lttb_indices, "minmax": minmax_indices}
+
+
+def downsample_values(values: list, max_points: int, method: str = "lttb") -> list:
+    """
+    Reduce ``[[timestamp, "value"], ...]`` to at most about max_points.
+
+    Non-numeric values (NaN, Inf) are dropped from series that are reduced.
+    """
+    if len(values) <= max_points:
+        return values
+    n = len(values)
+    x = np.fromiter((float(p[0]) for p in values), dtype=np.float64, count=n)
+    y = np.fromiter((float(p[1]) for p in values), dtype=np.float64, count=n)
+    positions = np.flatnonzero(np.isfinite(y))
+    if len(positions) == n:
+        indices = METHODS[method](x, y, max_points)
+    else:
+        indices = positions[METHODS[method](x[positions], y[positions], max_points)]
+    return [values[i] for i in indices]
+
+
+def downsample_result(result: dict, max_points: int, method: str = "lttb") -> dict:
+    """
+    Downsample every series of a ``/api/v1/query_range`` response.
+
+    Returns:
+        New response; responses other than successful matrices unchanged
+    """
+    data = result.get("data") or {}
+    if result.get("status") != "success" or data.get("resultType") != "matrix":
+        return result
+    series = [
+        {**s, "values": downsample_values(s.get("values", []), max_points, method)}
+        for s in data.get("result", [])
+    ]
+    return {**result, "data": {**data, "result": series}}
+
+
+class DownsampleCache:
+    """
+    LRU of downsampled results, keyed by (query, range, step, width, method).
+
+    Results of ranges ending within ``min_age`` seconds of now may still
+    change and are only kept for ``recent_ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        recent_ttl: float = 30.0,
+        min_age: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.recent_ttl = recent_ttl
+        self.min_age = min_age
+        self._clock = clock
+        # key -> (result, expiry or None)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > self._clock()):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, result: dict, end: float):
+        now = self._clock()
+        expiry = None if end < now - self.min_age else now + self.recent_ttl
+        with self._lock:
+            self._entries[key] = (result, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
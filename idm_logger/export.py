@@ -0,0 +1,351 @@
+# SPDX-License-Identifier: MIT
+"""
+Streaming data export from VictoriaMetrics.
+
+Raw samples are read from ``/api/v1/export`` in time windows, one stream per
+metric, and merged by timestamp with a k-way merge. Only the current and the
+prefetched window of every metric are held in memory, whatever the length
+of the exported range. Window fetches of all metrics share a bounded thread
+pool.
+
+With a step, every step t of the range gets the last sample in
+(t - step, t], like the value of a range query at t; without one, all raw
+samples are exported.
+"""
+
+import contextlib
+import csv
+import heapq
+import io
+import json
+import logging
+import math
+import os
+import tempfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from . import vm_client
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+# Series exported with metrics="all"
+EXPORT_SELECTOR = '{__name__=~"idm_heatpump.*|idm_anomaly.*"}'
+# Bytes per chunk sent to the client
+CHUNK_BYTES = 64 * 1024
+# Rows per sheet in Excel files
+EXCEL_MAX_ROWS = 1048575
+
+_executor = None
+
+
+def get_executor() -> Executor:
+    """Thread pool shared by all exports (bounds the load on VictoriaMetrics)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.get("export.max_workers", 4),
+            thread_name_prefix="export",
+        )
+    return _executor
+
+
+def parse_timestamp(value) -> float:
+    """Unix seconds from a number or an ISO 8601 string."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return datetime.fromisoformat(str(value)).timestamp()
+
+
+def list_metrics(base_url: str, start: float, end: float) -> list[str]:
+    """Names of the metrics with samples in the range."""
+    response = vm_client.get(
+        f"{base_url}/api/v1/label/__name__/values",
+        params={"match[]": EXPORT_SELECTOR, "start": start, "end": end},
+        timeout=10,
+    )
+    response.raise_for_status()
+    return sorted(response.json().get("data", []))
+
+
+def series_name(metric: dict) -> str:
+    """Metric name, with the other labels if there are any."""
+    name = metric.get("__name__", "")
+    labels = ",".join(
+        f'{k}="{v}"' for k, v in sorted(metric.items()) if k != "__name__"
+    )
+    return f"{name}{{{labels}}}" if labels else name
+
+
+def fetch_window(
+    base_url: str, metric: str, start: float, end: float, step: float | None
+) -> list[tuple]:
+    """
+    Samples of one metric in [start, end).
+
+    With a step, the steps t in [start, end) (multiples of step) with the
+    last sample in (t - step, t].
+
+    Returns:
+        Sorted [(timestamp, series name, value)]
+    """
+    if step:
+        lower, upper = start - step + 0.001, end - step
+    else:
+        lower, upper = start, end - 0.001
+    # The export end is inclusive
+    params = {
+        "match[]": f'{{__name__="{metric}"}}',
+        "start": f"{lower:.3f}",
+        "end": f"{upper:.3f}",
+    }
+    # (timestamp, series) -> (raw timestamp, value)
+    rows = {}
+    with vm_client.get_session().get(
+        f"{base_url}/api/v1/export", params=params, stream=True, timeout=60
+    ) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            block = json.loads(line)
+            name = series_name(block.get("metric", {}))
+            for ts, value in zip(block.get("timestamps", []), block.get("values", [])):
+                if value is None:
+                    continue
+                raw = ts / 1000
+                # With a step: the last sample at or before each step
+                key = (math.ceil(raw / step) * step if step else raw, name)
+                previous = rows.get(key)
+                if previous is None or previous[0] <= raw:
+                    rows[key] = (raw, float(value))
+    return sorted((ts, name, value) for (ts, name), (_, value) in rows.items())
+
+
+def _metric_stream(
+    executor: Executor, base_url: str, metric: str, windows: list, step
+) -> Iterator[tuple]:
+    # The first window is requested right away, so all metrics are fetched
+    # concurrently before the merge starts
+    future = executor.submit(fetch_window, base_url, metric, *windows[0], step)
+
+    def stream():
+        nonlocal future
+        for i in range(len(windows)):
+            try:
+                rows = future.result()
+            except (requests.RequestException, ValueError) as e:
+                logger.warning(f"Failed to export {metric} {windows[i]}: {e}")
+                rows = []
+            if i + 1 < len(windows):
+                future = executor.submit(
+                    fetch_window, base_url, metric, *windows[i + 1], step
+                )
+            yield from rows
+
+    return stream()
+
+
+def stream_samples(
+    base_url: str,
+    metrics: list[str],
+    start: float,
+    end: float,
+    step: float | None = None,
+    window: float | None = None,
+    executor: Executor | None = None,
+) -> Iterator[tuple]:
+    """
+    Samples of all metrics in [start, end], ordered by timestamp and series.
+
+    Args:
+        step: Export the last sample at or before every step seconds
+            (None: raw samples)
+        window: Seconds fetched per request and metric (multiple of step)
+
+    Yields:
+        (timestamp, series name, value)
+    """
+    executor = executor or get_executor()
+    if window is None:
+        window = config.get("export.window_hours", 6) * 3600
+    if step:
+        window = max(1, round(window / step)) * step
+        start = math.floor(start / step) * step
+        # Up to and including the last step at or before end
+        end = math.floor(end / step) * step + step
+    else:
+        end += 0.001  # inclusive
+
+    windows = []
+    lower = start
+    while lower < end:
+        upper = min(end, (math.floor(lower / window) + 1) * window)
+        windows.append((lower, upper))
+        lower = upper
+    if not windows:
+        return iter(())
+
+    streams = [
+        _metric_stream(executor, base_url, metric, windows, step) for metric in metrics
+    ]
+    return heapq.merge(*streams)
+
+
+class RunningStats:
+    """Count, min, max and mean of a series in constant memory."""
+
+    __slots__ = ("count", "max", "min", "sum")
+
+    def __init__(self):
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+        }
+
+
+def _format_time(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def csv_chunks(rows: Iterable[tuple]) -> Iterator[str]:
+    """CSV (timestamp, metric, value) in chunks of about CHUNK_BYTES."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(["timestamp", "metric", "value"])
+    for ts, name, value in rows:
+        writer.writerow([_format_time(ts), name, value])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def jsonl_chunks(rows: Iterable[tuple], info: dict) -> Iterator[str]:
+    """
+    JSON lines: export info, one line per sample, statistics per metric.
+    """
+    stats = {}
+    parts = [json.dumps({"export_info": info}), "\n"]
+    size = 0
+    for ts, name, value in rows:
+        line = json.dumps(
+            {
+                "timestamp": datetime.fromtimestamp(ts).isoformat(),
+                "metric": name,
+                "value": value,
+            }
+        )
+        parts.append(line)
+        parts.append("\n")
+        size += len(line)
+        entry = stats.get(name)
+        if entry is None:
+            entry = stats[name] = RunningStats()
+        entry.add(value)
+        if size >= CHUNK_BYTES:
+            yield "".join(parts)
+            parts.clear()
+            size = 0
+    parts.append(
+        json.dumps({"statistics": {name: s.to_dict() for name, s in stats.items()}})
+    )
+    parts.append("\n")
+    yield "".join(parts)
+
+
+def _sheet_title(name: str, used: set) -> str:
+    # Max 31 chars, no special chars, unique
+    base = "".join(c if c.isalnum() or c == "_" else "_" for c in name)[:31]
+    title, n = base, 1
+    while title.lower() in used:
+        suffix = f"_{n}"
+        title = base[: 31 - len(suffix)] + suffix
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def write_excel(rows: Iterable[tuple]) -> tuple[str, int]:
+    """
+    Excel workbook with all data, one sheet per metric and a summary.
+
+    Written with a write-only workbook to a temporary file; the caller
+    streams and deletes it.
+
+    Returns:
+        (path, number of samples)
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    all_data = workbook.create_sheet("All Data")
+    all_data.append(["timestamp", "metric", "value"])
+    sheets = {}
+    stats = {}
+    used = {"all data", "summary"}
+    total = 0
+    for ts, name, value in rows:
+        timestamp = datetime.fromtimestamp(ts)
+        if total < EXCEL_MAX_ROWS:
+            all_data.append([timestamp, name, value])
+        elif total == EXCEL_MAX_ROWS:
+            logger.warning("Excel export truncated: too many rows for one sheet")
+        total += 1
+        sheet = sheets.get(name)
+        if sheet is None:
+            sheet = sheets[name] = workbook.create_sheet(_sheet_title(name, used))
+            sheet.append(["timestamp", "value"])
+            stats[name] = RunningStats()
+        entry = stats[name]
+        if entry.count < EXCEL_MAX_ROWS:
+            sheet.append([timestamp, value])
+        entry.add(value)
+
+    summary = workbook.create_sheet("Summary")
+    summary.append(["Metric", "Count", "Min", "Max", "Mean"])
+    for name, entry in stats.items():
+        s = entry.to_dict()
+        summary.append([name, s["count"], s["min"], s["max"], s["mean"]])
+
+    fd, path = tempfile.mkstemp(prefix="idm_export_", suffix=".xlsx")
+    os.close(fd)
+    try:
+        workbook.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, total
+
+
+def file_chunks(path: str) -> Iterator[bytes]:
+    """Stream a file in chunks of CHUNK_BYTES."""
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_BYTES):
+            yield chunk
+
+
+def remove_file(path: str):
+    """Delete a temporary export file (if it still exists)."""
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
@@ -12,24 +12,66 @@ Supports operations like:
 """
 
 import ast
+import functools
 import re
-from typing import List, Dict, Union
+from collections.abc import Callable
 import operator
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 # Pre-compiled regex patterns for performance
 _VALID_CHARS_PATTERN = re.compile(r"^[\w\s+\-*/().,]+$")
-_FUNCTION_PATTERN = re.compile(r"(\w+)\s*\(")
-_INVALID_OPS_PATTERN = re.compile(r"([^\w\s])([^\w\s])")
 _QUERY_LABEL_PATTERN = re.compile(r"\b([A-Z])\b")
 
 
+def _avg(*args):
+    return functools.reduce(operator.add, args) / len(args)
+
+
+def _sum(*args):
+    return functools.reduce(operator.add, args)
+
+
+def _min(*args):
+    # np.minimum propagates NaN: a missing value gives no result
+    return functools.reduce(np.minimum, args)
+
+
+def _max(*args):
+    return functools.reduce(np.maximum, args)
+
+
+def _abs(*args):
+    if len(args) != 1:
+        raise ValueError("abs() takes exactly one argument")
+    return np.abs(args[0])
+
+
+class CompiledExpression:
+    """
+    Expression compiled into a tree of closures over NumPy arrays.
+
+    Call it with {label: values array}; all arrays share one timestamp index.
+    """
+
+    def __init__(self, expression: str, plan: Callable, labels: frozenset):
+        self.expression = expression
+        self.labels = labels
+        self._plan = plan
+
+    def __call__(self, arrays: dict[str, np.ndarray]):
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            return self._plan(arrays)
+
+
 class SafeExpressionEvaluator(ast.NodeVisitor):
     """
-    Safe AST-based expression evaluator.
+    Safe AST-based expression compiler.
     Only allows basic arithmetic operations and whitelisted functions.
+    Query labels (single uppercase letters) become array lookups.
     """
 
     # Allowed binary operators
@@ -47,18 +89,25 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
     }
 
     # Allowed function names
-    ALLOWED_FUNCTIONS = {"min", "max", "abs"}
+    ALLOWED_FUNCTIONS = {
+        "avg": _avg,
+        "sum": _sum,
+        "min": _min,
+        "max": _max,
+        "abs": _abs,
+    }
 
     def __init__(self):
-        self.result = None
+        self.labels = set()
 
-    def evaluate(self, expr: str) -> float:
-        """Safely evaluate a mathematical expression."""
+    def compile(self, expr: str) -> CompiledExpression:
+        """Compile a mathematical expression."""
         try:
-            tree = ast.parse(expr, mode="eval")
-            return self.visit(tree.body)
+            tree = ast.parse(expr.strip(), mode="eval")
+            plan = self.visit(tree.body)
         except (SyntaxError, ValueError, TypeError) as e:
             raise ValueError(f"Invalid expression: {e}")
+        return CompiledExpression(expr, plan, frozenset(self.labels))
 
     def visit_BinOp(self, node):
         left = self.visit(node.left)
@@ -66,45 +115,72 @@ class SafeExpressionEvaluator(ast.NodeVisitor):
         op_type = type(node.op)
         if op_type not in self.BINARY_OPS:
             raise ValueError(f"Unsupported operator: {op_type.__name__}")
-        return self.BINARY_OPS[op_type](left, right)
+        op = self.BINARY_OPS[op_type]
+        return lambda env: op(left(env), right(env))
 
     def visit_UnaryOp(self, node):
         operand = self.visit(node.operand)
         op_type = type(node.op)
         if op_type not in self.UNARY_OPS:
             raise ValueError(f"Unsupported unary operator: {op_type.__name__}")
-        return self.UNARY_OPS[op_type](operand)
-
-    def visit_Num(self, node):
-        # Python 3.7 compatibility
-        return node.n
+        op = self.UNARY_OPS[op_type]
+        return lambda env: op(operand(env))
 
     def visit_Constant(self, node):
-        # Python 3.8+ numbers
-        if isinstance(node.value, (int, float)):
-            return node.value
+        if isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            value = float(node.value)
+            return lambda env: value
         raise ValueError(f"Unsupported constant type: {type(node.value)}")
 
+    def visit_Name(self, node):
+        if not _QUERY_LABEL_PATTERN.fullmatch(node.id):
+            raise ValueError(f"Unknown name: {node.id}")
+        label = node.id
+        self.labels.add(label)
+        return lambda env: env[label]
+
     def visit_Call(self, node):
         if not isinstance(node.func, ast.Name):
             raise ValueError("Only simple function calls allowed")
         func_name = node.func.id
         if func_name not in self.ALLOWED_FUNCTIONS:
             raise ValueError(f"Function not allowed: {func_name}")
+        if node.keywords or not node.args:
+            raise ValueError(f"Invalid arguments for {func_name}()")
+        func = self.ALLOWED_FUNCTIONS[func_name]
         args = [self.visit(arg) for arg in node.args]
-        if func_name == "min":
-            return min(args)
-        elif func_name == "max":
-            return max(args)
-        elif func_name == "abs":
-            if len(args) != 1:
-                raise ValueError("abs() takes exactly one argument")
-            return abs(args[0])
+        if func_name == "abs" and len(args) != 1:
+            raise ValueError("abs() takes exactly one argument")
+        return lambda env: func(*(arg(env) for arg in args))
 
     def generic_visit(self, node):
         raise ValueError(f"Unsupported expression element: {type(node).__name__}")
 
 
+@functools.lru_cache(maxsize=256)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Compile an expression once; compiled plans are cached."""
+    return SafeExpressionEvaluator().compile(expression)
+
+
+def _to_arrays(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """[(timestamp, value), ...] -> (timestamps, float values with NaN gaps)."""
+    timestamps = np.asarray([point[0] for point in values])
+    if timestamps.dtype == object or timestamps.dtype.kind not in "iuf":
+        timestamps = timestamps.astype(float)
+    raw = [point[1] for point in values]
+    try:
+        data = np.asarray(raw, dtype=float)
+    except (TypeError, ValueError):
+        data = np.full(len(raw), np.nan)
+        for i, value in enumerate(raw):
+            try:
+                data[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+    return timestamps, data
+
+
 class ExpressionParser:
     """Safe expression parser for mathematical operations on query results."""
 
@@ -126,9 +202,9 @@ class ExpressionParser:
 
     def __init__(self):
         """Initialize the expression parser."""
-        self.query_results: Dict[str, List[tuple]] = {}
+        self.query_results: dict[str, list[tuple]] = {}
 
-    def set_query_results(self, query_results: Dict[str, List[tuple]]):
+    def set_query_results(self, query_results: dict[str, list[tuple]]):
         """
         Set query results for expression evaluation.
 
@@ -163,21 +239,16 @@ class ExpressionParser:
         if not _VALID_CHARS_PATTERN.match(expression):
             return False, "Expression contains invalid characters"
 
-        # Check for valid function names
-        functions = _FUNCTION_PATTERN.findall(expression)
-        for func in functions:
-            if func not in self.FUNCTIONS and func not in self.OPERATORS:
-                # Might be a query reference, which is fine
-                pass
-
-        # Check for invalid operators
-        invalid_ops = _INVALID_OPS_PATTERN.findall(expression)
-        if invalid_ops:
-            return False, f"Invalid operator sequence: {invalid_ops[0]}"
+        # Compiling checks syntax, operators and function names; the plan is
+        # cached for the evaluation
+        try:
+            compile_expression(expression)
+        except ValueError as e:
+            return False, str(e)
 
         return True, ""
 
-    def parse_expression(self, expression: str) -> List[str]:
+    def parse_expression(self, expression: str) -> list[str]:
         """
         Parse an expression and extract query references.
 
@@ -191,9 +262,7 @@ class ExpressionParser:
         queries = _QUERY_LABEL_PATTERN.findall(expression)
         return list(set(queries))
 
-    def evaluate_expression(
-        self, expression: str, timestamp: int
-    ) -> Union[float, None]:
+    def evaluate_expression(self, expression: str, timestamp: int) -> float | None:
         """
         Evaluate an expression at a specific timestamp.
 
@@ -204,101 +273,77 @@ class ExpressionParser:
         Returns:
             The calculated value or None if any query has no value at this timestamp
         """
-        # First, get the value for each query at this timestamp
-        query_values = {}
-        for query_label in self.parse_expression(expression):
-            if query_label not in self.query_results:
-                return None
-
-            # Find the value for this timestamp
-            values = self.query_results[query_label]
-            value = None
-            for ts, val in values:
-                if ts == timestamp:
-                    value = val
-                    break
-
-            if value is None:
-                return None
-
-            query_values[query_label] = value
-
-        # Now evaluate the expression with these values
         try:
-            return self._evaluate_with_values(expression, query_values)
-        except Exception as e:
+            compiled = compile_expression(expression)
+        except ValueError as e:
             logger.error(f"Error evaluating expression '{expression}': {e}")
             return None
 
-    def _evaluate_with_values(self, expression: str, values: Dict[str, float]) -> float:
-        """
-        Evaluate an expression with given query values.
-
-        Args:
-            expression: The expression to evaluate
-            values: Dictionary mapping query labels to their values
+        values = {}
+        for label in compiled.labels:
+            value = next(
+                (v for ts, v in self.query_results.get(label, ()) if ts == timestamp),
+                None,
+            )
+            if value is None:
+                return None
+            values[label] = _to_arrays([(timestamp, value)])[1]
 
-        Returns:
-            The calculated value
-        """
-        # Replace query references with their values
-        expr = expression
-        for query_label, value in values.items():
-            # Use word boundaries to avoid partial replacements
-            expr = re.sub(r"\b" + query_label + r"\b", str(value), expr)
-
-        # Replace functions with Python equivalents
-        # avg(A,B,C) -> (A+B+C)/3
-        for func_name in ["avg", "sum", "min", "max"]:
-            pattern = rf"{func_name}\s*\(([^)]+)\)"
-            matches = re.findall(pattern, expr)
-            for match in matches:
-                args = [arg.strip() for arg in match.split(",")]
-                if func_name == "avg":
-                    replacement = f"({'+'.join(args)})/{len(args)}"
-                elif func_name == "sum":
-                    replacement = f"({'+'.join(args)})"
-                elif func_name == "min":
-                    replacement = f"min({','.join(args)})"
-                elif func_name == "max":
-                    replacement = f"max({','.join(args)})"
-                expr = re.sub(
-                    rf"{func_name}\s*\({re.escape(match)}\)", replacement, expr
-                )
-
-        # Safe evaluation using AST-based evaluator (no eval!)
-        expr = expr.strip()
-        try:
-            evaluator = SafeExpressionEvaluator()
-            result = evaluator.evaluate(expr)
-            return float(result)
-        except Exception as e:
-            raise ValueError(f"Failed to evaluate expression '{expr}': {e}")
+        result = float(np.asarray(compiled(values), dtype=float).reshape(-1)[0])
+        return result if np.isfinite(result) else None
 
-    def evaluate_expression_series(self, expression: str) -> List[tuple]:
+    def evaluate_expression_series(
+        self, expression: str, query_results: dict[str, list] | None = None
+    ) -> list[tuple]:
         """
         Evaluate an expression over all timestamps.
 
+        The referenced series are aligned on the union of their timestamps
+        (missing values are NaN) and the compiled expression is evaluated
+        over the whole arrays at once. Timestamps where a referenced query
+        has no value, or the result is not finite (e.g. division by zero),
+        are left out.
+
         Args:
             expression: The expression to evaluate
+            query_results: Query results to use instead of the ones set with
+                set_query_results()
 
         Returns:
             List of (timestamp, value) tuples
         """
-        # Get all unique timestamps from all queries
-        all_timestamps = set()
-        for values in self.query_results.values():
-            for ts, _ in values:
-                all_timestamps.add(ts)
-
-        # Evaluate expression at each timestamp
-        results = []
-        for timestamp in sorted(all_timestamps):
-            value = self.evaluate_expression(expression, timestamp)
-            if value is not None:
-                results.append((timestamp, value))
+        if query_results is None:
+            query_results = self.query_results
 
-        return results
+        try:
+            compiled = compile_expression(expression)
+        except ValueError as e:
+            logger.error(f"Error evaluating expression '{expression}': {e}")
+            return []
+        if not compiled.labels <= query_results.keys():
+            return []
+
+        series = {
+            label: _to_arrays(values)
+            for label, values in query_results.items()
+            if label in compiled.labels or not compiled.labels
+        }
+        if not series:
+            return []
+
+        # Outer join on the timestamps
+        index = functools.reduce(np.union1d, (ts for ts, _ in series.values()))
+        arrays = {}
+        for label, (timestamps, values) in series.items():
+            # First value wins for duplicate timestamps
+            timestamps, first = np.unique(timestamps, return_index=True)
+            aligned = np.full(len(index), np.nan)
+            aligned[np.searchsorted(index, timestamps)] = values[first]
+            arrays[label] = aligned
+
+        result = np.broadcast_to(np.asarray(compiled(arrays), dtype=float), index.shape)
+        valid = np.isfinite(result)
+        return list(zip(index[valid].tolist(), result[valid].tolist()))
 
     def get_expression_help(self) -> str:
         """Get help text for expressions."""
@@ -328,8 +373,9 @@ Examples:
 
 Note:
   - Query labels are uppercase letters: A, B, C, etc.
-  - Division by zero returns None
-  - Invalid expressions return None
+  - Timestamps where a query has no value or the result is undefined
+    (e.g. division by zero) are left out
+  - Invalid expressions return no values
   - Use parentheses to control operation order
 """
 
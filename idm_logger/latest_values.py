@@ -0,0 +1,142 @@
+# SPDX-License-Identifier: MIT
+"""
+In-memory latest value of every metric.
+
+Answers ``/api/metrics/current`` without a VictoriaMetrics query. Holds the
+newest Modbus snapshot and derived values of every heat pump, named like
+the series in VictoriaMetrics (``idm_heatpump_<sensor>``), merged with the
+anomaly values the ML service pushes to ``/api/internal/ml_alert``. Values
+of the primary heat pump are keyed by metric name, those of further devices
+by ``name{device="..."}``. Non-finite values are left out, as they are not
+valid JSON. The merged response is built once per update and reused until
+the next one.
+"""
+
+import json
+import math
+import threading
+import time
+
+# Pushed anomaly values are only merged into the response while they are
+# younger than this (seconds), stale ones are left to VictoriaMetrics
+ANOMALY_MAX_AGE = 3600
+
+
+class LatestValueStore:
+    """Latest value per metric name: {name: {"value", "timestamp"}}."""
+
+    def __init__(self, anomaly_max_age: float = ANOMALY_MAX_AGE):
+        self.anomaly_max_age = anomaly_max_age
+        # (device, source) -> {key: entry}
+        self._snapshots: dict = {}
+        self._anomaly: dict = {}
+        self._response: str | None = None
+        self._lock = threading.Lock()
+
+        self.snapshots = 0
+        self.anomaly_updates = 0
+
+    def update_snapshot(
+        self,
+        data: dict,
+        timestamp: float | None = None,
+        measurement: str = "idm_heatpump",
+        device: str | None = None,
+        primary: bool = True,
+        source: str = "modbus",
+    ):
+        """
+        Replace the values of a device with a new snapshot.
+
+        Args:
+            data: Sensor values; only finite numeric ones are kept (booleans
+                as 0/1, ``*_str`` fields skipped), like in VictoriaMetrics
+            timestamp: Read time (unix seconds, defaults to now)
+            device: Heat pump name (multi-device setups)
+            primary: Key the values by metric name alone; otherwise the
+                device label is appended
+            source: Snapshots of different sources (Modbus, derived metrics)
+                of a device replace each other independently
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        label = "" if primary or not device else f'{{device="{device}"}}'
+        values = {}
+        for key, value in data.items():
+            if key.endswith("_str") or not isinstance(value, (int, float)):
+                continue
+            if not math.isfinite(value):
+                continue
+            entry = {"value": float(value), "timestamp": timestamp}
+            if device:
+                entry["device"] = device
+            values[f"{measurement}_{key}{label}"] = entry
+        with self._lock:
+            self._snapshots[(device, source)] = values
+            self._response = None
+            self.snapshots += 1
+
+    def update_anomaly(self, values: dict, timestamp: float | None = None):
+        """
+        Merge anomaly values ({metric name: value}) pushed by the ML service.
+
+        Older values than the ones already stored are ignored.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            for name, value in values.items():
+                value = float(value)
+                if not math.isfinite(value):
+                    continue
+                current = self._anomaly.get(name)
+                if current and current["timestamp"] > timestamp:
+                    continue
+                self._anomaly[name] = {"value": value, "timestamp": timestamp}
+            self._response = None
+            self.anomaly_updates += 1
+
+    @property
+    def has_data(self) -> bool:
+        return bool(self._snapshots)
+
+    def get_json(self) -> str | None:
+        """
+        Serialized ``{name: {"value", "timestamp"}}`` of all metrics.
+
+        Returns:
+            JSON text, or None if no snapshot was stored yet
+        """
+        with self._lock:
+            if not self._snapshots:
+                return None
+            if self._response is None:
+                cutoff = time.time() - self.anomaly_max_age
+                merged = {}
+                for values in self._snapshots.values():
+                    merged.update(values)
+                for name, entry in self._anomaly.items():
+                    if entry["timestamp"] >= cutoff:
+                        merged[name] = entry
+                self._response = json.dumps(merged)
+            return self._response
+
+    def get(self) -> dict | None:
+        response = self.get_json()
+        return None if response is None else json.loads(response)
+
+    def clear(self):
+        with self._lock:
+            self._snapshots.clear()
+            self._anomaly.clear()
+            self._response = None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "metrics": sum(len(v) for v in self._snapshots.values()),
+                "devices": len({device for device, _ in self._snapshots}),
+                "anomaly_metrics": len(self._anomaly),
+                "snapshots": self.snapshots,
+                "anomaly_updates": self.anomaly_updates,
+            }
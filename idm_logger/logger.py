@@ -5,10 +5,18 @@ import threading
 import signal
 import sys
 from .config import config
-from .modbus import ModbusClient
+from .devices import DevicePool, load_device_configs
 from .metrics import MetricsWriter
-from .web import run_web, update_current_data, set_metrics_writer
+from .web import (
+    run_web,
+    update_current_data,
+    update_derived_values,
+    set_metrics_writer,
+)
 from .scheduler import Scheduler
+from .tick_scheduler import TickScheduler
+from .pipeline import Snapshot, SnapshotBus
+from .derived_metrics import DerivedMetrics
 from .log_handler import memory_handler
 from .mqtt import mqtt_publisher
 from .update_manager import (
@@ -62,6 +70,7 @@ def main():
         logger.error(f"Failed to set log level from config: {e}")
 
     # Initialize these as None first
+    devices = None
     modbus = None
     scheduler = None
     metrics = None
@@ -159,11 +168,10 @@ def main():
 
     # Now initialize the backend components
     try:
-        # Modbus Client
-        modbus = ModbusClient(host=config.get("idm.host"), port=config.get("idm.port"))
-        logger.info(
-            f"Modbus client initialized for {config.get('idm.host')}:{config.get('idm.port')}"
-        )
+        # Modbus Clients (one per heat pump, the first one is the primary device
+        # used for control, scheduling and the live view)
+        devices = DevicePool(load_device_configs())
+        modbus = devices.primary
     except Exception as e:
         logger.error(f"Failed to initialize Modbus client: {e}", exc_info=True)
 
@@ -201,71 +209,122 @@ def main():
     else:
         logger.warning("Scheduler not started (Modbus client unavailable)")
 
+    # Aligns cycles to wall-clock boundaries; samples are stamped with the
+    # scheduled tick time
+    ticks = TickScheduler()
+
+    # COP, spreads, energy etc. computed from every snapshot
+    derived = DerivedMetrics()
+
+    # Consumers of the polled data, each on its own thread and queue
+    bus = SnapshotBus()
+    bus.subscribe(
+        "web",
+        lambda s: update_current_data(dict(s.data), s.device, s.changed, s.timestamp),
+    )
+    bus.subscribe(
+        "alerts",
+        lambda s: alert_manager.check_alerts(dict(s.data), s.device, s.changed),
+    )
+    if metrics:
+        bus.subscribe(
+            "metrics",
+            lambda s: metrics.write(dict(s.data), s.device, timestamp=s.timestamp),
+        )
+    if mqtt:
+
+        def publish_mqtt(snapshot):
+            if mqtt.connected:
+                mqtt.publish_data(
+                    dict(snapshot.data), snapshot.device, snapshot.changed
+                )
+
+        bus.subscribe("mqtt", publish_mqtt)
+
     # Update web.py with the actual instances
     if config.get("web.enabled"):
         import idm_logger.web as web_module
 
         web_module.modbus_client_instance = modbus
+        web_module.primary_device = modbus.name if modbus else None
         web_module.scheduler_instance = scheduler
+        web_module.tick_scheduler_instance = ticks
+        web_module.pipeline_instance = bus
 
     logger.info("Entering main loop...")
 
     try:
         while not stop_event.is_set():
-            start_time = time.time()
-
             # Get current settings (can be changed via web UI)
             interval = config.get("logging.interval", 60)
             realtime_mode = config.get("logging.realtime_mode", False)
 
             # In realtime mode, use minimum interval (1 second)
             effective_interval = 1 if realtime_mode else interval
+            # With tiered polling the loop ticks at the fastest tier
+            if modbus:
+                effective_interval = min(effective_interval, devices.poll_interval)
+
+            tick = ticks.wait_for_tick(effective_interval, stop_event)
+            if tick is None:
+                break
+            start_time = time.monotonic()
 
             # Read only if modbus is available
             if modbus:
                 logger.debug("Reading sensors...")
-                data = modbus.read_sensors()
-
-                if data:
-                    # Update Web UI
-                    update_current_data(data)
-
-                    # Check Alerts
-                    alert_manager.check_alerts(data)
-
-                    # Write to Metrics
-                    if metrics:
-                        logger.debug(f"Writing {len(data)} points to Metrics")
-                        metrics.write(data)
-
-                    # Publish to MQTT
-                    if mqtt and mqtt.connected:
-                        logger.debug(f"Publishing {len(data)} points to MQTT")
-                        mqtt.publish_data(data)
-                else:
-                    logger.warning("No data read from Modbus")
+                for client, data in devices.read_all():
+                    device = client.name
+                    # Keys that changed since the previous cycle (consumers
+                    # opt in to only handling those)
+                    changed = client.changed_sensors
+                    if data:
+                        # Web UI, alerts, metrics and MQTT consume the
+                        # snapshot on their own threads
+                        logger.debug(f"Publishing {len(data)} points")
+                        if metrics:
+                            # Missed ticks filled by the catch_up policy
+                            for missed in ticks.backfill_ticks:
+                                metrics.write(data, device, timestamp=missed)
+                        bus.publish(Snapshot.create(data, device, changed, tick))
+                        derived_values = derived.evaluate(data, device, tick)
+                        update_derived_values(derived_values, device, tick)
+                        if metrics and derived_values:
+                            metrics.write(derived_values, device, timestamp=tick)
+                    else:
+                        label = f" ({device})" if device else ""
+                        logger.warning(f"No data read from Modbus{label}")
             else:
                 logger.debug("Modbus client not available, skipping sensor read")
 
-            # Sleep
-            elapsed = time.time() - start_time
+            if metrics:
+                metrics.write(
+                    {
+                        **ticks.get_metrics(),
+                        **bus.get_metrics(),
+                        **metrics.get_metrics(),
+                    },
+                    timestamp=tick,
+                    measurement="idm_logger",
+                )
+
+            elapsed = time.monotonic() - start_time
             if elapsed > effective_interval:
                 logger.warning(
                     f"Loop took {elapsed:.2f}s, which is longer than interval {effective_interval}s"
                 )
 
-            sleep_time = max(0, effective_interval - elapsed)
-            stop_event.wait(sleep_time)
-
     except Exception as e:
         logger.error(f"Main loop error: {e}")
     finally:
+        bus.stop()
+        derived.save_state()
         if scheduler and config.get("web.write_enabled"):
             scheduler.stop()
         if mqtt:
             mqtt.stop()
-        if modbus:
-            modbus.close()
+        if devices:
+            devices.close()
         logger.info("Stopped")
 
 
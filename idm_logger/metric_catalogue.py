@@ -0,0 +1,241 @@
+# SPDX-License-Identifier: MIT
+"""
+Catalogue of the metric names offered by the web UI.
+
+Built from two sources and kept in memory:
+
+- the collector's own sensor definitions: the common sensors, the binary
+  sensors and the configured heating circuits and zones of every device,
+  plus the derived metrics and the anomaly series. Rebuilt when the
+  relevant settings change.
+- the names stored in VictoriaMetrics (label values API), refreshed in the
+  background once they are older than ``ttl`` seconds.
+
+``/api/metrics/available`` lists the stored names, or the defined ones as
+long as VictoriaMetrics has none (fresh install, unreachable), with the
+unit of the sensor where known. Exports of all metrics look up the names
+with samples in the exported range instead (export.list_metrics).
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable
+
+from . import vm_client
+from .config import config
+from .export import EXPORT_SELECTOR
+from .sensor_addresses import (
+    BINARY_SENSOR_ADDRESSES,
+    COMMON_SENSORS,
+    HeatingCircuit,
+    heating_circuit_sensors,
+    zone_sensors,
+)
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENT = "idm_heatpump"
+ANOMALY_METRICS = ("idm_anomaly_score", "idm_anomaly_flag")
+# Seconds before a failed VictoriaMetrics lookup is retried
+RETRY_INTERVAL = 30
+
+# (group, prefix of the sensor name), first match wins
+GROUPS = [
+    ("temperature", "temp_"),
+    ("power", "power_"),
+    ("pressure", "pressure_"),
+    ("energy", "energy_"),
+    ("flow", "flow_"),
+    ("status", "status_"),
+    ("mode", "mode_"),
+    ("control", "control_"),
+    ("state", "state_"),
+]
+
+
+def defined_metrics() -> dict[str, str | None]:
+    """
+    Series the collector writes according to its configuration.
+
+    Returns:
+        {metric name: unit or None}
+    """
+    # Imported here: devices pulls in the Modbus client
+    from .devices import load_device_configs
+
+    sensors = list(COMMON_SENSORS) + list(BINARY_SENSOR_ADDRESSES.values())
+    for device in load_device_configs():
+        for circuit in device.circuits or []:
+            try:
+                sensors.extend(heating_circuit_sensors(HeatingCircuit[circuit.upper()]))
+            except (KeyError, AttributeError):
+                continue
+        for zone in device.zones or []:
+            try:
+                sensors.extend(zone_sensors(int(zone)))
+            except (TypeError, ValueError, IndexError):
+                continue
+
+    metrics = {
+        f"{MEASUREMENT}_{sensor.name}": sensor.unit
+        for sensor in sensors
+        if sensor.read_supported
+    }
+    for entry in config.get("derived_metrics", None) or []:
+        if isinstance(entry, dict) and entry.get("name"):
+            metrics.setdefault(f"{MEASUREMENT}_{entry['name']}", None)
+    for name in ANOMALY_METRICS:
+        metrics[name] = None
+    return metrics
+
+
+def group_metrics(names, units: dict) -> dict:
+    """Metric names grouped by type for the dashboard editor."""
+    grouped = {group: [] for group, _ in GROUPS}
+    grouped["ai"] = []
+    grouped["other"] = []
+    for name in sorted(names):
+        if name.startswith("idm_anomaly_"):
+            grouped["ai"].append({"name": name, "display": name})
+            continue
+        # Remove 'idm_heatpump_' prefix for display
+        display = name.replace(f"{MEASUREMENT}_", "")
+        entry = {"name": name, "display": display}
+        if units.get(name):
+            entry["unit"] = units[name]
+        group = next((g for g, prefix in GROUPS if display.startswith(prefix)), "other")
+        grouped[group].append(entry)
+    return grouped
+
+
+class MetricCatalogue:
+    """Defined and stored metric names with a TTL on the stored ones."""
+
+    def __init__(self, ttl: float = 300, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._signature = None
+        self._defined: dict[str, str | None] = {}
+        # Names in VictoriaMetrics (None: not loaded yet)
+        self._stored: list[str] | None = None
+        self._stored_at = None
+        self._failed_at = None
+        self._refreshing = False
+        self._grouped = None
+        # Bumped when the stored names are dropped; refreshes started
+        # before are discarded
+        self._generation = 0
+
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def _check_config(self, base_url: str):
+        # Settings are plain data, compared by value
+        signature = (
+            base_url,
+            config.get("idm.devices", None),
+            config.get("idm.circuits", None),
+            config.get("idm.zones", None),
+            config.get("derived_metrics", None),
+        )
+        with self._lock:
+            if signature == self._signature:
+                return
+            base_url_changed = self._signature is None or self._signature[0] != base_url
+        defined = defined_metrics()
+        with self._lock:
+            self._signature = signature
+            self._defined = defined
+            self._grouped = None
+            if base_url_changed:
+                self._generation += 1
+                self._stored = None
+                self._stored_at = None
+                self._failed_at = None
+
+    def _fetch_stored(self, base_url: str) -> list[str]:
+        response = vm_client.get(
+            f"{base_url}/api/v1/label/__name__/values",
+            # All time, not just the default last day
+            params={"match[]": EXPORT_SELECTOR, "start": 0},
+            timeout=10,
+        )
+        response.raise_for_status()
+        return sorted(response.json().get("data", []))
+
+    def _refresh(self, base_url: str, generation: int):
+        try:
+            stored = self._fetch_stored(base_url)
+        except Exception:
+            logger.warning(
+                "Failed to load metric names from VictoriaMetrics", exc_info=True
+            )
+            with self._lock:
+                self.refresh_errors += 1
+                if generation == self._generation:
+                    self._failed_at = self._clock()
+                self._refreshing = False
+            return
+        with self._lock:
+            self._refreshing = False
+            if generation != self._generation:
+                return
+            self._stored = stored
+            self._stored_at = self._clock()
+            self._failed_at = None
+            self._grouped = None
+            self.refreshes += 1
+
+    def _ensure_stored(self, base_url: str):
+        """Load the stored names, or refresh them in the background if stale."""
+        now = self._clock()
+        with self._lock:
+            if self._refreshing:
+                return
+            if self._failed_at is not None and now - self._failed_at < RETRY_INTERVAL:
+                return
+            if self._stored is not None and now - self._stored_at < self.ttl:
+                return
+            self._refreshing = True
+            initial = self._stored is None
+            generation = self._generation
+        if initial:
+            self._refresh(base_url, generation)
+        else:
+            threading.Thread(
+                target=self._refresh, args=(base_url, generation), daemon=True
+            ).start()
+
+    def get_grouped(self, base_url: str) -> dict:
+        """Response of /api/metrics/available."""
+        self._check_config(base_url)
+        self._ensure_stored(base_url)
+        with self._lock:
+            if self._grouped is None:
+                names = self._stored or self._defined
+                self._grouped = group_metrics(names, self._defined)
+            return self._grouped
+
+    def invalidate(self):
+        """Drop everything (e.g. after the database was cleared)."""
+        with self._lock:
+            self._generation += 1
+            self._signature = None
+            self._stored = None
+            self._stored_at = None
+            self._failed_at = None
+            self._grouped = None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "defined": len(self._defined),
+                "stored": len(self._stored) if self._stored is not None else None,
+                "age_seconds": round(self._clock() - self._stored_at, 1)
+                if self._stored_at is not None
+                else None,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+            }
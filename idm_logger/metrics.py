@@ -1,155 +1,459 @@
 # SPDX-License-Identifier: MIT
+import gzip
 import logging
 import requests
 import os
-import queue
-import threading
+import re
 import time
-from typing import List, Union, Dict
-from .config import config
+from .config import config, DATA_DIR
+from .metrics_formats import (
+    ENCODERS,
+    FORMATS,
+    PATHS,
+    SNAPPY_AVAILABLE,
+    LineProtocolSerializer,
+    snappy_compress,
+)
+from .metrics_sinks import PYARROW_AVAILABLE, MetricsSink, ParquetSink
+from .metrics_spool import MetricsSpool
 
 logger = logging.getLogger(__name__)
 
+SPOOL_DIR = os.path.join(DATA_DIR, "metrics_spool")
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = config.get("metrics.spool.retry_max_delay", 60.0)
+# Smaller request bodies are sent uncompressed
+GZIP_MIN_BYTES = config.get("metrics.gzip_min_bytes", 1024)
 
-class MetricsWriter:
-    def __init__(self):
-        self.url = os.environ.get(
-            "METRICS_URL",
-            config.get("metrics.url", "http://victoriametrics:8428/write"),
+
+class HttpSink(MetricsSink):
+    """
+    Sends samples to VictoriaMetrics (or any remote-write receiver).
+
+    Batches that cannot be delivered are spooled to disk and replayed once
+    the endpoint is reachable again.
+    """
+
+    type = "http"
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        format: str = "influx",
+        compression: str = "gzip",
+        skip_unchanged: bool = False,
+        refresh_interval: float = 240,
+        spool_directory: str | None = None,
+        spool_segment_mb: float = 4,
+        spool_max_mb: float = 256,
+        spool_fsync_interval: float = 1.0,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        queue_size: int = 1000,
+        adaptive: bool = True,
+        max_batch_size: int | None = None,
+        latency_target: float = 0.5,
+    ):
+        """
+        Args:
+            name: Sink name
+            url: Line protocol write URL (other formats use the endpoints
+                next to it, see PATHS)
+            format: Wire format, see metrics_formats.FORMATS
+            compression: "gzip" or "none" (remote-write is always snappy)
+            skip_unchanged: Leave out unchanged fields (influx only)
+            refresh_interval: Max seconds between complete series
+            spool_directory: Retry spool directory (None disables spooling)
+
+        Batching arguments: see MetricsSink.
+        """
+        super().__init__(
+            name,
+            batch_size,
+            flush_interval,
+            queue_size,
+            adaptive,
+            max_batch_size,
+            latency_target,
         )
+        self.url = url
         self._connected = True  # HTTP is stateless
         self.session = requests.Session()
 
-        # Async queue for metrics to avoid blocking main loop
-        self.queue = queue.Queue(maxsize=1000)
-        self.stop_event = threading.Event()
-        self.worker_thread = threading.Thread(target=self._worker, daemon=True)
-        self.worker_thread.start()
+        if format not in FORMATS:
+            logger.warning(f"Unknown metrics format '{format}', using influx")
+            format = "influx"
+        if format == "remote_write" and not SNAPPY_AVAILABLE:
+            logger.warning(
+                "Remote write needs python-snappy or cramjam, using vm_import instead"
+            )
+            format = "vm_import"
+        self.format = format
+        self.compression = compression
+        self.serializer = LineProtocolSerializer(
+            skip_unchanged=skip_unchanged, refresh_interval=refresh_interval
+        )
+        if self.format == "influx":
+            self._encode = self.serializer.encode
+        else:
+            self._encode = ENCODERS[self.format]
 
-        logger.info(f"MetricsWriter initialized with URL: {self.url} (Async)")
+        # Batches that could not be delivered are spooled to disk and
+        # replayed once VictoriaMetrics is reachable again
+        self.spool = None
+        if spool_directory:
+            try:
+                self.spool = MetricsSpool(
+                    spool_directory,
+                    segment_bytes=int(spool_segment_mb * 1024 * 1024),
+                    max_bytes=int(spool_max_mb * 1024 * 1024),
+                    fsync_interval=spool_fsync_interval,
+                )
+            except OSError as e:
+                logger.error(f"Failed to open metrics spool, spooling disabled: {e}")
+        self._retry_at = 0.0
+        self._retry_delay = RETRY_BASE_DELAY
+        self._replay_started = None
+        self._replay_records = 0
+        self.replay_rate = 0.0
+
+        # Async queue for metrics to avoid blocking main loop
+        self.start()
 
     def is_connected(self) -> bool:
         return self._connected
 
-    def write(self, measurements: dict) -> bool:
-        if not measurements:
-            return True
+    def _endpoint(self, fmt: str) -> str:
+        """URL of the VictoriaMetrics endpoint for a wire format."""
+        # The URL may point at the endpoint of any format (e.g. a remote-write
+        # receiver); the other endpoints are next to it
+        for path in sorted(PATHS.values(), key=len, reverse=True):
+            if self.url.endswith(path):
+                return self.url[: -len(path)] + PATHS[fmt]
+        if fmt == "influx":
+            return self.url
+        return self.url.rstrip("/") + PATHS[fmt]
 
-        try:
-            self.queue.put_nowait(measurements)
-            return True
-        except queue.Full:
-            logger.warning("Metrics queue full, dropping data")
-            return False
+    def _idle(self):
+        self._replay()
 
-    def _worker(self):
-        """Worker thread to process metrics queue with batching."""
-        batch = []
-        last_send = time.time()
-        BATCH_SIZE = 50
-        BATCH_TIMEOUT = 1.0
-
-        while not self.stop_event.is_set():
-            try:
-                # Calculate timeout dynamically
-                now = time.time()
-                if batch:
-                    # If we have items, wait only the remaining time of the 1s window
-                    timeout = max(0, BATCH_TIMEOUT - (now - last_send))
-                else:
-                    # If empty, wait up to 1s (or until an item arrives)
-                    timeout = 1.0
-
-                measurements = self.queue.get(timeout=timeout)
-                batch.append(measurements)
-                self.queue.task_done()
-
-                # If batch is full, send immediately
-                if len(batch) >= BATCH_SIZE:
-                    self._send_data(batch)
-                    batch = []
-                    last_send = time.time()
-
-            except queue.Empty:
-                # Timeout expired (or queue empty for >1s)
-                # If we have data pending, send it now
-                if batch:
-                    self._send_data(batch)
-                    batch = []
-                    last_send = time.time()
-                continue
-            except Exception as e:
-                logger.error(f"Error in metrics worker: {e}")
-                # Try to flush what we have if possible, otherwise drop
-                if batch:
-                    try:
-                        self._send_data(batch)
-                    except Exception:
-                        pass
-                    batch = []
-
-        # Flush remaining items on exit
-        if batch:
-            try:
-                self._send_data(batch)
-            except Exception as e:
-                logger.error(f"Error flushing metrics on exit: {e}")
-
-    def _send_data(self, data: Union[Dict, List[Dict]]) -> bool:
+    def _send_data(self, data: dict | list[dict]) -> bool:
         """Internal method to send data to VictoriaMetrics (executed in worker thread)."""
-        # data can be a single dict (legacy call) or a list of dicts (batch)
+        # data can be a single dict (legacy call) or a list of dicts (batch).
+        # Batch items may also be (dict, device[, timestamp[, measurement]])
+        # tuples.
 
         items = data if isinstance(data, list) else [data]
-        lines = []
-
-        for measurements in items:
-            measurement_name = "idm_heatpump"
-            fields = []
-
-            for key, value in measurements.items():
-                # Skip string representation fields
-                if key.endswith("_str"):
-                    continue
-                # Convert booleans to int
-                if isinstance(value, bool):
-                    value = int(value)
-                # Only write numeric values
-                if isinstance(value, (int, float)):
-                    fields.append(f"{key}={value}")
-
-            if fields:
-                field_str = ",".join(fields)
-                # Timestamp is handled by VictoriaMetrics on ingestion
-                lines.append(f"{measurement_name} {field_str}")
-
-        if not lines:
+        body = self._encode(items)
+        if not body:
+            # Nothing changed (skip_unchanged): delivered without a request
+            return True
+
+        if self.spool is None:
+            result = self._post(body, self.format)
+            if not result:
+                self._lost()
+            return bool(result)
+
+        if self.spool.pending_bytes or time.monotonic() < self._retry_at:
+            # VictoriaMetrics is down or a backlog is being replayed: queue
+            # behind it to keep the order
+            self._spool(body)
+            self._replay()
             return False
 
-        payload = "\n".join(lines)
+        result = self._post(body, self.format)
+        if result is None:
+            self._spool(body)
+            self._backoff()
+        elif not result:
+            self._lost()
+        return bool(result)
+
+    def _lost(self):
+        """A batch will never be delivered: resend unchanged fields too."""
+        self.serializer.reset()
+
+    def _post(self, body: str | bytes, fmt: str) -> bool | None:
+        """
+        Send an encoded batch to VictoriaMetrics.
+
+        Returns:
+            True if delivered, False if rejected (retrying will not help),
+            None if VictoriaMetrics is unreachable or temporarily failing
+        """
+        headers = {}
+        if fmt == "remote_write":
+            body = snappy_compress(body)
+            headers = {
+                "Content-Type": "application/x-protobuf",
+                "Content-Encoding": "snappy",
+                "X-Prometheus-Remote-Write-Version": "0.1.0",
+            }
+        elif self.compression == "gzip" and len(body) >= GZIP_MIN_BYTES:
+            if isinstance(body, str):
+                body = body.encode("utf-8")
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
 
         try:
-            # VictoriaMetrics /write endpoint
-            response = self.session.post(self.url, data=payload, timeout=5)
+            response = self.session.post(
+                self._endpoint(fmt), data=body, headers=headers, timeout=5
+            )
             if response.status_code in (200, 204):
                 return True
             else:
                 logger.error(
                     f"Failed to write metrics: {response.status_code} {response.text}"
                 )
-                return False
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    return False
+                return None
         except Exception as e:
             logger.error(f"Exception writing metrics: {e}")
-            return False
+            return None
+
+    def _spool(self, body: str | bytes):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        try:
+            # Records carry their format, so a backlog survives a format change
+            self.spool.append(self.format.encode() + b"\0" + body)
+        except OSError as e:
+            logger.error(f"Failed to spool metrics, dropping batch: {e}")
+            self._lost()
+
+    def _backoff(self):
+        """Delay the next delivery attempt (exponential backoff)."""
+        self._retry_at = time.monotonic() + self._retry_delay
+        self._retry_delay = min(self._retry_delay * 2, RETRY_MAX_DELAY)
+
+    def _replay(self):
+        """Deliver one chunk of spooled batches, if VictoriaMetrics is back."""
+        if (
+            self.spool is None
+            or not self.spool.pending_bytes
+            or time.monotonic() < self._retry_at
+        ):
+            return
+
+        try:
+            batches, position = self.spool.read()
+        except OSError as e:
+            logger.error(f"Failed to read metrics spool: {e}")
+            self._backoff()
+            return
+
+        result = True
+        for fmt, bodies in self._group_records(batches):
+            # Text formats are newline separated, remote-write requests
+            # can simply be concatenated
+            separator = b"" if fmt == "remote_write" else b"\n"
+            result = self._post(separator.join(bodies), fmt)
+            if not result:
+                break
+        if result is None:
+            self._backoff()
+            return
+
+        if result:
+            self.spool.commit(position, len(batches))
+        else:
+            logger.warning(f"Dropping {len(batches)} spooled metric batches")
+            self.spool.discard(position, len(batches))
+            self._lost()
+        self._retry_delay = RETRY_BASE_DELAY
+
+        now = time.monotonic()
+        if self._replay_started is None:
+            self._replay_started = now
+            self._replay_records = 0
+        self._replay_records += len(batches)
+        self.replay_rate = self._replay_records / max(now - self._replay_started, 1.0)
+        if not self.spool.pending_bytes:
+            logger.info(
+                f"Metrics spool replayed ({self._replay_records} batches, {self.replay_rate:.1f}/s)"
+            )
+            self._replay_started = None
+
+    @staticmethod
+    def _group_records(records: list[bytes]) -> list[tuple]:
+        """Split spool records into runs of the same format: [(fmt, [body])]."""
+        groups = []
+        for record in records:
+            fmt, sep, body = record.partition(b"\0")
+            fmt = fmt.decode("ascii", "replace")
+            if not sep or fmt not in FORMATS:
+                fmt, body = "influx", record
+            if groups and groups[-1][0] == fmt:
+                groups[-1][1].append(body)
+            else:
+                groups.append((fmt, [body]))
+        return groups
 
     def get_status(self) -> dict:
-        return {
-            "connected": self._connected,
-            "type": "VictoriaMetrics",
-            "url": self.url,
-            "queue_size": self.queue.qsize(),
-        }
+        return dict(
+            super().get_status(),
+            connected=self._connected,
+            type="VictoriaMetrics",
+            url=self._endpoint(self.format),
+            format=self.format,
+            serializer=self.serializer.get_stats() if self.format == "influx" else None,
+            compression="snappy" if self.format == "remote_write" else self.compression,
+            spool=dict(self.spool.get_stats(), replay_rate=round(self.replay_rate, 2))
+            if self.spool
+            else None,
+        )
+
+    def get_metrics(self) -> dict:
+        metrics = super().get_metrics()
+        if self.spool:
+            stats = self.spool.get_stats()
+            metrics.update(
+                {
+                    "spool_pending_bytes": stats["pending_bytes"],
+                    "spool_segments": stats["segments"],
+                    "spool_records_written_total": stats["records_written"],
+                    "spool_records_replayed_total": stats["records_replayed"],
+                    "spool_bytes_dropped_total": stats["bytes_dropped"],
+                    "spool_replay_rate": round(self.replay_rate, 2),
+                }
+            )
+        return metrics
 
     def stop(self):
         """Stop the worker thread."""
-        self.stop_event.set()
-        self.worker_thread.join(timeout=2.0)
+        super().stop()
+        if self.spool:
+            self.spool.close()
+
+
+def create_sink(entry: dict) -> MetricsSink | None:
+    """
+    Build an additional sink from a ``metrics.sinks`` entry.
+
+    Returns:
+        The sink, or None if the entry is invalid or its dependencies are
+        missing
+    """
+    entry = dict(entry)
+    sink_type = entry.pop("type", None)
+    name = str(entry.pop("name", sink_type))
+    if not re.match(r"^[A-Za-z0-9_\-]{1,64}$", name):
+        logger.error(f"Invalid metrics sink name '{name}', skipping")
+        return None
+
+    try:
+        if sink_type in ("victoriametrics", "remote_write"):
+            if not entry.get("url"):
+                logger.error(f"Metrics sink '{name}' has no url, skipping")
+                return None
+            spool = entry.pop("spool", True)
+            entry.setdefault(
+                "format", "remote_write" if sink_type == "remote_write" else "influx"
+            )
+            return HttpSink(
+                name,
+                spool_directory=f"{SPOOL_DIR}_{name}" if spool else None,
+                **entry,
+            )
+        if sink_type == "parquet":
+            if not PYARROW_AVAILABLE:
+                logger.error(f"Metrics sink '{name}' needs pyarrow, skipping")
+                return None
+            entry.setdefault("directory", os.path.join(DATA_DIR, "archive"))
+            return ParquetSink(name, **entry)
+    except TypeError as e:
+        logger.error(f"Invalid options for metrics sink '{name}': {e}")
+        return None
+
+    logger.error(f"Unknown metrics sink type '{sink_type}', skipping")
+    return None
+
+
+class MetricsWriter(HttpSink):
+    """
+    Entry point for all metric samples.
+
+    Is itself the VictoriaMetrics sink configured under ``metrics`` and
+    passes every sample on to the additional sinks from ``metrics.sinks``,
+    each batching and retrying independently.
+    """
+
+    def __init__(self):
+        super().__init__(
+            "victoriametrics",
+            os.environ.get(
+                "METRICS_URL",
+                config.get("metrics.url", "http://victoriametrics:8428/write"),
+            ),
+            format=config.get("metrics.format", "influx"),
+            compression=config.get("metrics.compression", "gzip"),
+            skip_unchanged=config.get("metrics.skip_unchanged", False),
+            refresh_interval=config.get("metrics.refresh_interval", 240),
+            spool_directory=config.get("metrics.spool.directory", SPOOL_DIR)
+            if config.get("metrics.spool.enabled", True)
+            else None,
+            spool_segment_mb=config.get("metrics.spool.segment_mb", 4),
+            spool_max_mb=config.get("metrics.spool.max_mb", 256),
+            spool_fsync_interval=config.get("metrics.spool.fsync_interval", 1.0),
+            batch_size=config.get("metrics.batch_size", 50),
+            flush_interval=config.get("metrics.flush_interval", 1.0),
+            adaptive=config.get("metrics.adaptive_batching", True),
+            max_batch_size=config.get("metrics.max_batch_size", None),
+            latency_target=config.get("metrics.latency_target", 0.5),
+        )
+        logger.info(
+            f"MetricsWriter initialized with URL: {self._endpoint(self.format)} ({self.format}, Async)"
+        )
+
+        self.sinks: list[MetricsSink] = []
+        names = {self.name}
+        for entry in config.get("metrics.sinks", None) or []:
+            sink = create_sink(entry)
+            if sink is None:
+                continue
+            if sink.name in names:
+                logger.error(f"Duplicate metrics sink name '{sink.name}', skipping")
+                sink.stop()
+                continue
+            names.add(sink.name)
+            self.sinks.append(sink)
+            logger.info(f"Metrics sink '{sink.name}' ({sink.type}) initialized")
+
+    def write(
+        self,
+        measurements: dict,
+        device: str | None = None,
+        timestamp: float | None = None,
+        measurement: str = "idm_heatpump",
+    ) -> bool:
+        if not measurements:
+            return True
+        if timestamp is None:
+            timestamp = time.time()
+        for sink in self.sinks:
+            sink.write(measurements, device, timestamp, measurement)
+        return super().write(measurements, device, timestamp, measurement)
+
+    def get_status(self) -> dict:
+        status = super().get_status()
+        status["sinks"] = {sink.name: sink.get_status() for sink in self.sinks}
+        return status
+
+    def get_metrics(self) -> dict:
+        """Writer health as numeric fields for the self-metrics."""
+        metrics = {}
+        for name, value in super().get_metrics().items():
+            metrics[name if name.startswith("spool_") else f"metrics_{name}"] = value
+        for sink in self.sinks:
+            for name, value in sink.get_metrics().items():
+                metrics[f"sink_{sink.name}_{name}"] = value
+        return metrics
+
+    def stop(self):
+        """Stop the worker threads of all sinks."""
+        for sink in self.sinks:
+            sink.stop()
+        super().stop()
@@ -0,0 +1,361 @@
+# SPDX-License-Identifier: MIT
+"""
+Wire formats for sending samples to VictoriaMetrics.
+
+- ``influx``: InfluxDB line protocol on ``/write`` (default)
+- ``vm_import``: VictoriaMetrics JSON lines on ``/api/v1/import``; one line
+  per series with all values of the batch
+- ``remote_write``: Prometheus remote-write protobuf on ``/api/v1/write``,
+  snappy compressed (needs ``python-snappy`` or ``cramjam``)
+
+Series are named like VictoriaMetrics names line protocol fields
+(``<measurement>_<field>``), so all formats produce the same series.
+
+MetricsWriter uses LineProtocolSerializer for the influx format; it caches
+escaped prefixes per series and field and can leave out unchanged fields.
+"""
+
+import io
+import json
+import struct
+import time
+from collections.abc import Iterator
+
+try:
+    import snappy
+
+    def snappy_compress(data: bytes) -> bytes:
+        return snappy.compress(data)
+
+    SNAPPY_AVAILABLE = True
+except ImportError:
+    try:
+        import cramjam
+
+        def snappy_compress(data: bytes) -> bytes:
+            return bytes(cramjam.snappy.compress_raw(data))
+
+        SNAPPY_AVAILABLE = True
+    except ImportError:
+        snappy_compress = None
+        SNAPPY_AVAILABLE = False
+
+FORMATS = ("influx", "vm_import", "remote_write")
+
+# Endpoint path of each format, relative to the VictoriaMetrics base URL
+PATHS = {
+    "influx": "/write",
+    "vm_import": "/api/v1/import",
+    "remote_write": "/api/v1/write",
+}
+
+
+def _escape_tag(value: str) -> str:
+    """Escape a tag value for the InfluxDB line protocol."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace(",", "\\,")
+        .replace("=", "\\=")
+        .replace(" ", "\\ ")
+    )
+
+
+def _escape_measurement(value: str) -> str:
+    """Escape a measurement name for the InfluxDB line protocol."""
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ")
+
+
+def iter_samples(items) -> Iterator[tuple[str, str | None, float | None, list]]:
+    """
+    Normalise queued batch items.
+
+    Items are sensor dicts or (dict, device[, timestamp[, measurement]])
+    tuples.
+
+    Yields:
+        (measurement, device, timestamp, [(field, value), ...]) with only
+        numeric fields (booleans as int, ``*_str`` fields skipped)
+    """
+    for measurements in items:
+        measurement = "idm_heatpump"
+        device = None
+        timestamp = None
+        if isinstance(measurements, tuple):
+            measurements, device, *rest = measurements
+            timestamp = rest[0] if rest else None
+            if len(rest) > 1:
+                measurement = rest[1]
+
+        fields = []
+        for key, value in measurements.items():
+            # Skip string representation fields
+            if key.endswith("_str"):
+                continue
+            # Convert booleans to int
+            if isinstance(value, bool):
+                value = int(value)
+            # Only write numeric values
+            if isinstance(value, (int, float)):
+                fields.append((key, value))
+
+        if fields:
+            yield measurement, device, timestamp, fields
+
+
+def encode_influx(items) -> str:
+    """InfluxDB line protocol, timestamps in nanoseconds."""
+    lines = []
+    for measurement, device, timestamp, fields in iter_samples(items):
+        measurement = _escape_measurement(measurement)
+        if device:
+            measurement += f",device={_escape_tag(device)}"
+        field_str = ",".join(f"{_escape_tag(key)}={value}" for key, value in fields)
+        if timestamp is None:
+            # Timestamp is handled by VictoriaMetrics on ingestion
+            lines.append(f"{measurement} {field_str}")
+        else:
+            lines.append(
+                f"{measurement} {field_str} {round(timestamp * 1000) * 1000000}"
+            )
+    return "\n".join(lines)
+
+
+def _format_bool(value) -> str:
+    return "1" if value else "0"
+
+
+# Formatters by exact value type; other types are resolved (and cached) on
+# first use
+_FORMATTERS = {float: float.__repr__, int: int.__repr__, bool: _format_bool}
+_MISSING = object()
+
+
+def _resolve_formatter(value_type):
+    """Formatter for subclasses of the numeric types (e.g. numpy floats)."""
+    if issubclass(value_type, bool):
+        return _format_bool
+    if issubclass(value_type, int):
+        return lambda value: int.__repr__(int(value))
+    if issubclass(value_type, float):
+        return lambda value: float.__repr__(float(value))
+    return None  # not numeric: field is skipped
+
+
+class LineProtocolSerializer:
+    """
+    Incremental InfluxDB line protocol encoder.
+
+    Produces the same lines as ``encode_influx()`` but caches the escaped
+    series and field prefixes, dispatches value formatting on the exact
+    type and writes into a reused buffer.
+
+    With ``skip_unchanged`` a field is only written when its value differs
+    from the last one written for the same series. Every series is written
+    completely at least every ``refresh_interval`` seconds so it does not
+    go stale in VictoriaMetrics. Values count as written once encoded; the
+    sink calls ``reset()`` when a batch is lost so they are sent again.
+    """
+
+    def __init__(
+        self,
+        skip_unchanged: bool = False,
+        refresh_interval: float = 240.0,
+        clock=time.monotonic,
+    ):
+        self.skip_unchanged = skip_unchanged
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._field_prefixes: dict[str, str | None] = {}
+        self._series_prefixes: dict[tuple, str] = {}
+        self._formatters = dict(_FORMATTERS)
+        self._last_values: dict[tuple, dict] = {}
+        self._last_refresh: dict[tuple, float] = {}
+        self._buffer = io.StringIO()
+
+        self.fields_written = 0
+        self.fields_skipped = 0
+
+    def _field_prefix(self, key: str) -> str | None:
+        # String representation fields are never written
+        prefix = None if key.endswith("_str") else f"{_escape_tag(key)}="
+        self._field_prefixes[key] = prefix
+        return prefix
+
+    def _series_prefix(self, series: tuple) -> str:
+        measurement, device = series
+        prefix = _escape_measurement(measurement)
+        if device:
+            prefix += f",device={_escape_tag(device)}"
+        prefix += " "
+        self._series_prefixes[series] = prefix
+        return prefix
+
+    def _formatter(self, value_type):
+        formatter = _resolve_formatter(value_type)
+        self._formatters[value_type] = formatter
+        return formatter
+
+    def encode(self, items) -> str:
+        """Encode queued batch items (see ``iter_samples()``)."""
+        buffer = self._buffer
+        buffer.seek(0)
+        buffer.truncate()
+        write = buffer.write
+        field_prefixes = self._field_prefixes
+        formatters = self._formatters
+        now = self._clock()
+        lines = 0
+
+        for item in items:
+            measurement = "idm_heatpump"
+            device = None
+            timestamp = None
+            if type(item) is tuple:
+                measurements, device, *rest = item
+                if rest:
+                    timestamp = rest[0]
+                    if len(rest) > 1:
+                        measurement = rest[1]
+            else:
+                measurements = item
+
+            series = (measurement, device)
+            last = None
+            if self.skip_unchanged:
+                last = self._last_values.setdefault(series, {})
+                if now - self._last_refresh.get(series, -self.refresh_interval) >= (
+                    self.refresh_interval
+                ):
+                    last.clear()
+                    self._last_refresh[series] = now
+
+            fields = 0
+            for key, value in measurements.items():
+                prefix = field_prefixes.get(key, _MISSING)
+                if prefix is _MISSING:
+                    prefix = self._field_prefix(key)
+                if prefix is None:
+                    continue
+                value_type = type(value)
+                formatter = formatters.get(value_type, _MISSING)
+                if formatter is _MISSING:
+                    formatter = self._formatter(value_type)
+                if formatter is None:
+                    continue
+                if last is not None:
+                    if key in last and last[key] == value:
+                        self.fields_skipped += 1
+                        continue
+                    last[key] = value
+
+                if fields:
+                    write(",")
+                else:
+                    if lines:
+                        write("\n")
+                    write(
+                        self._series_prefixes.get(series) or self._series_prefix(series)
+                    )
+                write(prefix)
+                write(formatter(value))
+                fields += 1
+
+            if fields:
+                if timestamp is not None:
+                    # Line protocol timestamps are in nanoseconds
+                    write(f" {round(timestamp * 1000) * 1000000}")
+                lines += 1
+                self.fields_written += fields
+
+        return buffer.getvalue()
+
+    def reset(self):
+        """Forget the written values: the next batch contains every field."""
+        self._last_values.clear()
+
+    def get_stats(self) -> dict:
+        return {
+            "skip_unchanged": self.skip_unchanged,
+            "fields_written": self.fields_written,
+            "fields_skipped": self.fields_skipped,
+        }
+
+
+def _series(items) -> dict:
+    """Group samples per series: (name, device) -> ([values], [timestamps ms])."""
+    series = {}
+    now = time.time()
+    for measurement, device, timestamp, fields in iter_samples(items):
+        ts = round((now if timestamp is None else timestamp) * 1000)
+        for key, value in fields:
+            values, timestamps = series.setdefault(
+                (f"{measurement}_{key}", device), ([], [])
+            )
+            values.append(value)
+            timestamps.append(ts)
+    return series
+
+
+def encode_vm_import(items) -> str:
+    """VictoriaMetrics /api/v1/import JSON lines."""
+    lines = []
+    for (name, device), (values, timestamps) in _series(items).items():
+        metric = {"__name__": name}
+        if device:
+            metric["device"] = device
+        lines.append(
+            json.dumps(
+                {"metric": metric, "values": values, "timestamps": timestamps},
+                separators=(",", ":"),
+            )
+        )
+    return "\n".join(lines)
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    value &= 0xFFFFFFFFFFFFFFFF
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Length-delimited protobuf field."""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _label(name: str, value: str) -> bytes:
+    return _field(1, _field(1, name.encode()) + _field(2, value.encode()))
+
+
+_DOUBLE = struct.Struct("<d")
+
+
+def encode_remote_write(items) -> bytes:
+    """
+    Prometheus remote-write WriteRequest (protobuf, uncompressed).
+
+    Serialized WriteRequests can be concatenated into one request.
+    """
+    out = bytearray()
+    for (name, device), (values, timestamps) in _series(items).items():
+        series = _label("__name__", name)
+        if device:
+            series += _label("device", device)
+        for value, ts in zip(values, timestamps):
+            # Sample: double value = 1; int64 timestamp = 2
+            sample = b"\x09" + _DOUBLE.pack(float(value)) + b"\x10" + _varint(ts)
+            series += _field(2, sample)
+        out += _field(1, series)
+    return bytes(out)
+
+
+ENCODERS = {
+    "influx": encode_influx,
+    "vm_import": encode_vm_import,
+    "remote_write": encode_remote_write,
+}
@@ -0,0 +1,500 @@
+# SPDX-License-Identifier: MIT
+"""
+Metrics sinks.
+
+A sink receives the stream of samples from MetricsWriter and delivers them
+on its own worker thread with its own queue, batch size, flush interval and
+retry handling:
+
+- HttpSink (metrics.py): VictoriaMetrics line protocol / import or
+  Prometheus remote-write, with an on-disk retry spool
+- ParquetSink: local columnar archive, one Parquet file per hour
+  (needs pyarrow)
+
+With adaptive batching a sink flushes as soon as its queue runs empty while
+the endpoint answers quickly, and grows batch size and flush interval when
+requests get slow or the queue backs up.
+
+Additional sinks are configured in ``metrics.sinks``; the VictoriaMetrics
+sink configured directly under ``metrics`` is always present.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import UTC, datetime
+
+from .metrics_formats import iter_samples
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Upper bounds of the flush latency (seconds) and batch size histograms
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class Histogram:
+    """Cumulative histogram in the Prometheus style (``le`` buckets)."""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        """Upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return float("inf")
+
+    def get_stats(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "buckets": {str(b): c for b, c in zip(self.buckets, self.counts)},
+        }
+
+    def get_metrics(self, name: str) -> dict:
+        metrics = {f"{name}_count": self.count, f"{name}_sum": self.sum}
+        for bound, count in zip(self.buckets, self.counts):
+            metrics[f"{name}_le_{str(bound).replace('.', '_')}"] = count
+        return metrics
+
+
+class MetricsSink(ABC):
+    """Base class: bounded queue and a batching worker thread."""
+
+    type = "sink"
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        queue_size: int = 1000,
+        adaptive: bool = True,
+        max_batch_size: int | None = None,
+        latency_target: float = 0.5,
+    ):
+        """
+        Args:
+            name: Sink name (logs and status)
+            batch_size: Samples per batch; a full batch is sent immediately
+            flush_interval: Max seconds a sample waits for its batch
+            queue_size: Max queued samples, newer samples are dropped beyond
+            adaptive: Flush when idle and grow batches under backpressure
+            max_batch_size: Upper limit for adaptive batches
+                (default 20 x batch_size)
+            latency_target: Flush latency (seconds) above which batches grow
+        """
+        self.name = name
+        self.min_batch_size = self.batch_size = max(1, int(batch_size))
+        self.max_batch_size = max(
+            self.min_batch_size, int(max_batch_size or self.min_batch_size * 20)
+        )
+        self.min_flush_interval = self.flush_interval = float(flush_interval)
+        self.max_flush_interval = self.min_flush_interval * 10
+        self.adaptive = adaptive
+        self.latency_target = float(latency_target)
+        self.latency = None  # moving average of the flush latency
+        self._last_ok = True
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.dropped = 0
+        self.batch_count = 0
+        self.failed_batches = 0
+        self.samples_sent = 0
+        self.latency_histogram = Histogram(LATENCY_BUCKETS)
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.worker_thread = None
+
+    def start(self):
+        """Start the worker thread (called by subclasses once initialised)."""
+        self.worker_thread = threading.Thread(
+            target=self._worker, name=f"metrics-{self.name}", daemon=True
+        )
+        self.worker_thread.start()
+
+    def write(
+        self,
+        measurements: dict,
+        device: str | None = None,
+        timestamp: float | None = None,
+        measurement: str = "idm_heatpump",
+    ) -> bool:
+        """
+        Queue measurements for writing.
+
+        Args:
+            measurements: Sensor values
+            device: Heat pump name, written as "device" tag (multi-device setups)
+            timestamp: Sample time (unix seconds, defaults to now). Samples
+                keep it through batching and spooling.
+            measurement: Measurement name (metric prefix in VictoriaMetrics)
+        """
+        if not measurements:
+            return True
+
+        if timestamp is None:
+            timestamp = time.time()
+
+        try:
+            self.queue.put_nowait((measurements, device, timestamp, measurement))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Metrics queue full ({self.name}), dropping data")
+            return False
+
+    def _worker(self):
+        """Worker thread to process metrics queue with batching."""
+        batch = []
+        last_send = time.time()
+
+        while not self.stop_event.is_set():
+            try:
+                # Calculate timeout dynamically
+                now = time.time()
+                if batch:
+                    # If we have items, wait only the remaining flush interval
+                    timeout = max(0, self.flush_interval - (now - last_send))
+                else:
+                    # If empty, wait up to 1s (or until an item arrives)
+                    timeout = 1.0
+
+                measurements = self.queue.get(timeout=timeout)
+                batch.append(measurements)
+                self.queue.task_done()
+
+                # If batch is full (or nothing else is coming while the
+                # endpoint keeps up), send immediately
+                if len(batch) >= self.batch_size or (
+                    self._keeping_up() and self.queue.empty()
+                ):
+                    self._flush(batch)
+                    batch = []
+                    last_send = time.time()
+
+            except queue.Empty:
+                # Timeout expired (or queue empty for >1s)
+                # If we have data pending, send it now
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                    last_send = time.time()
+                else:
+                    self._idle()
+                continue
+            except Exception:
+                logger.exception(f"Error in metrics worker ({self.name})")
+                # Try to flush what we have if possible, otherwise drop
+                if batch:
+                    try:
+                        self._send_data(batch)
+                    except Exception:
+                        logger.warning(
+                            f"Dropping {len(batch)} metrics ({self.name})",
+                            exc_info=True,
+                        )
+                    batch = []
+
+        # Flush remaining items on exit
+        if batch:
+            try:
+                self._send_data(batch)
+            except Exception:
+                logger.exception(f"Error flushing metrics on exit ({self.name})")
+
+    def _keeping_up(self) -> bool:
+        """True if the endpoint answers well within the latency target."""
+        if not self.adaptive or not self._last_ok:
+            return False
+        return self.latency is None or self.latency < self.latency_target / 2
+
+    def _flush(self, batch: list):
+        """Send a batch, record its latency and adapt the batching."""
+        start = time.monotonic()
+        ok = self._send_data(batch)
+        latency = time.monotonic() - start
+
+        self.batch_count += 1
+        self._last_ok = ok is not False
+        if ok is False:
+            self.failed_batches += 1
+        else:
+            self.samples_sent += len(batch)
+        self.latency_histogram.observe(latency)
+        self.batch_size_histogram.observe(len(batch))
+        self.latency = (
+            latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        )
+        if self.adaptive:
+            self._adapt()
+
+    def _adapt(self):
+        """Grow batches while slow, failing or backed up, shrink them after."""
+        depth = self.queue.qsize()
+        if (
+            not self._last_ok
+            or self.latency > self.latency_target
+            or depth >= self.batch_size
+        ):
+            batch_size = min(self.max_batch_size, self.batch_size * 2)
+            flush_interval = min(self.max_flush_interval, self.flush_interval * 2)
+        elif depth == 0 and self.latency < self.latency_target / 2:
+            batch_size = max(self.min_batch_size, self.batch_size // 2)
+            flush_interval = max(self.min_flush_interval, self.flush_interval / 2)
+        else:
+            return
+        if batch_size != self.batch_size:
+            logger.debug(
+                f"Metrics sink {self.name}: batch size {self.batch_size} -> "
+                f"{batch_size} (latency {self.latency:.3f}s, queue {depth})"
+            )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+    @abstractmethod
+    def _send_data(self, data) -> bool:
+        """Deliver a batch (executed in the worker thread)."""
+
+    def _idle(self):
+        """Called by the worker when there is nothing to send (retries)."""
+
+    def get_status(self) -> dict:
+        return {
+            "type": self.type,
+            "queue_size": self.queue.qsize(),
+            "dropped": self.dropped,
+            "batching": {
+                "adaptive": self.adaptive,
+                "batch_size": self.batch_size,
+                "flush_interval": self.flush_interval,
+                "min_batch_size": self.min_batch_size,
+                "max_batch_size": self.max_batch_size,
+                "latency": round(self.latency, 4) if self.latency is not None else None,
+                "latency_p50": self.latency_histogram.quantile(0.5),
+                "latency_p95": self.latency_histogram.quantile(0.95),
+                "batches": self.batch_count,
+                "failed_batches": self.failed_batches,
+                "samples_sent": self.samples_sent,
+                "flush_latency_seconds": self.latency_histogram.get_stats(),
+                "batch_samples": self.batch_size_histogram.get_stats(),
+            },
+        }
+
+    def get_metrics(self) -> dict:
+        return {
+            "queue_size": self.queue.qsize(),
+            "dropped_total": self.dropped,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "batches_total": self.batch_count,
+            "batches_failed_total": self.failed_batches,
+            "samples_sent_total": self.samples_sent,
+            **self.latency_histogram.get_metrics("flush_latency_seconds"),
+            **self.batch_size_histogram.get_metrics("batch_samples"),
+        }
+
+    def stop(self):
+        """Stop the worker thread."""
+        self.stop_event.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=2.0)
+
+
+class ParquetSink(MetricsSink):
+    """
+    Local raw archive in Parquet files, rotated every hour.
+
+    Samples are stored in long format (timestamp, device, measurement, field,
+    value), so the schema does not change when sensors come and go. Each
+    flush appends a row group to the file of the current hour; the file is
+    written as ``.parquet.tmp`` and renamed once the hour is complete.
+    Samples arriving late for an hour that is already closed go into the
+    current file.
+    """
+
+    type = "parquet"
+
+    def __init__(
+        self,
+        name: str = "parquet",
+        directory: str = "archive",
+        batch_size: int = 500,
+        flush_interval: float = 60.0,
+        queue_size: int = 10000,
+        compression: str = "zstd",
+        retry_batches: int = 100,
+        adaptive: bool = False,
+        max_batch_size: int | None = None,
+        latency_target: float = 0.5,
+    ):
+        """
+        Args:
+            directory: Archive directory
+            compression: Parquet compression codec
+            retry_batches: Failed batches kept for retrying (oldest dropped)
+
+        Batching is not adaptive by default: small batches would only make
+        small row groups.
+        """
+        super().__init__(
+            name,
+            batch_size,
+            flush_interval,
+            queue_size,
+            adaptive,
+            max_batch_size,
+            latency_target,
+        )
+        if not PYARROW_AVAILABLE:
+            raise RuntimeError("ParquetSink requires pyarrow")
+        self.directory = directory
+        self.compression = compression
+        self._schema = pa.schema(
+            [
+                ("timestamp", pa.timestamp("ms", tz="UTC")),
+                ("device", pa.string()),
+                ("measurement", pa.string()),
+                ("field", pa.string()),
+                ("value", pa.float64()),
+            ]
+        )
+        self._writer = None
+        self._hour = None
+        self._path = None
+        self._retry = deque(maxlen=retry_batches)
+        self.rows_written = 0
+        self.files_written = 0
+        self.start()
+
+    def _file_path(self, hour: int) -> str:
+        stamp = datetime.fromtimestamp(hour * 3600, tz=UTC)
+        base = os.path.join(self.directory, f"idm_{stamp:%Y%m%d_%H}")
+        path = f"{base}.parquet"
+        n = 1
+        # A restart within the hour starts a second file for that hour
+        while os.path.exists(path) or os.path.exists(f"{path}.tmp"):
+            path = f"{base}.{n}.parquet"
+            n += 1
+        return path
+
+    def _rotate(self, hour: int):
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        self._hour = hour
+        self._path = self._file_path(hour)
+        self._writer = pq.ParquetWriter(
+            f"{self._path}.tmp", self._schema, compression=self.compression
+        )
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(f"{self._path}.tmp", self._path)
+        self.files_written += 1
+        logger.debug(f"Closed metrics archive {self._path}")
+        self._writer = None
+
+    def _table(self, items):
+        """Arrow table of the samples and the newest timestamp (ms)."""
+        columns = {name: [] for name in self._schema.names}
+        newest = 0
+        for measurement, device, timestamp, fields in iter_samples(items):
+            ts = round((time.time() if timestamp is None else timestamp) * 1000)
+            newest = max(newest, ts)
+            for key, value in fields:
+                columns["timestamp"].append(ts)
+                columns["device"].append(device)
+                columns["measurement"].append(measurement)
+                columns["field"].append(key)
+                columns["value"].append(float(value))
+        return pa.table(columns, schema=self._schema), newest
+
+    def _write(self, items) -> bool:
+        table, newest = self._table(items)
+        if not table.num_rows:
+            return True
+        newest_hour = newest // 3600000
+        if self._writer is None or newest_hour > self._hour:
+            self._rotate(newest_hour)
+        self._writer.write_table(table)
+        self.rows_written += table.num_rows
+        return True
+
+    def _send_data(self, data) -> bool:
+        items = data if isinstance(data, list) else [data]
+        self._idle()
+        try:
+            return self._write(items)
+        except Exception:
+            logger.exception("Failed to write metrics archive")
+            self._retry.append(items)
+            return False
+
+    def _idle(self):
+        # Close the file once its hour is over so it becomes readable
+        if self._writer is not None and time.time() // 3600 > self._hour:
+            try:
+                self._close_file()
+            except Exception:
+                logger.warning("Failed to close metrics archive", exc_info=True)
+                self._writer = None
+        while self._retry:
+            try:
+                self._write(self._retry[0])
+            except Exception:
+                logger.warning(
+                    f"Retrying metrics archive write failed "
+                    f"({len(self._retry)} batches pending)",
+                    exc_info=True,
+                )
+                return
+            self._retry.popleft()
+
+    def get_status(self) -> dict:
+        return dict(
+            super().get_status(),
+            directory=self.directory,
+            current_file=self._path if self._writer else None,
+            rows_written=self.rows_written,
+            files_written=self.files_written,
+            retry_batches=len(self._retry),
+        )
+
+    def get_metrics(self) -> dict:
+        return dict(
+            super().get_metrics(),
+            rows_written_total=self.rows_written,
+            retry_batches=len(self._retry),
+        )
+
+    def stop(self):
+        super().stop()
+        self._close_file()
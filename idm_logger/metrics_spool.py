@@ -0,0 +1,286 @@
+# SPDX-License-Identifier: MIT
+"""
+Durable on-disk spool for metric batches.
+
+Batches that cannot be delivered to VictoriaMetrics are appended to
+segment files and replayed in order once VictoriaMetrics answers again, so
+restarts of the VictoriaMetrics container no longer lose data.
+
+Layout of the spool directory:
+
+- ``<seq>.seg``: append-only segment files. Every record is a payload
+  (encoded batch) prefixed with its length and CRC32. Records failing the
+  CRC check are skipped on replay; a record torn by a crash is cut off.
+- ``cursor``: segment number and offset of the first record that has not
+  been delivered yet (replaced atomically after every delivered chunk).
+
+Appends are flushed immediately but fsynced at most every
+``fsync_interval`` seconds. When the spool exceeds ``max_bytes`` the
+oldest segments are discarded.
+"""
+
+import logging
+import os
+import struct
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct(">II")  # payload length, crc32
+_SUFFIX = ".seg"
+
+
+class MetricsSpool:
+    """Append-only segment spool with a persistent replay cursor."""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int = 4 * 1024 * 1024,
+        max_bytes: int = 256 * 1024 * 1024,
+        fsync_interval: float = 1.0,
+    ):
+        """
+        Args:
+            directory: Spool directory (created on first append)
+            segment_bytes: Size after which a new segment is started
+            max_bytes: Max total size, the oldest segments are dropped beyond
+            fsync_interval: Min seconds between fsyncs of the active segment
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+
+        self._sizes: dict[int, int] = {}  # segment seq -> size in bytes
+        self._cursor = (0, 0)  # (seq, offset) of the next record to replay
+        self._file = None
+        self._active = None
+        self._last_fsync = 0.0
+
+        self.records_written = 0
+        self.records_replayed = 0
+        self.records_corrupt = 0
+        self.bytes_dropped = 0
+
+        self._recover()
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}{_SUFFIX}")
+
+    @property
+    def _cursor_path(self) -> str:
+        return os.path.join(self.directory, "cursor")
+
+    def _recover(self):
+        """Load segments and cursor left by a previous run."""
+        if not os.path.isdir(self.directory):
+            return
+
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX):
+                try:
+                    seq = int(name[: -len(_SUFFIX)])
+                except ValueError:
+                    continue
+                self._sizes[seq] = self._valid_size(seq)
+
+        try:
+            with open(self._cursor_path) as f:
+                seq, offset = (int(v) for v in f.read().split())
+            self._cursor = (seq, offset)
+        except (OSError, ValueError):
+            self._cursor = (min(self._sizes), 0) if self._sizes else (0, 0)
+
+        if self._cursor[0] not in self._sizes:
+            # Segment of the cursor is gone: continue with the next one
+            later = [s for s in self._sizes if s > self._cursor[0]]
+            self._cursor = (min(later), 0) if later else (self._cursor[0], 0)
+
+        # Segments that were fully delivered before the restart
+        for seq in [s for s in self._sizes if s < self._cursor[0]]:
+            self._remove_segment(seq)
+
+        if self.pending_bytes:
+            logger.info(
+                f"Metrics spool holds {self.pending_bytes} bytes from a previous run"
+            )
+
+    def _valid_size(self, seq: int) -> int:
+        """
+        Size of the intact part of a segment.
+
+        A record torn by a crash is cut off, together with everything after it.
+        Complete records with a bad CRC are kept and skipped by ``read()``.
+        """
+        path = self._segment_path(seq)
+        valid = 0
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                length, _ = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    break
+                valid += _HEADER.size + length
+        if valid != os.path.getsize(path):
+            logger.warning(f"Truncating damaged metrics spool segment {path}")
+            with open(path, "r+b") as f:
+                f.truncate(valid)
+        return valid
+
+    @property
+    def pending_bytes(self) -> int:
+        seq, offset = self._cursor
+        return sum(size for s, size in self._sizes.items() if s >= seq) - offset
+
+    @property
+    def segments(self) -> int:
+        return len(self._sizes)
+
+    def append(self, payload: bytes | str):
+        """Append one batch to the spool."""
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        if self._file is None or self._sizes[self._active] >= self.segment_bytes:
+            self._roll()
+
+        self._file.write(_HEADER.pack(len(data), zlib.crc32(data)) + data)
+        self._file.flush()
+        self._sizes[self._active] += _HEADER.size + len(data)
+        self.records_written += 1
+
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+        self._enforce_limit()
+
+    def _roll(self):
+        """Start a new segment."""
+        os.makedirs(self.directory, exist_ok=True)
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+            self._file.close()
+        self._active = max(self._sizes, default=self._cursor[0] - 1) + 1
+        self._sizes[self._active] = 0
+        # Kept open for appends until the next roll or close()
+        self._file = open(self._segment_path(self._active), "ab")  # noqa: SIM115
+        if not self.pending_bytes:
+            # Everything before the new segment has been delivered
+            for seq in [s for s in self._sizes if s < self._active]:
+                self._remove_segment(seq)
+            self._cursor = (self._active, 0)
+            self._save_cursor()
+
+    def _enforce_limit(self):
+        while sum(self._sizes.values()) > self.max_bytes and len(self._sizes) > 1:
+            oldest = min(self._sizes)
+            seq, offset = self._cursor
+            if oldest >= seq:
+                self.bytes_dropped += self._sizes[oldest] - (
+                    offset if oldest == seq else 0
+                )
+                self._cursor = (oldest + 1, 0)
+                self._save_cursor()
+            logger.warning(
+                f"Metrics spool exceeds {self.max_bytes} bytes, dropping oldest segment"
+            )
+            self._remove_segment(oldest)
+
+    def _remove_segment(self, seq: int):
+        self._sizes.pop(seq, None)
+        try:
+            os.remove(self._segment_path(seq))
+        except FileNotFoundError:
+            pass
+
+    def read(self, max_bytes: int = 512 * 1024) -> tuple[list[bytes], tuple]:
+        """
+        Read pending batches in order, starting at the cursor.
+
+        Args:
+            max_bytes: Stop after this many payload bytes (at least one batch
+                is returned if anything is pending)
+
+        Returns:
+            (batches, position): Payloads and the position to pass to
+            ``commit()`` once they have been delivered
+        """
+        batches = []
+        total = 0
+        seq, offset = self._cursor
+        while seq in self._sizes and total < max_bytes:
+            if offset >= self._sizes[seq]:
+                if seq == max(self._sizes):
+                    break
+                seq, offset = seq + 1, 0
+                continue
+            with open(self._segment_path(seq), "rb") as f:
+                f.seek(offset)
+                while offset < self._sizes[seq] and total < max_bytes:
+                    length, crc = _HEADER.unpack(f.read(_HEADER.size))
+                    data = f.read(length)
+                    offset += _HEADER.size + length
+                    if zlib.crc32(data) != crc:
+                        logger.warning(
+                            f"Skipping corrupt record in metrics spool segment {seq}"
+                        )
+                        self.records_corrupt += 1
+                        self.bytes_dropped += length
+                        continue
+                    batches.append(data)
+                    total += length
+        return batches, (seq, offset)
+
+    def commit(self, position: tuple, records: int):
+        """Mark everything before position as delivered."""
+        self._cursor = position
+        self.records_replayed += records
+        for seq in [s for s in self._sizes if s < position[0]]:
+            self._remove_segment(seq)
+        if not self.pending_bytes and self._file is not None:
+            # Fully drained: start over with an empty segment next time
+            self._file.close()
+            self._file = None
+            self._remove_segment(self._active)
+            self._cursor = (self._active + 1, 0)
+        self._save_cursor()
+
+    def discard(self, position: tuple, records: int):
+        """Skip batches that can never be delivered (rejected as invalid)."""
+        seq, offset = self._cursor
+        self.bytes_dropped += (
+            sum(size for s, size in self._sizes.items() if seq <= s < position[0])
+            + position[1]
+            - offset
+        )
+        self.commit(position, 0)
+
+    def _save_cursor(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{self._cursor[0]} {self._cursor[1]}")
+        os.replace(tmp, self._cursor_path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def get_stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "pending_bytes": self.pending_bytes,
+            "segments": self.segments,
+            "records_written": self.records_written,
+            "records_replayed": self.records_replayed,
+            "records_corrupt": self.records_corrupt,
+            "bytes_dropped": self.bytes_dropped,
+        }
@@ -1,17 +1,26 @@
 # SPDX-License-Identifier: MIT
+import hashlib
+import json
 import logging
+import struct
 import time
 from pymodbus.client import ModbusTcpClient
 
 from .config import config
+from .db import db
 from .sensor_addresses import (
     BINARY_SENSOR_ADDRESSES,
     COMMON_SENSORS,
+    BlockDecoder,
     heating_circuit_sensors,
     zone_sensors,
     HeatingCircuit,
     SensorFeatures,
 )
+from .read_planner import ReadPlanner, group_sensors
+from .modbus_async import PipelinedModbusEngine
+from .poll_tiers import PollTiers
+from .vector_decoder import NUMPY_AVAILABLE, NumpyBlockDecoder
 
 logger = logging.getLogger(__name__)
 
@@ -22,21 +31,73 @@ RECONNECT_BASE_DELAY = config.get("modbus.reconnect_base_delay", 1.0)
 RECONNECT_MAX_DELAY = config.get("modbus.reconnect_max_delay", 60.0)
 RECONNECT_MULTIPLIER = config.get("modbus.reconnect_multiplier", 2.0)
 
+# Read plan configuration
+MAX_BLOCK_SIZE = config.get("modbus.max_block_size", 50)
+MAX_GAP = config.get("modbus.max_gap", 5)
+REMERGE_AFTER_CYCLES = config.get("modbus.remerge_after_cycles", 100)
+BAD_REGISTER_RETRY_CYCLES = config.get("modbus.bad_register_retry_cycles", 1000)
+
+# Persisted read plan (settings table)
+READ_PLAN_CACHE_ENABLED = config.get("modbus.read_plan_cache", True)
+READ_PLAN_SAVE_INTERVAL = config.get("modbus.read_plan_save_interval", 300)
+READ_PLAN_SETTING_PREFIX = "modbus_read_plan"
+READ_PLAN_FORMAT_VERSION = 1
+
+# Read engine: "sync" (one request at a time) or "async" (pipelined)
+MODBUS_ENGINE = config.get("modbus.engine", "sync")
+PIPELINE_DEPTH = config.get("modbus.pipeline_depth", 4)
+
+# Block decoder: "struct" (precompiled struct formats) or "numpy" (vectorised)
+MODBUS_DECODER = config.get("modbus.decoder", "struct")
+
+# Change detection: blocks whose registers did not change since the last
+# cycle are not decoded again. Every full_refresh_interval seconds all
+# blocks are decoded and reported as changed.
+CHANGE_DETECTION = config.get("modbus.change_detection", True)
+FULL_REFRESH_INTERVAL = config.get("modbus.full_refresh_interval", 300)
+
 
 class ModbusClient:
-    def __init__(self, host, port):
+    def __init__(
+        self, host, port, name=None, circuits=None, zones=None, firmware_version=None
+    ):
         self.host = host
         self.port = port
+        # Device name used to tag data when several heat pumps are polled
+        self.name = name
+        self.firmware_version = (
+            firmware_version
+            if firmware_version is not None
+            else config.get("idm.firmware_version", "")
+        )
         self.client = ModbusTcpClient(
             host, port=port, timeout=MODBUS_TIMEOUT, retries=MODBUS_RETRIES
         )
 
+        # Optional pipelined engine for reads. Writes always use self.client.
+        self._engine = None
+        if MODBUS_ENGINE == "async":
+            self._engine = PipelinedModbusEngine(
+                host, port, pipeline_depth=PIPELINE_DEPTH, timeout=MODBUS_TIMEOUT
+            )
+            logger.info(f"Using pipelined Modbus read engine (depth {PIPELINE_DEPTH})")
+        # Transport used for reading sensors
+        self._reader = self._engine or self.client
+
+        self._decoder_class = BlockDecoder
+        if MODBUS_DECODER == "numpy":
+            if NUMPY_AVAILABLE:
+                self._decoder_class = NumpyBlockDecoder
+            else:
+                logger.warning("NumPy not installed, using struct block decoder")
+
         # Initialize with common sensors
         self.sensors = {s.name: s for s in COMMON_SENSORS}
         self.binary_sensors = BINARY_SENSOR_ADDRESSES.copy()
 
         # Add configured heating circuits
-        circuits = config.get("idm.circuits", [])
+        if circuits is None:
+            circuits = config.get("idm.circuits", [])
         for c_name in circuits:
             try:
                 c_enum = HeatingCircuit[c_name.upper()]
@@ -47,7 +108,8 @@ class ModbusClient:
                 logger.warning(f"Invalid heating circuit configured: {c_name}")
 
         # Add configured zones
-        zones = config.get("idm.zones", [])
+        if zones is None:
+            zones = config.get("idm.zones", [])
         for zone_id in zones:
             try:
                 z_sensors = zone_sensors(int(zone_id))
@@ -56,10 +118,31 @@ class ModbusClient:
             except Exception as e:
                 logger.warning(f"Invalid zone configured: {zone_id} ({e})")
 
+        # Poll tier per sensor (everything in one tier unless tiered polling
+        # is enabled) and the latest values per tier
+        self._tiers = PollTiers()
+        self._tier_values = {}
+
         # Cache management - store sensor config hash to detect changes
+        self._planner = ReadPlanner(
+            max_block_size=MAX_BLOCK_SIZE,
+            max_gap=MAX_GAP,
+            remerge_after=REMERGE_AFTER_CYCLES,
+            bad_retry_cycles=BAD_REGISTER_RETRY_CYCLES,
+        )
         self._read_blocks = None
-        self._failed_blocks = set()
         self._sensor_config_hash = self._compute_sensor_hash()
+        self._saved_layout_version = None
+        self._last_plan_save = 0.0
+
+        # Raw register snapshot per block {block key: (registers, decoded values)}
+        self._snapshots = {}
+        self._last_data = {}
+        self._last_full_refresh = 0.0
+        # Keys of the last read_sensors() result that changed since the
+        # previous cycle, and whether that read was a full refresh
+        self.changed_sensors = set()
+        self.full_refresh = True
 
         # Connection state tracking for exponential backoff
         self._connection_was_lost = False
@@ -79,16 +162,99 @@ class ModbusClient:
             "uptime_start": None,
         }
 
-    def _compute_sensor_hash(self) -> int:
-        """Compute hash of current sensor configuration for cache invalidation."""
-        sensor_keys = tuple(sorted(self.sensors.keys()))
-        binary_keys = tuple(sorted(self.binary_sensors.keys()))
-        return hash((sensor_keys, binary_keys))
+    def _compute_sensor_hash(self) -> str:
+        """
+        Compute hash of current sensor configuration for cache invalidation.
+
+        Uses a stable digest (not hash()) so it can key the persisted read plan.
+        """
+        entries = sorted(
+            (s.name, s.address, s.datatype, s.read_supported)
+            for s in list(self.sensors.values()) + list(self.binary_sensors.values())
+        )
+        return hashlib.sha256(json.dumps(entries).encode()).hexdigest()[:16]
+
+    @property
+    def _read_plan_setting_key(self) -> str:
+        return f"{READ_PLAN_SETTING_PREFIX}:{self.host}:{self.port}"
+
+    def _load_read_plan(self) -> bool:
+        """Restores the persisted read plan if it matches sensors and firmware."""
+        if not READ_PLAN_CACHE_ENABLED:
+            return False
+
+        raw = db.get_setting(self._read_plan_setting_key)
+        if not raw:
+            return False
+
+        try:
+            stored = json.loads(raw)
+        except (TypeError, ValueError):
+            logger.warning("Ignoring corrupt persisted Modbus read plan")
+            return False
+
+        if (
+            stored.get("format") != READ_PLAN_FORMAT_VERSION
+            or stored.get("sensor_hash") != self._sensor_config_hash
+            or stored.get("firmware") != self.firmware_version
+        ):
+            logger.info(
+                "Persisted Modbus read plan does not match sensor config or firmware, rebuilding"
+            )
+            return False
+
+        readable, _ = self._read_sensor_lists()
+        if not self._planner.from_dict(
+            stored.get("plan", {}),
+            {s.name: s for s in readable},
+            tier_of=self._tiers.tier_of,
+        ):
+            logger.info("Persisted Modbus read plan is outdated, rebuilding")
+            return False
+
+        self._saved_layout_version = self._planner.layout_version
+        self._last_plan_save = time.time()
+        return True
+
+    def _save_read_plan(self, force=False):
+        """
+        Persists the read plan.
+
+        Layout changes (splits, merges, bad registers) are saved right away,
+        latency statistics at most every READ_PLAN_SAVE_INTERVAL seconds.
+        """
+        if not READ_PLAN_CACHE_ENABLED:
+            return
+
+        now = time.time()
+        layout_changed = self._planner.layout_version != self._saved_layout_version
+        if (
+            not force
+            and not layout_changed
+            and (now - self._last_plan_save) < READ_PLAN_SAVE_INTERVAL
+        ):
+            return
+
+        payload = {
+            "format": READ_PLAN_FORMAT_VERSION,
+            "sensor_hash": self._sensor_config_hash,
+            "firmware": self.firmware_version,
+            "saved_at": now,
+            "plan": self._planner.to_dict(),
+        }
+        try:
+            db.set_setting(self._read_plan_setting_key, json.dumps(payload))
+            self._saved_layout_version = self._planner.layout_version
+            self._last_plan_save = now
+        except Exception as e:
+            logger.warning(f"Failed to persist Modbus read plan: {e}")
 
     def invalidate_cache(self):
         """Invalidate the read blocks cache. Call when sensor config changes."""
         self._read_blocks = None
-        self._failed_blocks = set()
+        self._planner.reset()
+        self._snapshots = {}
+        self._tier_values = {}
         self._sensor_config_hash = self._compute_sensor_hash()
         logger.debug("Modbus read blocks cache invalidated")
 
@@ -118,6 +284,10 @@ class ModbusClient:
 
     def close(self):
         """Closes the Modbus connection."""
+        if self._read_blocks is not None:
+            self._save_read_plan(force=True)
+        if self._engine and self._engine.is_socket_open():
+            self._engine.close()
         if self.client.is_socket_open():
             logger.info("Closing Modbus connection")
             self._stats["total_disconnects"] += 1
@@ -126,21 +296,29 @@ class ModbusClient:
     def get_connection_stats(self) -> dict:
         """Returns connection health statistics."""
         stats = self._stats.copy()
-        stats["is_connected"] = self.client.is_socket_open()
+        stats["is_connected"] = self._reader.is_socket_open()
         stats["consecutive_failures"] = self._consecutive_failures
         stats["current_reconnect_delay"] = self._reconnect_delay
         if stats["uptime_start"] and stats["is_connected"]:
             stats["uptime_seconds"] = int(time.time() - stats["uptime_start"])
         else:
             stats["uptime_seconds"] = 0
+        stats["read_plan"] = self._planner.get_stats()
+        stats["poll_tiers"] = self._tiers.get_stats()
+        if self._engine:
+            stats["engine"] = self._engine.get_stats()
         return stats
 
-    def _ensure_connection(self):
+    def _ensure_connection(self, transport=None):
         """
         Ensures the client is connected, using exponential backoff for reconnection.
         Returns True if connected, False otherwise.
+
+        Args:
+            transport: Connection to check (defaults to the synchronous client)
         """
-        if self.client.is_socket_open():
+        transport = transport or self.client
+        if transport.is_socket_open():
             if self._connection_was_lost:
                 logger.info("Modbus connection restored")
                 self._connection_was_lost = False
@@ -172,7 +350,7 @@ class ModbusClient:
 
         # Attempt to reconnect
         try:
-            result = self.client.connect()
+            result = transport.connect()
             if result:
                 self._stats["total_reconnects"] += 1
                 self._stats["uptime_start"] = time.time()
@@ -189,81 +367,171 @@ class ModbusClient:
 
         return False
 
-    def _build_read_blocks(self):
-        """Groups sensors into contiguous blocks for optimized reading."""
-        # Combine all read-supported sensors
-        all_sensors = []
-        for s in list(self.sensors.values()) + list(self.binary_sensors.values()):
-            if s.read_supported:
-                all_sensors.append(s)
-
-        # Sort by address
-        all_sensors.sort(key=lambda s: s.address)
-
-        blocks = []
-        if not all_sensors:
-            return blocks
-
-        current_block = [all_sensors[0]]
-
-        # Max registers to read in one request (conservative for IDM heat pumps)
-        MAX_BLOCK_SIZE = 50
-
-        # Max gap size to bridge (reading useless data is cheaper than new request)
-        MAX_GAP = 5
+    def _read_sensor_lists(self):
+        """Split configured sensors into readable sensors and forbidden registers."""
+        all_sensors = list(self.sensors.values()) + list(self.binary_sensors.values())
+        readable = [s for s in all_sensors if s.read_supported]
 
         # Addresses that MUST NOT be read (read_supported=False)
         forbidden_addresses = set()
-        for s in list(self.sensors.values()) + list(self.binary_sensors.values()):
+        for s in all_sensors:
             if not s.read_supported:
                 # Mark all registers occupied by this sensor as forbidden
                 for i in range(s.size):
                     forbidden_addresses.add(s.address + i)
 
-        for i in range(1, len(all_sensors)):
-            sensor = all_sensors[i]
-            prev_sensor = current_block[-1]
-
-            # Calculate end of previous sensor
-            prev_end = prev_sensor.address + prev_sensor.size
+        return readable, forbidden_addresses
 
-            # Calculate gap
-            gap = sensor.address - prev_end
-
-            # Check if we should extend the block
-            should_extend = True
+    def _build_read_blocks(self):
+        """Groups sensors into contiguous blocks for optimized reading."""
+        readable, forbidden_addresses = self._read_sensor_lists()
+        return group_sensors(
+            readable,
+            forbidden_addresses,
+            self._planner.max_block_size,
+            self._planner.max_gap,
+        )
 
-            # 1. Check max block size
-            # Current block size + gap + new sensor size
-            new_block_size = (sensor.address + sensor.size) - current_block[0].address
-            if new_block_size > MAX_BLOCK_SIZE:
-                should_extend = False
+    def _build_read_plan(self):
+        """Builds the adaptive read plan, preferring the persisted one."""
+        if self._load_read_plan():
+            self._read_blocks = self._planner.blocks
+            logger.info(
+                f"Restored Modbus read plan: {len(self._read_blocks)} requests, "
+                f"{len(self._planner.bad_addresses)} known-bad registers"
+            )
+            return
 
-            # 2. Check max gap
-            if gap > MAX_GAP:
-                should_extend = False
+        readable, forbidden_addresses = self._read_sensor_lists()
+        self._read_blocks = self._planner.build(
+            readable, forbidden_addresses, tier_of=self._tiers.tier_of
+        )
+        logger.info(
+            f"Optimized Modbus reading: {len(self._read_blocks)} requests for {len(self.sensors) + len(self.binary_sensors)} sensors"
+        )
+        if self._tiers.enabled:
+            counts = {}
+            for block in self._read_blocks:
+                counts[block.tier] = counts.get(block.tier, 0) + len(block.sensors)
+            logger.info(f"Poll tiers (sensors per tier): {counts}")
 
-            # 3. Check for forbidden addresses in the gap
-            if should_extend and gap > 0:
-                for addr in range(prev_end, sensor.address):
-                    if addr in forbidden_addresses:
-                        should_extend = False
-                        break
+    def _execute_reads(self, blocks):
+        """
+        Reads the given blocks and returns one result tuple per block.
 
-            if should_extend:
-                current_block.append(sensor)
-            else:
-                blocks.append(current_block)
-                current_block = [sensor]
+        Returns:
+            List of (block, response, exception, rtt) tuples. Reading stops
+            early if the connection is lost.
+        """
+        if self._engine:
+            # Pipelined: several blocks in flight on the engine's connection
+            try:
+                return self._engine.read_blocks(blocks)
+            except Exception as e:
+                # Cycle budget exceeded: treat like a lost connection
+                logger.warning(f"Pipelined Modbus read failed: {e}", exc_info=True)
+                self._engine.close()
+                return [(blocks[0], None, e, 0.0)]
+
+        results = []
+        for block in blocks:
+            start = time.perf_counter()
+            try:
+                rr = self.client.read_holding_registers(
+                    block.start, count=block.count, device_id=1
+                )
+                results.append((block, rr, None, time.perf_counter() - start))
+            except Exception as e:
+                results.append((block, None, e, time.perf_counter() - start))
+                if not self.client.is_socket_open():
+                    break
+        return results
 
-        if current_block:
-            blocks.append(current_block)
+    def _decode_block(self, block, registers, data):
+        """Decodes all sensors of a block from the response registers."""
+        try:
+            if block.decoder is None:
+                block.decoder = self._decoder_class(
+                    block.sensors, block.start, block.count
+                )
+            values = block.decoder.decode_values(registers)
+        except (struct.error, TypeError, ValueError) as e:
+            # Response does not match the block layout, decode sensor by sensor
+            logger.debug(f"Bulk decoding of block {block.start} failed: {e}")
+            values = self._decode_block_by_sensor(block, registers)
+
+        for sensor, success, value in values:
+            if success:
+                # Handle Enums and Flags
+                if hasattr(value, "value"):
+                    data[sensor.name] = value.value
+                    data[f"{sensor.name}_str"] = str(value)
+                else:
+                    data[sensor.name] = value
+
+    def _process_block(self, block, registers, data):
+        """Decodes a block unless its registers equal the previous snapshot."""
+        if not CHANGE_DETECTION:
+            self._decode_block(block, registers, data)
+            return
+
+        registers = tuple(registers)
+        snapshot = self._snapshots.get(block.key)
+        if snapshot is not None and snapshot[0] == registers:
+            data.update(snapshot[1])
+            return
+
+        values = {}
+        self._decode_block(block, registers, values)
+        self._snapshots[block.key] = (registers, values)
+        data.update(values)
+
+    def _update_changes(self, data, full_refresh):
+        """Computes changed_sensors for the cycle that produced data."""
+        if full_refresh:
+            self.changed_sensors = set(data)
+        else:
+            last = self._last_data
+            self.changed_sensors = {
+                key
+                for key, value in data.items()
+                if key not in last or last[key] != value
+            }
+        self.full_refresh = full_refresh
+        self._last_data = data
+
+        # Drop snapshots of blocks that were split or merged
+        if len(self._snapshots) > len(self._planner.blocks):
+            keys = {b.key for b in self._planner.blocks}
+            self._snapshots = {k: v for k, v in self._snapshots.items() if k in keys}
+
+    def _decode_block_by_sensor(self, block, registers):
+        values = []
+        for sensor in block.sensors:
+            # Calculate offset in the response registers
+            offset = sensor.address - block.start
+            try:
+                success, value = sensor.decode(registers[offset : offset + sensor.size])
+                values.append((sensor, success, value))
+            except Exception as e:
+                logger.debug(f"Error decoding {sensor.name}: {e}")
+        return values
 
-        return blocks
+    @property
+    def poll_interval(self) -> float:
+        """Interval at which read_sensors() should be called."""
+        return self._tiers.tick_interval()
 
     def read_sensors(self):
+        """
+        Reads all sensors of the poll tiers that are due.
+
+        Returns:
+            Latest values of all sensors. Values of tiers that were not due
+            in this cycle are carried over from their last read.
+        """
         data = {}
-        if not self._ensure_connection():
+        if not self._ensure_connection(self._reader):
             if self._consecutive_failures == 1:
                 # Only log error on first failure to avoid log spam
                 logger.error("Could not connect to Modbus server")
@@ -279,73 +547,65 @@ class ModbusClient:
 
             # Build blocks if not cached
             if self._read_blocks is None:
-                self._read_blocks = self._build_read_blocks()
-                logger.info(
-                    f"Optimized Modbus reading: {len(self._read_blocks)} requests for {len(self.sensors) + len(self.binary_sensors)} sensors"
-                )
+                self._build_read_plan()
 
-            for block_idx, block in enumerate(self._read_blocks):
-                if not block:
-                    continue
-
-                start_addr = block[0].address
-                end_addr = max(s.address + s.size for s in block)
-                count = end_addr - start_addr
-
-                # Skip blocks that have failed multiple times
-                block_key = (start_addr, end_addr)
-                if block_key in self._failed_blocks:
-                    # Directly read individual sensors for known failed blocks
-                    self._read_block_individually(block, data)
-                    continue
+            now = time.time()
+            full_refresh = (
+                not CHANGE_DETECTION
+                or now - self._last_full_refresh >= FULL_REFRESH_INTERVAL
+            )
+            if full_refresh:
+                self._snapshots = {}
+                self._last_full_refresh = now
+
+            due_tiers = self._tiers.due(self._planner.tiers, now)
+            fresh = {tier: {} for tier in due_tiers}
+
+            pending = self._planner.due_blocks(due_tiers)
+            while pending:
+                retry = []
+                for block, rr, error, rtt in self._execute_reads(pending):
+                    if error is not None:
+                        logger.error(
+                            f"Exception reading block starting at {block.start}: {error}"
+                        )
+                        self._stats["total_read_errors"] += 1
+                        self._stats["last_error"] = str(error)
+                        if not self._reader.is_socket_open():
+                            # Connection lost: keep the plan, reconnect next cycle
+                            retry = []
+                            break
+                        retry.extend(self._planner.record_failure(block, False))
+                        continue
 
-                try:
-                    rr = self.client.read_holding_registers(
-                        start_addr, count=count, device_id=1
-                    )
                     if rr.isError():
                         # Check if this is an illegal address error (exception code 2)
-                        if hasattr(rr, "exception_code") and rr.exception_code == 2:
+                        illegal = getattr(rr, "exception_code", None) == 2
+                        if illegal:
                             logger.debug(
-                                f"Bulk read failed for block {start_addr}-{end_addr}: Illegal Data Address. Marking block for individual reads."
+                                f"Read failed for block {block.start}-{block.end}: Illegal Data Address. Splitting block."
                             )
-                            self._failed_blocks.add(block_key)
                         else:
                             logger.warning(
-                                f"Bulk read failed for block {start_addr}-{end_addr}: {rr}. Falling back to individual reads."
+                                f"Read failed for block {block.start}-{block.end}: {rr}. Splitting block."
                             )
-
-                        # Fallback to individual sensor reads
-                        self._read_block_individually(block, data)
+                        retry.extend(self._planner.record_failure(block, illegal))
                         continue
 
-                    # Parse sensors in this block
-                    for sensor in block:
-                        # Calculate offset in the response registers
-                        offset = sensor.address - start_addr
-                        sensor_registers = rr.registers[offset : offset + sensor.size]
-
-                        try:
-                            success, value = sensor.decode(sensor_registers)
-                            if success:
-                                # Handle Enums and Flags
-                                if hasattr(value, "value"):
-                                    data[sensor.name] = value.value
-                                    data[f"{sensor.name}_str"] = str(value)
-                                else:
-                                    data[sensor.name] = value
-                        except Exception as e:
-                            logger.debug(f"Error decoding {sensor.name}: {e}")
-
-                except Exception as e:
-                    logger.error(
-                        f"Exception reading block starting at {start_addr}: {e}"
-                    )
-                    self._stats["total_read_errors"] += 1
-                    self._stats["last_error"] = str(e)
-                    # Mark block as failed and use individual reads
-                    self._failed_blocks.add(block_key)
-                    self._read_block_individually(block, data)
+                    self._planner.record_success(block, rtt)
+                    self._process_block(block, rr.registers, fresh[block.tier])
+
+                pending = retry
+
+            self._planner.end_cycle()
+            self._read_blocks = self._planner.blocks
+            self._save_read_plan()
+
+            self._tiers.mark_read(due_tiers, now)
+            self._tier_values.update(fresh)
+            for values in self._tier_values.values():
+                data.update(values)
+            self._update_changes(data, full_refresh)
 
             # Update statistics on successful read
             if data:
@@ -360,29 +620,6 @@ class ModbusClient:
 
         return data
 
-    def _read_block_individually(self, block, data):
-        """Reads each sensor in a block individually and updates the data dictionary."""
-        for sensor in block:
-            try:
-                sensor_rr = self.client.read_holding_registers(
-                    sensor.address, count=sensor.size, device_id=1
-                )
-                if sensor_rr.isError():
-                    logger.debug(
-                        f"Individual read failed for {sensor.name} @ {sensor.address}: {sensor_rr}"
-                    )
-                    continue
-
-                success, value = sensor.decode(sensor_rr.registers)
-                if success:
-                    if hasattr(value, "value"):
-                        data[sensor.name] = value.value
-                        data[f"{sensor.name}_str"] = str(value)
-                    else:
-                        data[sensor.name] = value
-            except Exception as e:
-                logger.debug(f"Exception reading individual sensor {sensor.name}: {e}")
-
     def write_sensor(self, name, value):
         if name not in self.sensors and name not in self.binary_sensors:
             raise ValueError(f"Sensor {name} not found")
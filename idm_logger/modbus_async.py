@@ -0,0 +1,289 @@
+# SPDX-License-Identifier: MIT
+"""
+Pipelined asyncio Modbus TCP engine.
+
+Modbus TCP allows several requests to be in flight on one connection; each
+response carries the transaction id of its request. pymodbus'
+AsyncModbusTcpClient serialises requests behind a lock, so this engine
+drives the connection itself and only uses pymodbus for framing (MBAP
+header) and PDU encoding/decoding. Responses are therefore the same
+pymodbus response objects the synchronous client returns.
+
+The engine runs its own event loop in a daemon thread and exposes a small
+blocking API so it can be used from the synchronous polling loop.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+
+from pymodbus.framer import FramerSocket
+from pymodbus.pdu import DecodePDU, ReadHoldingRegistersRequest
+
+logger = logging.getLogger(__name__)
+
+# Consecutive cycles without pipelining speed-up before falling back to depth 1
+SERIAL_DETECTION_CYCLES = 3
+
+# Pipelined cycles must be at least this much faster than sequential reads
+MIN_PIPELINE_SPEEDUP = 1.2
+
+# Smoothing factor for the sequential round-trip time baseline
+RTT_ALPHA = 0.2
+
+MAX_TRANSACTION_ID = 65000
+
+
+class PipelinedModbusEngine:
+    """Reads register blocks with several Modbus transactions in flight."""
+
+    def __init__(self, host, port, pipeline_depth=4, timeout=10, device_id=1):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.device_id = device_id
+        self.configured_depth = max(1, int(pipeline_depth))
+        # Start sequentially to measure a round-trip baseline first
+        self.pipeline_depth = 1
+        self.fallback_reason = None
+
+        self._framer = FramerSocket(DecodePDU(False))
+        self._reader = None
+        self._writer = None
+        self._recv_task = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._next_tid = 0
+
+        self._baseline_rtt = None
+        self._slow_cycles = 0
+        self._stats = {
+            "requests": 0,
+            "timeouts": 0,
+            "pipelined_cycles": 0,
+            "last_cycle_seconds": None,
+        }
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="modbus-async", daemon=True
+        )
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Blocking API (called from the polling thread)
+    # ------------------------------------------------------------------
+
+    def _run(self, coro, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout)
+
+    def connect(self) -> bool:
+        """Opens the TCP connection. Returns True on success."""
+        try:
+            return self._run(self._connect(), timeout=self.timeout + 1)
+        except Exception as e:
+            logger.debug(f"Async Modbus connect failed: {e}", exc_info=True)
+            return False
+
+    def is_socket_open(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def close(self):
+        if self._loop.is_running():
+            try:
+                self._run(self._close(), timeout=self.timeout)
+            except Exception as e:
+                logger.debug(
+                    f"Error closing async Modbus connection: {e}", exc_info=True
+                )
+
+    def stop(self):
+        """Closes the connection and stops the event loop thread."""
+        self.close()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=2.0)
+
+    def read_blocks(self, blocks):
+        """
+        Reads all blocks, keeping up to pipeline_depth requests in flight.
+
+        Returns:
+            List of (block, response, exception, rtt) tuples in block order,
+            matching ModbusClient._execute_reads().
+        """
+        if not blocks:
+            return []
+        # Worst case every request waits for its own timeout in sequence
+        budget = self.timeout * (len(blocks) / self.pipeline_depth + 1) + 1
+        return self._run(self._read_blocks(blocks), timeout=budget)
+
+    def get_stats(self) -> dict:
+        stats = self._stats.copy()
+        stats["pipeline_depth"] = self.pipeline_depth
+        stats["configured_depth"] = self.configured_depth
+        stats["fallback_reason"] = self.fallback_reason
+        stats["baseline_rtt_ms"] = (
+            round(self._baseline_rtt * 1000, 2) if self._baseline_rtt else None
+        )
+        return stats
+
+    # ------------------------------------------------------------------
+    # Event loop side
+    # ------------------------------------------------------------------
+
+    async def _connect(self) -> bool:
+        if self.is_socket_open():
+            return True
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), timeout=self.timeout
+        )
+        self._recv_task = asyncio.create_task(self._receive_loop(self._reader))
+        return True
+
+    async def _close(self):
+        writer, self._writer = self._writer, None
+        if self._recv_task:
+            self._recv_task.cancel()
+            self._recv_task = None
+        if writer:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception as e:
+                logger.debug(f"Error closing Modbus socket: {e}", exc_info=True)
+        self._fail_pending(ConnectionError("Connection closed"))
+
+    def _fail_pending(self, error):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def _receive_loop(self, reader):
+        """Dispatches incoming responses to their waiting requests by tid."""
+        buffer = b""
+        try:
+            while True:
+                chunk = await reader.read(4096)
+                if not chunk:
+                    raise ConnectionError("Connection closed by device")
+                buffer += chunk
+                while buffer:
+                    used, pdu = self._framer.handleFrame(buffer, 0, 0)
+                    if not used:
+                        break
+                    buffer = buffer[used:]
+                    if pdu is None:
+                        continue
+                    future = self._pending.pop(pdu.transaction_id, None)
+                    if future and not future.done():
+                        future.set_result(pdu)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.debug(f"Async Modbus receive loop ended: {e}", exc_info=True)
+            if self._writer:
+                self._writer.close()
+                self._writer = None
+            self._fail_pending(ConnectionError(str(e)))
+
+    def _get_next_tid(self) -> int:
+        self._next_tid = self._next_tid % MAX_TRANSACTION_ID + 1
+        return self._next_tid
+
+    async def _request(self, block, window):
+        async with window:
+            start = time.perf_counter()
+            try:
+                if not self.is_socket_open():
+                    raise ConnectionError("Not connected")
+                tid = self._get_next_tid()
+                request = ReadHoldingRegistersRequest(
+                    address=block.start,
+                    count=block.count,
+                    dev_id=self.device_id,
+                    transaction_id=tid,
+                )
+                future = self._loop.create_future()
+                self._pending[tid] = future
+                self._writer.write(self._framer.buildFrame(request))
+                await self._writer.drain()
+                self._stats["requests"] += 1
+                try:
+                    response = await asyncio.wait_for(future, timeout=self.timeout)
+                except TimeoutError:
+                    self._pending.pop(tid, None)
+                    self._stats["timeouts"] += 1
+                    raise TimeoutError(
+                        f"No response for block {block.start} within {self.timeout}s"
+                    )
+                return (block, response, None, time.perf_counter() - start)
+            except Exception as e:  # noqa: BLE001 - returned per block like the sync reads
+                return (block, None, e, time.perf_counter() - start)
+
+    async def _read_blocks(self, blocks):
+        depth = self.pipeline_depth
+        window = asyncio.Semaphore(depth)
+        start = time.perf_counter()
+        results = await asyncio.gather(*(self._request(b, window) for b in blocks))
+        elapsed = time.perf_counter() - start
+        self._stats["last_cycle_seconds"] = round(elapsed, 4)
+        self._adapt_depth(depth, results, elapsed)
+        return list(results)
+
+    def _adapt_depth(self, depth, results, elapsed):
+        """Switches between pipelined and sequential mode based on the cycle."""
+        errors = [r for r in results if r[2] is not None]
+        ok = [r for r in results if r[2] is None]
+
+        if depth == 1:
+            # Sequential cycle: update the baseline, then try pipelining
+            if ok:
+                rtt = sum(r[3] for r in ok) / len(ok)
+                if self._baseline_rtt is None:
+                    self._baseline_rtt = rtt
+                else:
+                    self._baseline_rtt = (
+                        1 - RTT_ALPHA
+                    ) * self._baseline_rtt + RTT_ALPHA * rtt
+            if (
+                self.fallback_reason is None
+                and self.configured_depth > 1
+                and self._baseline_rtt is not None
+            ):
+                self.pipeline_depth = self.configured_depth
+                logger.info(
+                    f"Modbus pipelining enabled (depth {self.pipeline_depth}, "
+                    f"baseline RTT {self._baseline_rtt * 1000:.1f}ms)"
+                )
+            return
+
+        self._stats["pipelined_cycles"] += 1
+
+        # Devices that cannot handle concurrent transactions drop requests
+        # or the connection. Fall back immediately.
+        if any(isinstance(r[2], (TimeoutError, ConnectionError)) for r in errors):
+            self._fall_back("requests lost while pipelining")
+            return
+
+        if len(results) <= depth or not self._baseline_rtt:
+            return
+
+        # A serialising device answers one request after the other, so the
+        # cycle takes as long as reading sequentially.
+        per_request = elapsed / len(results)
+        if per_request * MIN_PIPELINE_SPEEDUP > self._baseline_rtt:
+            self._slow_cycles += 1
+            if self._slow_cycles >= SERIAL_DETECTION_CYCLES:
+                self._fall_back("device serialises requests")
+        else:
+            self._slow_cycles = 0
+
+    def _fall_back(self, reason):
+        if self.pipeline_depth == 1:
+            return
+        logger.warning(f"Modbus pipelining disabled: {reason}. Using depth 1.")
+        self.pipeline_depth = 1
+        self.fallback_reason = reason
+        self._slow_cycles = 0
@@ -313,7 +313,7 @@ class MQTTPublisher:
 
         logger.info(f"Published HA Discovery for {len(all_sensors)} entities")
 
-    def publish_data(self, data):
+    def publish_data(self, data, device=None, changed=None):
         """
         Publish sensor data to MQTT.
 
@@ -321,6 +321,11 @@ class MQTTPublisher:
             data: Flat dictionary of sensor data from modbus.read_sensors(),
                   where keys are sensor names and values are readings.
                   Can include optional keys with "_str" suffix for string representations.
+            device: Heat pump name in multi-device setups. Data is published
+                  below "<topic_prefix>/<device>".
+            changed: Keys that changed since the previous cycle. With
+                  mqtt.publish_on_change only these are published (retained,
+                  so new subscribers still get every value).
         """
         if not config.get("mqtt.enabled", False):
             return
@@ -330,14 +335,24 @@ class MQTTPublisher:
             return
 
         topic_prefix = config.get("mqtt.topic_prefix", "idm/heatpump")
+        if device:
+            topic_prefix = f"{topic_prefix}/{device}"
         qos = config.get("mqtt.qos", 1)
 
+        only_changed = changed is not None and config.get(
+            "mqtt.publish_on_change", False
+        )
+        if only_changed and not changed:
+            return
+
         try:
             # Publish each sensor value to its own topic
             for sensor_name, value in data.items():
                 # Skip the string-representation variants of enums
                 if sensor_name.endswith("_str"):
                     continue
+                if only_changed and sensor_name not in changed:
+                    continue
 
                 # Handle legacy nested dictionary format if present
                 if isinstance(value, dict) and "value" in value:
@@ -361,7 +376,7 @@ class MQTTPublisher:
                 # Publish to individual topic
                 topic = f"{topic_prefix}/{sensor_name}"
                 result = self.client.publish(
-                    topic, json.dumps(payload), qos=qos, retain=False
+                    topic, json.dumps(payload), qos=qos, retain=only_changed
                 )
                 if result.rc != mqtt.MQTT_ERR_SUCCESS:
                     logger.warning(
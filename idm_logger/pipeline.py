@@ -0,0 +1,249 @@
+# SPDX-License-Identifier: MIT
+"""
+Fan-out bus between the Modbus poller and the data consumers.
+
+The poller publishes one immutable Snapshot per device and tick. Every
+consumer (web/websocket, alerts, metrics, MQTT) runs on its own thread and
+drains its own bounded queue, so a slow notification or a stuck MQTT
+publish no longer delays the next read.
+
+When a consumer falls behind, its queue policy decides what happens:
+
+- ``drop_oldest``: discard the oldest queued snapshot (latest data wins)
+- ``drop_newest``: discard the snapshot being published
+- ``block``: wait up to ``block_timeout`` seconds for space, then drop the
+  new snapshot (backpressure on the poller)
+
+The ``changed`` keys of dropped snapshots are not lost: they are added to
+the next snapshot of the same device the consumer handles, so consumers
+that only act on changes (MQTT publish_on_change, websocket deltas,
+alerts.only_changed) still see them.
+
+Queue sizes and policies can be changed per consumer with
+``pipeline.<consumer>.queue_size`` / ``.policy`` / ``.block_timeout``.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# Consumer defaults: (queue size, policy)
+DEFAULT_CONSUMERS = {
+    "web": (10, "drop_oldest"),
+    "alerts": (10, "drop_oldest"),
+    "metrics": (100, "block"),
+    "mqtt": (10, "drop_oldest"),
+}
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Sensor values of one device at one tick."""
+
+    data: Mapping
+    device: str | None = None
+    changed: frozenset | None = None
+    timestamp: float | None = None
+    published_at: float = field(default_factory=time.monotonic, compare=False)
+
+    @classmethod
+    def create(cls, data: dict, device=None, changed=None, timestamp=None):
+        """Build a snapshot from mutable poller output (copied)."""
+        return cls(
+            data=MappingProxyType(dict(data)),
+            device=device,
+            changed=frozenset(changed) if changed is not None else None,
+            timestamp=timestamp,
+        )
+
+
+class Consumer:
+    """A consumer thread with its own bounded snapshot queue."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[Snapshot], None],
+        queue_size: int = 10,
+        policy: str = "drop_oldest",
+        block_timeout: float = 1.0,
+    ):
+        if policy not in POLICIES:
+            logger.warning(
+                f"Unknown queue policy '{policy}' for consumer {name}, using 'drop_oldest'"
+            )
+            policy = "drop_oldest"
+        self.name = name
+        self.handler = handler
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+
+        self.published = 0
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+        # Changes of dropped snapshots per device:
+        # {device: (changed keys or None for all, published_at of the last drop)}
+        self._missed = {}
+        self._missed_lock = threading.Lock()
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"pipeline-{name}", daemon=True
+        )
+        self._thread.start()
+
+    def offer(self, snapshot: Snapshot) -> bool:
+        """Queue a snapshot according to the queue policy."""
+        self.published += 1
+        try:
+            if self.policy == "block":
+                self.queue.put(snapshot, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(snapshot)
+            return True
+        except queue.Full:
+            pass
+
+        if self.policy == "drop_oldest":
+            try:
+                dropped = self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+                self._record_missed(dropped)
+                self.queue.put_nowait(snapshot)
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+
+        self.dropped += 1
+        self._record_missed(snapshot)
+        logger.debug(f"Pipeline consumer {self.name} is behind, dropped snapshot")
+        return False
+
+    def _record_missed(self, snapshot):
+        """Keep the changes of a dropped snapshot for the next one handled."""
+        if snapshot is None:
+            return
+        with self._missed_lock:
+            missed, dropped_at = self._missed.get(snapshot.device, (frozenset(), 0.0))
+            if missed is not None and snapshot.changed is not None:
+                missed = missed | snapshot.changed
+            else:
+                missed = None
+            self._missed[snapshot.device] = (
+                missed,
+                max(dropped_at, snapshot.published_at),
+            )
+
+    def _with_missed(self, snapshot: Snapshot) -> Snapshot:
+        """Add the changes of dropped snapshots published before this one."""
+        with self._missed_lock:
+            entry = self._missed.get(snapshot.device)
+            # Snapshots older than the drop do not carry its newer values
+            if entry is None or snapshot.published_at <= entry[1]:
+                return snapshot
+            del self._missed[snapshot.device]
+        if snapshot.changed is None:
+            return snapshot
+        missed = entry[0]
+        changed = None if missed is None else snapshot.changed | missed
+        return replace(snapshot, changed=changed)
+
+    def _run(self):
+        while True:
+            snapshot = self.queue.get()
+            try:
+                if snapshot is None:
+                    return
+                self.last_lag = time.monotonic() - snapshot.published_at
+                self.max_lag = max(self.max_lag, self.last_lag)
+                self.handler(self._with_missed(snapshot))
+                self.processed += 1
+            except Exception:
+                self.errors += 1
+                logger.exception(f"Pipeline consumer {self.name} failed")
+            finally:
+                self.queue.task_done()
+
+    def stop(self, timeout: float = 5.0):
+        """Process what is queued, then stop the thread."""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning(f"Pipeline consumer {self.name} did not drain in time")
+            return
+        self._thread.join(timeout=timeout)
+
+    def get_stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "queue_size": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "published": self.published,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_lag_seconds": round(self.last_lag, 3),
+            "max_lag_seconds": round(self.max_lag, 3),
+        }
+
+
+class SnapshotBus:
+    """Publishes snapshots to all subscribed consumers."""
+
+    def __init__(self):
+        self.consumers: dict[str, Consumer] = {}
+
+    def subscribe(self, name: str, handler: Callable[[Snapshot], None]) -> Consumer:
+        """
+        Register a consumer with its own thread and queue.
+
+        Args:
+            name: Consumer name, also the config key below ``pipeline.``
+            handler: Called with every snapshot on the consumer thread
+        """
+        size, policy = DEFAULT_CONSUMERS.get(name, (10, "drop_oldest"))
+        consumer = Consumer(
+            name,
+            handler,
+            queue_size=config.get(f"pipeline.{name}.queue_size", size),
+            policy=config.get(f"pipeline.{name}.policy", policy),
+            block_timeout=config.get(f"pipeline.{name}.block_timeout", 1.0),
+        )
+        self.consumers[name] = consumer
+        return consumer
+
+    def publish(self, snapshot: Snapshot):
+        for consumer in self.consumers.values():
+            consumer.offer(snapshot)
+
+    def stop(self, timeout: float = 5.0):
+        for consumer in self.consumers.values():
+            consumer.stop(timeout)
+
+    def get_stats(self) -> dict:
+        return {name: c.get_stats() for name, c in self.consumers.items()}
+
+    def get_metrics(self) -> dict:
+        """Queue health as numeric fields for the metrics writer."""
+        metrics = {}
+        for name, consumer in self.consumers.items():
+            metrics[f"pipeline_{name}_queue_size"] = consumer.queue.qsize()
+            metrics[f"pipeline_{name}_dropped_total"] = consumer.dropped
+            metrics[f"pipeline_{name}_errors_total"] = consumer.errors
+            metrics[f"pipeline_{name}_lag_seconds"] = round(consumer.last_lag, 3)
+        return metrics
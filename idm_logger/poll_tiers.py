@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: MIT
+"""
+Tiered polling: per-sensor poll intervals.
+
+Most IDM registers (setpoints, modes, zone configuration) change rarely,
+while temperatures and power are worth sampling often. With
+``modbus.tiered_polling`` enabled every sensor is assigned a poll tier and
+each tier is read at its own interval:
+
+- ``fast``: temperatures and power (default every 5s)
+- ``energy``: energy counters (default every 60s)
+- ``slow``: writable setpoints and modes (default every 300s)
+- ``default``: everything else, read every ``logging.interval``
+  (every second in realtime mode)
+
+Tiers and assignments can be changed with ``modbus.tier_intervals`` and
+``modbus.sensor_tiers`` (sensor name or fnmatch pattern -> tier).
+The read planner keeps separate blocks per tier, and all tiers due at the
+same tick are read in one round.
+"""
+
+import fnmatch
+import logging
+
+from .config import config
+from .read_planner import DEFAULT_TIER
+from .sensor_addresses import (
+    SensorFeatures,
+    UnitOfEnergy,
+    UnitOfPower,
+    UnitOfTemperature,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIER_INTERVALS = {"fast": 5, "energy": 60, "slow": 300}
+
+
+def base_interval() -> float:
+    """Interval of the default tier (the classic global poll interval)."""
+    if config.get("logging.realtime_mode", False):
+        return 1
+    return config.get("logging.interval", 60)
+
+
+def default_tier(sensor) -> str:
+    """Built-in tier assignment based on the sensor definition."""
+    if sensor.supported_features != SensorFeatures.NONE:
+        return "slow"
+    unit = getattr(sensor, "unit", None)
+    if unit == UnitOfEnergy.KILO_WATT_HOUR:
+        return "energy"
+    if unit in (UnitOfPower.KILO_WATT, UnitOfTemperature.CELSIUS):
+        return "fast"
+    return DEFAULT_TIER
+
+
+class PollTiers:
+    """Assigns sensors to poll tiers and tracks which tiers are due."""
+
+    def __init__(self, enabled=None, intervals=None, overrides=None):
+        self.enabled = (
+            config.get("modbus.tiered_polling", False) if enabled is None else enabled
+        )
+        self.intervals = dict(DEFAULT_TIER_INTERVALS)
+        self.intervals.update(
+            config.get("modbus.tier_intervals", {}) if intervals is None else intervals
+        )
+        self.overrides = (
+            config.get("modbus.sensor_tiers", {}) if overrides is None else overrides
+        )
+        self._last_read: dict[str, float] = {}
+
+    def tier_of(self, sensor) -> str:
+        if not self.enabled:
+            return DEFAULT_TIER
+        tier = self.overrides.get(sensor.name)
+        if tier is None:
+            for pattern, pattern_tier in self.overrides.items():
+                if fnmatch.fnmatchcase(sensor.name, pattern):
+                    tier = pattern_tier
+                    break
+        if tier is None:
+            tier = default_tier(sensor)
+        if tier != DEFAULT_TIER and tier not in self.intervals:
+            logger.warning(f"Unknown poll tier '{tier}' for {sensor.name}")
+            return DEFAULT_TIER
+        return tier
+
+    def interval(self, tier: str) -> float:
+        if tier == DEFAULT_TIER:
+            return base_interval()
+        return float(self.intervals[tier])
+
+    def tick_interval(self) -> float:
+        """Main loop interval: the shortest interval of all tiers."""
+        if not self.enabled:
+            return base_interval()
+        return min([base_interval()] + [float(i) for i in self.intervals.values()])
+
+    def due(self, tiers, now: float) -> set[str]:
+        """
+        Returns the tiers that should be read at this tick.
+
+        A tier is due if its interval has elapsed, with half a tick of
+        tolerance so loop jitter does not postpone it by a whole tick.
+        """
+        if not self.enabled:
+            return set(tiers)
+        tolerance = self.tick_interval() / 2
+        return {
+            tier
+            for tier in tiers
+            if tier not in self._last_read
+            or now - self._last_read[tier] + tolerance >= self.interval(tier)
+        }
+
+    def mark_read(self, tiers, now: float):
+        for tier in tiers:
+            self._last_read[tier] = now
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "intervals": {
+                tier: self.interval(tier)
+                for tier in [DEFAULT_TIER] + list(self.intervals)
+            },
+            "last_read": dict(self._last_read),
+        }
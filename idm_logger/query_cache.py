@@ -0,0 +1,218 @@
+# SPDX-License-Identifier: MIT
+"""
+Read-through cache for VictoriaMetrics range queries.
+
+Dashboards refresh their charts every few seconds with a sliding window
+(e.g. the last 12 hours), so consecutive requests for the same query and
+step overlap almost completely. Results are split into chunks of
+``chunk_points`` steps on an absolute time grid (multiples of the chunk
+span), keyed by (query, step, chunk). A request is served from the cached
+chunks it covers; only the chunks that are missing, usually just the tail
+up to now, are fetched from VictoriaMetrics.
+
+Chunks younger than ``min_age`` seconds are never cached, because samples
+for them may still arrive (VictoriaMetrics itself does not cache the last
+5 minutes either). Chunks are evicted least recently used once the cache
+exceeds ``max_bytes``.
+
+On a fixed step grid the point at t only depends on t, so lookbehind
+windows (``rate(x[5m])``), subqueries and offsets are cached like plain
+selectors. Functions that depend on the start or end of the queried range
+(``running_*``, ``range_*``, ``keep_last_value``, ``interpolate`` and the
+like) and ``@`` modifiers (``@ start()``, ``@ end()``) would give different
+points per chunk; such queries are passed through uncached.
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+_DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)(ms|s|m|h|d|w)?$")
+
+# Functions and modifiers whose points depend on the queried range
+_UNCACHEABLE_RE = re.compile(
+    r"@|\b(?:running_\w+|range_\w+|keep_last_value|keep_next_value|interpolate"
+    r"|remove_resets|smooth_exponential)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def parse_step(value) -> float | None:
+    """Step in seconds from a number or a duration like "30s" or "5m"."""
+    if value is None:
+        return None
+    match = _DURATION_RE.match(str(value).strip())
+    if not match:
+        return None
+    step = float(match.group(1)) * _DURATION_UNITS[match.group(2) or "s"]
+    return step if step > 0 else None
+
+
+def parse_time(value) -> float | None:
+    """Unix timestamp in seconds (RFC 3339 times are not cached)."""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RangeQueryCache:
+    """Step-aligned chunk cache for ``/api/v1/query_range`` results."""
+
+    def __init__(
+        self,
+        max_bytes: int = 32 * 1024 * 1024,
+        chunk_points: int = 120,
+        min_age: float = 300.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            max_bytes: Max size of the cached chunks (JSON size)
+            chunk_points: Steps per chunk
+            min_age: Seconds a chunk must be over before it is cached
+            clock: Wall clock (tests)
+        """
+        self.max_bytes = max_bytes
+        self.chunk_points = max(1, int(chunk_points))
+        self.min_age = min_age
+        self._clock = clock
+        # (query, step, chunk index) -> ({series key: (metric, values)}, size)
+        self._chunks: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    def query(
+        self,
+        query: str,
+        start: float,
+        end: float,
+        step: float,
+        fetch: Callable[[float, float], dict],
+    ) -> dict:
+        """
+        Range query result for the step-aligned range [start, end].
+
+        Args:
+            fetch: ``fetch(start, end)`` runs the query against
+                VictoriaMetrics and returns the decoded JSON response; errors
+                are raised to the caller
+
+        Returns:
+            VictoriaMetrics response with resultType "matrix"
+        """
+        if _UNCACHEABLE_RE.search(query):
+            self.bypassed += 1
+            return fetch(start, end)
+
+        start = math.floor(start / step) * step
+        end = math.floor(end / step) * step
+        span = step * self.chunk_points
+        first, last = int(start // span), int(end // span)
+        # Chunks ending before this index may be cached
+        cacheable = int((self._clock() - self.min_age) // span)
+
+        chunks = {}
+        with self._lock:
+            for index in range(first, last + 1):
+                entry = self._chunks.get((query, step, index))
+                if entry is None:
+                    break
+                self._chunks.move_to_end((query, step, index))
+                chunks[index] = entry[0]
+            self.hits += len(chunks)
+            self.misses += last - first + 1 - len(chunks)
+
+        missing = first + len(chunks)
+        if missing <= last:
+            # Chunks that will be cached are fetched completely, the rest
+            # only as far as requested
+            fetch_start = missing * span if missing < cacheable else start
+            fetch_end = (last + 1) * span - step if last < cacheable else end
+            result = fetch(max(fetch_start, missing * span), fetch_end)
+            self.fetches += 1
+            data = result.get("data") or {}
+            if result.get("status") != "success" or data.get("resultType") != "matrix":
+                return result
+
+            fetched = {index: {} for index in range(missing, last + 1)}
+            for series in data.get("result", []):
+                metric = series.get("metric", {})
+                key = tuple(sorted(metric.items()))
+                for point in series.get("values", []):
+                    chunk = fetched.get(int(float(point[0]) // span))
+                    if chunk is not None:
+                        chunk.setdefault(key, (metric, []))[1].append(point)
+
+            for index, chunk in fetched.items():
+                chunks[index] = chunk
+                if index < cacheable and not result.get("isPartial"):
+                    self._store((query, step, index), chunk)
+
+        return self._assemble(chunks, start, end)
+
+    def _store(self, key: tuple, chunk: dict):
+        size = len(json.dumps(list(chunk.values()), separators=(",", ":"))) + 64
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._chunks.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._chunks[key] = (chunk, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._chunks.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    @staticmethod
+    def _assemble(chunks: dict, start: float, end: float) -> dict:
+        series = {}
+        for index in sorted(chunks):
+            for key, (metric, values) in chunks[index].items():
+                merged = series.setdefault(key, {"metric": metric, "values": []})
+                merged["values"].extend(
+                    point for point in values if start <= float(point[0]) <= end
+                )
+        return {
+            "status": "success",
+            "data": {
+                "resultType": "matrix",
+                "result": [s for s in series.values() if s["values"]],
+            },
+        }
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "chunks": len(self._chunks),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "fetches": self.fetches,
+                "evictions": self.evictions,
+                "bypassed": self.bypassed,
+            }
@@ -0,0 +1,447 @@
+# SPDX-License-Identifier: MIT
+"""
+Adaptive Modbus read planner.
+
+Groups sensors into contiguous register blocks and adapts the layout to what
+the connected heat pump actually accepts:
+
+- Failed blocks are split in half (binary search) instead of being demoted
+  to one request per sensor, so a single illegal register costs O(log n)
+  extra requests once instead of n requests on every cycle.
+- Sensors whose registers are rejected on their own are remembered as known
+  bad and only retried occasionally (firmware updates may enable them).
+- Split halves that keep succeeding are merged back into their parent block.
+  If the parent fails again, the next merge attempt is delayed exponentially.
+- Round-trip time and error rate are tracked per block for diagnostics.
+
+The learned plan can be exported with ``to_dict()`` and restored with
+``from_dict()`` so it survives restarts.
+
+With tiered polling (see poll_tiers.py) each poll tier gets its own blocks,
+so sensors of different tiers never share a request.
+"""
+
+import logging
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+# Hard protocol limit for "read holding registers" (function code 3)
+MODBUS_MAX_REGISTERS = 125
+
+# Smoothing factor for the per-block round-trip time average
+RTT_ALPHA = 0.2
+
+# Upper bound for the exponential re-merge backoff (in cycles)
+MAX_REMERGE_BACKOFF = 100_000
+
+# Tier of all blocks when tiered polling is disabled
+DEFAULT_TIER = "default"
+
+
+def group_sensors(sensors, forbidden_addresses, max_block_size, max_gap):
+    """
+    Group read-supported sensors into contiguous blocks.
+
+    Args:
+        sensors: Iterable of sensor addresses that should be read
+        forbidden_addresses: Registers that must never be part of a request
+        max_block_size: Max registers per request
+        max_gap: Max number of unused registers to bridge inside a block
+
+    Returns:
+        List of sensor lists, sorted by address
+    """
+    all_sensors = sorted(sensors, key=lambda s: s.address)
+    blocks = []
+    if not all_sensors:
+        return blocks
+
+    current_block = [all_sensors[0]]
+
+    for sensor in all_sensors[1:]:
+        prev_sensor = current_block[-1]
+        prev_end = prev_sensor.address + prev_sensor.size
+        gap = sensor.address - prev_end
+
+        should_extend = True
+
+        # 1. Check max block size (current block + gap + new sensor)
+        new_block_size = (sensor.address + sensor.size) - current_block[0].address
+        if new_block_size > max_block_size:
+            should_extend = False
+
+        # 2. Check max gap
+        if gap > max_gap:
+            should_extend = False
+
+        # 3. Check for forbidden addresses in the gap
+        if should_extend and gap > 0:
+            for addr in range(prev_end, sensor.address):
+                if addr in forbidden_addresses:
+                    should_extend = False
+                    break
+
+        if should_extend:
+            current_block.append(sensor)
+        else:
+            blocks.append(current_block)
+            current_block = [sensor]
+
+    blocks.append(current_block)
+    return blocks
+
+
+@dataclass
+class ReadBlock:
+    """A single read request covering one or more sensors."""
+
+    sensors: list
+    # Poll tier the sensors of this block belong to
+    tier: str = DEFAULT_TIER
+    # Spans (start, end) of the blocks this one was split from, outermost first
+    lineage: list = field(default_factory=list)
+    reads: int = 0
+    errors: int = 0
+    # Consecutive successful reads since the last failure or split
+    successes: int = 0
+    rtt_avg: float | None = None
+    # Set when a single-sensor block was rejected with "illegal data address"
+    bad: bool = False
+    bad_since_cycle: int = 0
+    # Compiled BlockDecoder, built on first successful read
+    decoder: object = field(default=None, repr=False, compare=False)
+
+    @property
+    def start(self) -> int:
+        return self.sensors[0].address
+
+    @property
+    def end(self) -> int:
+        return max(s.address + s.size for s in self.sensors)
+
+    @property
+    def count(self) -> int:
+        return self.end - self.start
+
+    @property
+    def key(self) -> tuple:
+        return (self.start, self.end)
+
+    @property
+    def parent(self) -> tuple | None:
+        return self.lineage[-1] if self.lineage else None
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.reads if self.reads else 0.0
+
+
+class ReadPlanner:
+    """Maintains the read plan for one Modbus device and adapts it over time."""
+
+    def __init__(
+        self,
+        max_block_size=50,
+        max_gap=5,
+        remerge_after=100,
+        bad_retry_cycles=1000,
+    ):
+        self.max_block_size = max(1, min(int(max_block_size), MODBUS_MAX_REGISTERS))
+        self.max_gap = max(0, int(max_gap))
+        self.remerge_after = max(1, int(remerge_after))
+        self.bad_retry_cycles = max(1, int(bad_retry_cycles))
+
+        self.blocks: list[ReadBlock] = []
+        self.bad_addresses: set[int] = set()
+        self._remerge_backoff: dict[tuple, int] = {}
+        self._cycle = 0
+        self._stats = {"splits": 0, "merges": 0, "merge_failures": 0}
+        # Incremented whenever the block layout or the bad register set changes
+        self.layout_version = 0
+
+    def reset(self):
+        """Forget the learned layout."""
+        self.blocks = []
+        self.bad_addresses = set()
+        self._remerge_backoff = {}
+        self._cycle = 0
+        self.layout_version += 1
+
+    def build(self, sensors, forbidden_addresses, tier_of=None):
+        """
+        Build the initial plan from a list of read-supported sensors.
+
+        Args:
+            sensors: Sensors to read
+            forbidden_addresses: Registers that must never be part of a request
+            tier_of: Optional callable returning the poll tier of a sensor.
+                Sensors of different tiers are grouped separately.
+        """
+        by_tier = {}
+        for sensor in sensors:
+            tier = tier_of(sensor) if tier_of else DEFAULT_TIER
+            by_tier.setdefault(tier, []).append(sensor)
+
+        blocks = []
+        for tier, tier_sensors in by_tier.items():
+            groups = group_sensors(
+                tier_sensors, forbidden_addresses, self.max_block_size, self.max_gap
+            )
+            blocks.extend(ReadBlock(sensors=g, tier=tier) for g in groups)
+        self.blocks = sorted(blocks, key=lambda b: b.start)
+        self.layout_version += 1
+        return self.blocks
+
+    @property
+    def tiers(self) -> set[str]:
+        return {block.tier for block in self.blocks}
+
+    def due_blocks(self, tiers=None) -> list[ReadBlock]:
+        """
+        Return the blocks that should be read in the current cycle.
+
+        Args:
+            tiers: Poll tiers due in this cycle (None means all)
+        """
+        due = []
+        for block in self.blocks:
+            if tiers is not None and block.tier not in tiers:
+                continue
+            # Retry known-bad sensors only occasionally
+            if (
+                block.bad
+                and (self._cycle - block.bad_since_cycle) < self.bad_retry_cycles
+            ):
+                continue
+            due.append(block)
+        return due
+
+    def record_success(self, block: ReadBlock, rtt: float):
+        """Record a successful read of a block."""
+        block.reads += 1
+        block.successes += 1
+        if block.rtt_avg is None:
+            block.rtt_avg = rtt
+        else:
+            block.rtt_avg = (1 - RTT_ALPHA) * block.rtt_avg + RTT_ALPHA * rtt
+
+        if block.bad:
+            logger.info(
+                f"Register {block.start} is readable again, removing from known-bad list"
+            )
+            block.bad = False
+            for addr in range(block.start, block.end):
+                self.bad_addresses.discard(addr)
+            self.layout_version += 1
+
+    def record_failure(self, block: ReadBlock, illegal_address: bool):
+        """
+        Record a failed read of a block.
+
+        Multi-sensor blocks are replaced by their two halves, which are
+        returned so the caller can read them within the same cycle.
+        Single-sensor blocks rejected with "illegal data address" are marked
+        as known bad.
+
+        Returns:
+            List of blocks that should be read instead (may be empty)
+        """
+        block.reads += 1
+        block.errors += 1
+        block.successes = 0
+
+        if len(block.sensors) == 1:
+            if illegal_address:
+                if not block.bad:
+                    logger.info(
+                        f"Register {block.start} ({block.sensors[0].name}) rejected "
+                        f"by device, marking as known bad"
+                    )
+                    self.layout_version += 1
+                block.bad = True
+                block.bad_since_cycle = self._cycle
+                self.bad_addresses.update(range(block.start, block.end))
+            return []
+
+        # A re-merged block failed again: back off before the next merge attempt
+        span = block.key
+        if span in self._remerge_backoff:
+            self._remerge_backoff[span] = min(
+                self._remerge_backoff[span] * 2, MAX_REMERGE_BACKOFF
+            )
+            self._stats["merge_failures"] += 1
+        else:
+            self._remerge_backoff[span] = self.remerge_after
+
+        mid = len(block.sensors) // 2
+        lineage = block.lineage + [span]
+        halves = [
+            ReadBlock(
+                sensors=block.sensors[:mid], tier=block.tier, lineage=list(lineage)
+            ),
+            ReadBlock(
+                sensors=block.sensors[mid:], tier=block.tier, lineage=list(lineage)
+            ),
+        ]
+
+        try:
+            idx = self.blocks.index(block)
+            self.blocks[idx : idx + 1] = halves
+        except ValueError:
+            pass
+
+        self._stats["splits"] += 1
+        self.layout_version += 1
+        logger.debug(
+            f"Split block {block.start}-{block.end} into "
+            f"{halves[0].start}-{halves[0].end} and {halves[1].start}-{halves[1].end}"
+        )
+        return halves
+
+    def end_cycle(self):
+        """Finish a read cycle and re-merge stable sibling blocks."""
+        self._cycle += 1
+
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(self.blocks) - 1):
+                left, right = self.blocks[i], self.blocks[i + 1]
+                parent = left.parent
+                if parent is None or parent != right.parent:
+                    continue
+                threshold = self._remerge_backoff.get(parent, self.remerge_after)
+                if left.successes < threshold or right.successes < threshold:
+                    continue
+
+                combined = ReadBlock(
+                    sensors=left.sensors + right.sensors,
+                    tier=left.tier,
+                    lineage=left.lineage[:-1],
+                    rtt_avg=max(left.rtt_avg or 0.0, right.rtt_avg or 0.0) or None,
+                )
+                self.blocks[i : i + 2] = [combined]
+                self._stats["merges"] += 1
+                self.layout_version += 1
+                logger.debug(
+                    f"Re-merging blocks into {combined.start}-{combined.end} "
+                    f"after {threshold} successful cycles"
+                )
+                merged = True
+                break
+
+    def to_dict(self) -> dict:
+        """Export the learned plan as a JSON-serializable dict."""
+        return {
+            "cycle": self._cycle,
+            "bad_addresses": sorted(self.bad_addresses),
+            "remerge_backoff": [
+                [start, end, threshold]
+                for (start, end), threshold in self._remerge_backoff.items()
+            ],
+            "blocks": [
+                {
+                    "sensors": [s.name for s in b.sensors],
+                    "tier": b.tier,
+                    "lineage": [list(span) for span in b.lineage],
+                    "reads": b.reads,
+                    "errors": b.errors,
+                    "successes": b.successes,
+                    "rtt_avg": b.rtt_avg,
+                    "bad": b.bad,
+                    "bad_since_cycle": b.bad_since_cycle,
+                }
+                for b in self.blocks
+            ],
+        }
+
+    def from_dict(self, data: dict, sensors_by_name: dict, tier_of=None) -> bool:
+        """
+        Restore a plan exported with ``to_dict()``.
+
+        Args:
+            data: Previously exported plan
+            sensors_by_name: Currently configured read-supported sensors
+            tier_of: Optional callable returning the poll tier of a sensor;
+                plans with a different tier assignment are rejected
+
+        Returns:
+            True if the plan was restored, False if it does not match the
+            configured sensors (the current plan is left untouched).
+        """
+        try:
+            blocks = []
+            seen = set()
+            for entry in data["blocks"]:
+                sensors = [sensors_by_name[name] for name in entry["sensors"]]
+                if not sensors:
+                    return False
+                tier = entry.get("tier", DEFAULT_TIER)
+                if tier_of and any(tier_of(s) != tier for s in sensors):
+                    return False
+                seen.update(entry["sensors"])
+                blocks.append(
+                    ReadBlock(
+                        sensors=sensors,
+                        tier=tier,
+                        lineage=[tuple(span) for span in entry.get("lineage", [])],
+                        reads=int(entry.get("reads", 0)),
+                        errors=int(entry.get("errors", 0)),
+                        successes=int(entry.get("successes", 0)),
+                        rtt_avg=entry.get("rtt_avg"),
+                        bad=bool(entry.get("bad", False)),
+                        bad_since_cycle=int(entry.get("bad_since_cycle", 0)),
+                    )
+                )
+
+            # Every configured sensor must be covered by the restored plan
+            if seen != set(sensors_by_name):
+                return False
+
+            cycle = int(data.get("cycle", 0))
+            bad_addresses = {int(a) for a in data.get("bad_addresses", [])}
+            remerge_backoff = {
+                (int(start), int(end)): int(threshold)
+                for start, end, threshold in data.get("remerge_backoff", [])
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            logger.debug(f"Stored read plan is invalid: {e}")
+            return False
+
+        # Planner settings may have changed since the plan was stored
+        if any(b.count > self.max_block_size for b in blocks):
+            return False
+
+        self.blocks = blocks
+        self.bad_addresses = bad_addresses
+        self._remerge_backoff = remerge_backoff
+        self._cycle = cycle
+        self.layout_version += 1
+        return True
+
+    def get_stats(self) -> dict:
+        """Return planner statistics for diagnostics."""
+        return {
+            "blocks": len(self.blocks),
+            "bad_addresses": sorted(self.bad_addresses),
+            "cycle": self._cycle,
+            "splits": self._stats["splits"],
+            "merges": self._stats["merges"],
+            "merge_failures": self._stats["merge_failures"],
+            "block_stats": [
+                {
+                    "start": b.start,
+                    "count": b.count,
+                    "tier": b.tier,
+                    "sensors": len(b.sensors),
+                    "reads": b.reads,
+                    "error_rate": round(b.error_rate, 4),
+                    "rtt_ms": round(b.rtt_avg * 1000, 2)
+                    if b.rtt_avg is not None
+                    else None,
+                    "bad": b.bad,
+                }
+                for b in self.blocks
+            ],
+        }
@@ -52,6 +52,88 @@ class UnitOfTemperature:
 NAME_POWER_USAGE = "power_current_draw"
 
 
+# struct format character and register count per datatype
+_DATATYPE_FORMATS = {
+    "float32": ("f", 2),
+    "int16": ("h", 1),
+    "uint16": ("H", 1),
+    "int32": ("i", 2),
+    "uint32": ("I", 2),
+}
+
+
+@dataclass(frozen=True)
+class RegisterCodec:
+    """
+    Precompiled struct conversion between a value and its registers.
+
+    Registers are handled as one bytes buffer with every register packed in
+    ``endian`` order. Swapping the word order of a multi-register value is
+    the same as reversing its bytes, so any byte/word order combination maps
+    to a single struct format over that buffer:
+
+    - big byte order, little word order (IDM): little endian buffer
+    - big byte order, big word order: big endian buffer
+
+    This also allows decoding a whole block with one ``unpack_from`` call,
+    see BlockDecoder.
+    """
+
+    datatype: str
+    size: int
+    endian: str
+    # True if multi-register values are stored with the low word first
+    word_swap: bool
+    value_struct: struct.Struct
+    register_struct: struct.Struct
+    is_float: bool
+
+    def decode(self, registers: list[int]):
+        return self.value_struct.unpack(
+            self.register_struct.pack(*registers[: self.size])
+        )[0]
+
+    def encode(self, value: float) -> list[int]:
+        value = float(value) if self.is_float else int(value)
+        return list(self.register_struct.unpack(self.value_struct.pack(value)))
+
+
+def _build_codecs() -> dict[tuple[str, str, str], RegisterCodec]:
+    codecs = {}
+    for datatype, (fmt, size) in _DATATYPE_FORMATS.items():
+        for byteorder in ("big", "little"):
+            for wordorder in ("big", "little"):
+                word_swap = (byteorder == "big") == (wordorder == "little")
+                endian = "<" if word_swap else ">"
+                codecs[(datatype, byteorder, wordorder)] = RegisterCodec(
+                    datatype=datatype,
+                    size=size,
+                    endian=endian,
+                    word_swap=word_swap,
+                    value_struct=struct.Struct(endian + fmt),
+                    register_struct=struct.Struct(f"{endian}{size}H"),
+                    is_float=fmt == "f",
+                )
+    return codecs
+
+
+# Built once at import, keyed by (datatype, byteorder, wordorder)
+_CODECS = _build_codecs()
+
+
+def get_codec(
+    datatype: str, byteorder: str = "big", wordorder: str = "little"
+) -> RegisterCodec:
+    """Return the precompiled codec. Unknown datatypes are read as uint16."""
+    codec = _CODECS.get((datatype, byteorder, wordorder))
+    if codec is None:
+        codec = _CODECS.get(
+            (datatype, byteorder.lower(), wordorder.lower()),
+            _CODECS[("uint16", "big", "little")],
+        )
+    return codec
+
+
 def _decode_registers(
     registers: list[int],
     datatype: str,
@@ -59,96 +141,84 @@ def _decode_registers(
     wordorder: str = "little",
 ):
     """Decode registers to value using struct (replacement for BinaryPayloadDecoder)."""
-    # Convert registers to bytes
-    # With Big endian byte order and Little endian word order
-    if wordorder.lower() == "little":
-        # Reverse word order for multi-register values
-        if len(registers) > 1:
-            registers = list(reversed(registers))
-
-    # Pack registers to bytes (each register is 16 bits)
-    byte_data = b""
-    for reg in registers:
-        if byteorder.lower() == "big":
-            byte_data += struct.pack(">H", reg)  # Big endian 16-bit
-        else:
-            byte_data += struct.pack("<H", reg)  # Little endian 16-bit
-
-    # Decode based on datatype
-    if datatype == "float32":
-        if byteorder.lower() == "big":
-            return struct.unpack(">f", byte_data)[0]
-        else:
-            return struct.unpack("<f", byte_data)[0]
-    elif datatype == "int16":
-        if byteorder.lower() == "big":
-            return struct.unpack(">h", byte_data[:2])[0]
-        else:
-            return struct.unpack("<h", byte_data[:2])[0]
-    elif datatype == "uint16":
-        if byteorder.lower() == "big":
-            return struct.unpack(">H", byte_data[:2])[0]
-        else:
-            return struct.unpack("<H", byte_data[:2])[0]
-    elif datatype == "int32":
-        if byteorder.lower() == "big":
-            return struct.unpack(">i", byte_data)[0]
-        else:
-            return struct.unpack("<i", byte_data)[0]
-    elif datatype == "uint32":
-        if byteorder.lower() == "big":
-            return struct.unpack(">I", byte_data)[0]
-        else:
-            return struct.unpack("<I", byte_data)[0]
-    return registers[0]
+    return get_codec(datatype, byteorder, wordorder).decode(registers)
 
 
 def _encode_value(
     value: int | float, datatype: str, byteorder: str = "big", wordorder: str = "little"
 ) -> list[int]:
     """Encode value to registers using struct (replacement for BinaryPayloadBuilder)."""
-    # Pack value to bytes based on datatype
-    if datatype == "float32":
-        if byteorder.lower() == "big":
-            byte_data = struct.pack(">f", float(value))
-        else:
-            byte_data = struct.pack("<f", float(value))
-    elif datatype == "int16":
-        if byteorder.lower() == "big":
-            byte_data = struct.pack(">h", int(value))
-        else:
-            byte_data = struct.pack("<h", int(value))
-    elif datatype == "uint16":
-        if byteorder.lower() == "big":
-            byte_data = struct.pack(">H", int(value))
-        else:
-            byte_data = struct.pack("<H", int(value))
-    elif datatype == "int32":
-        if byteorder.lower() == "big":
-            byte_data = struct.pack(">i", int(value))
-        else:
-            byte_data = struct.pack("<i", int(value))
-    elif datatype == "uint32":
-        if byteorder.lower() == "big":
-            byte_data = struct.pack(">I", int(value))
-        else:
-            byte_data = struct.pack("<I", int(value))
-    else:
-        byte_data = struct.pack(">H", int(value))
-
-    # Convert bytes to registers (16-bit chunks)
-    registers = []
-    for i in range(0, len(byte_data), 2):
-        if byteorder.lower() == "big":
-            registers.append(struct.unpack(">H", byte_data[i : i + 2])[0])
-        else:
-            registers.append(struct.unpack("<H", byte_data[i : i + 2])[0])
-
-    # Apply word order
-    if wordorder.lower() == "little" and len(registers) > 1:
-        registers = list(reversed(registers))
-
-    return registers
+    return get_codec(datatype, byteorder, wordorder).encode(value)
+
+
+class BlockDecoder:
+    """
+    Decodes the raw values of all sensors in a register block at once.
+
+    The block layout is compiled into a single struct format (sensor values
+    separated by pad bytes), so a response is decoded with one ``pack`` of
+    the registers and one ``unpack_from`` call. Sensors sharing registers
+    with another sensor of a different type (e.g. binary sensors) cannot be
+    part of one sequential format and are decoded with their own codec.
+    """
+
+    def __init__(self, sensors: list, start: int, count: int):
+        self.start = start
+        self.count = count
+        endian = sensors[0].codec.endian if sensors else "<"
+        self._registers = struct.Struct(f"{endian}{count}H")
+
+        fields = []
+        slots = {}
+        # (sensor, index into the unpacked tuple) or (sensor, codec, byte offset)
+        self._layout = []
+        self._extra = []
+        cursor = 0
+        for sensor in sorted(sensors, key=lambda s: s.address):
+            codec = sensor.codec
+            offset = (sensor.address - start) * 2
+            slot = (offset, codec.value_struct.format)
+            if slot in slots:
+                self._layout.append((sensor, slots[slot]))
+            elif offset >= cursor and codec.endian == endian:
+                if offset > cursor:
+                    fields.append(f"{offset - cursor}x")
+                fields.append(codec.value_struct.format[1:])
+                slots[slot] = len(slots)
+                self._layout.append((sensor, slots[slot]))
+                cursor = offset + codec.size * 2
+            else:
+                self._extra.append((sensor, codec.value_struct, offset))
+
+        self._values = struct.Struct(endian + "".join(fields))
+
+    def decode(self, registers: list[int]) -> list[tuple]:
+        """
+        Returns (sensor, raw value) pairs for one block response.
+
+        Raises:
+            struct.error: If the response does not match the block size
+        """
+        buffer = self._registers.pack(*registers)
+        values = self._values.unpack_from(buffer)
+        result = [(sensor, values[idx]) for sensor, idx in self._layout]
+        for sensor, value_struct, offset in self._extra:
+            result.append((sensor, value_struct.unpack_from(buffer, offset)[0]))
+        return result
+
+    def decode_values(self, registers: list[int]) -> list[tuple]:
+        """Returns (sensor, success, value) for one block response."""
+        return [
+            (sensor, *_convert(sensor, raw)) for sensor, raw in self.decode(registers)
+        ]
+
+
+def _convert(sensor, raw) -> tuple:
+    try:
+        return sensor.decode_value(raw)
+    except Exception as e:
+        LOGGER.debug(f"Error decoding {sensor.name}: {e}", exc_info=True)
+        return (False, None)
 
 
 @dataclass(kw_only=True)
@@ -172,22 +242,28 @@ class BaseSensorAddress(ABC, Generic[_T]):
             return 2
         return 1
 
+    def __post_init__(self):
+        # IDM uses big endian byte order and little endian word order
+        self.codec = get_codec(self.datatype, byteorder="big", wordorder="little")
+
     @property
     @abstractmethod
     def datatype(self) -> str:
         """Get the datatype name."""
 
     def _decode_raw(self, registers: list[int]):
-        return _decode_registers(
-            registers, self.datatype, byteorder="big", wordorder="little"
-        )
+        return self.codec.decode(registers)
 
     def _encode_raw(self, value: int | float) -> list[int]:
-        return _encode_value(value, self.datatype, byteorder="big", wordorder="little")
+        return self.codec.encode(value)
 
-    @abstractmethod
     def decode(self, registers: list[int]) -> tuple[bool, _T]:
         """Decode this sensor's value."""
+        return self.decode_value(self._decode_raw(registers))
+
+    @abstractmethod
+    def decode_value(self, value) -> tuple[bool, _T]:
+        """Convert a raw register value (see BlockDecoder) to this sensor's value."""
 
     @abstractmethod
     def encode(self, value: _T) -> list[int]:
@@ -214,8 +290,7 @@ class IdmBinarySensorAddress(BaseSensorAddress[bool]):
     def datatype(self) -> str:
         return "uint16"
 
-    def decode(self, registers: list[int]) -> tuple[bool, bool]:
-        value = self._decode_raw(registers)
+    def decode_value(self, value) -> tuple[bool, bool]:
         return (True, value > 0)
 
     def encode(self, value: bool) -> list[int]:
@@ -234,9 +309,8 @@ class _FloatSensorAddress(IdmSensorAddress[float]):
     def datatype(self) -> str:
         return "float32"
 
-    def decode(self, registers: list[int]) -> tuple[bool, float]:
-        raw_value = self._decode_raw(registers)
-        value = round(raw_value * self.scale, self.decimal_digits)
+    def decode_value(self, value) -> tuple[bool, float]:
+        value = round(value * self.scale, self.decimal_digits)
 
         if self.min_value == 0.0 and value == -1:
             return (False, 0.0)
@@ -262,8 +336,7 @@ class _UCharSensorAddress(IdmSensorAddress[int]):
     def datatype(self) -> str:
         return "uint16"
 
-    def decode(self, registers: list[int]) -> tuple[bool, int]:
-        value = self._decode_raw(registers)
+    def decode_value(self, value) -> tuple[bool, int]:
         if self.max_value == 0xFFFE and value == 0xFFFF:
             return (False, 0)
         return (True, value)
@@ -282,8 +355,7 @@ class _WordSensorAddress(IdmSensorAddress[int]):
     def datatype(self) -> str:
         return "int16"
 
-    def decode(self, registers: list[int]) -> tuple[bool, int]:
-        value = self._decode_raw(registers)
+    def decode_value(self, value) -> tuple[bool, int]:
         if self.min_value == 0 and value == -1:
             return (False, 0)
         return (True, value)
@@ -300,8 +372,7 @@ class _EnumSensorAddress(IdmSensorAddress[_EnumT], Generic[_EnumT]):
     def datatype(self) -> str:
         return "uint16"
 
-    def decode(self, registers: list[int]) -> tuple[bool, _EnumT]:
-        value = self._decode_raw(registers)
+    def decode_value(self, value) -> tuple[bool, _EnumT]:
         if value == 0xFFFF and 0xFFFF not in list(map(int, self.enum)):
             return (False, self.enum(None))
         try:
@@ -321,8 +392,7 @@ class _BitFieldSensorAddress(IdmSensorAddress[_FlagT], Generic[_FlagT]):
     def datatype(self) -> str:
         return "uint16"
 
-    def decode(self, registers: list[int]) -> tuple[bool, _FlagT]:
-        value = self._decode_raw(registers)
+    def decode_value(self, value) -> tuple[bool, _FlagT]:
         if value == 0xFFFF:
             return (False, self.flag(None))
         try:
@@ -0,0 +1,153 @@
+# SPDX-License-Identifier: MIT
+"""
+Deterministic tick scheduler for the main collection loop.
+
+Collection cycles are aligned to wall-clock boundaries (multiples of the
+interval, e.g. every full minute) and every cycle is stamped with its
+scheduled tick time instead of the time the read happened to finish. Series
+of several heat pumps therefore share identical timestamps, which keeps
+VictoriaMetrics downsampling and cross-device queries exact.
+
+Waiting uses ``threading.Event.wait`` (monotonic clock), so only the tick
+grid itself follows the wall clock. Cycles that overrun the interval are
+handled by the configured policy:
+
+- ``skip``: drop the missed ticks and continue with the most recent one
+- ``catch_up``: also continue with the most recent tick (one read), but
+  list up to ``max_catch_up`` missed ticks before it in ``backfill_ticks``.
+  The collector writes the values of that read under their grid times as
+  well, so the series have no gaps. Older missed ticks are skipped.
+
+Samples are only ever stamped with grid times.
+"""
+
+import logging
+import math
+import time
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("skip", "catch_up")
+
+
+class TickScheduler:
+    """Produces wall-clock aligned tick times for a periodic loop."""
+
+    def __init__(self, policy=None, max_catch_up=None, wall_clock=time.time):
+        """
+        Args:
+            policy: "skip" or "catch_up" (default: logging.tick_policy)
+            max_catch_up: Max missed ticks filled with the catch_up policy
+                (default: logging.max_catch_up_ticks)
+            wall_clock: Time source for the tick grid
+        """
+        policy = policy or config.get("logging.tick_policy", "skip")
+        if policy not in POLICIES:
+            logger.warning(f"Unknown tick policy '{policy}', using 'skip'")
+            policy = "skip"
+        self.policy = policy
+        self.max_catch_up = int(
+            config.get("logging.max_catch_up_ticks", 3)
+            if max_catch_up is None
+            else max_catch_up
+        )
+        self._wall_clock = wall_clock
+        self._interval = None
+        self._next_tick = None
+        # Missed grid times to fill with the values of the current tick
+        self.backfill_ticks: list[float] = []
+
+        self.ticks = 0
+        self.skipped_ticks = 0
+        self.caught_up_ticks = 0
+        self.last_tick = None
+        self.last_lag = 0.0
+
+    def _align(self, now: float, interval: float) -> float:
+        """First tick boundary at or after now."""
+        return math.ceil(now / interval) * interval
+
+    def schedule(self, interval: float) -> tuple[float, float]:
+        """
+        Determine the next tick.
+
+        Args:
+            interval: Loop interval in seconds (may change between calls)
+
+        Returns:
+            (tick, delay): Scheduled wall-clock time of the tick and the
+            seconds to wait until it is due (0 if it is already due)
+        """
+        now = self._wall_clock()
+        tick = self._next_tick
+        self.backfill_ticks = []
+
+        if tick is None or interval != self._interval or tick - now > interval:
+            # First tick, interval change or wall clock stepped backwards
+            if tick is not None and interval == self._interval:
+                logger.warning("Wall clock moved backwards, realigning ticks")
+            self._interval = interval
+            tick = self._align(now, interval)
+        elif now - tick >= interval:
+            # Continue with the most recent due tick
+            missed = int((now - tick) // interval)
+            tick += missed * interval
+            backfill = (
+                min(missed, self.max_catch_up) if self.policy == "catch_up" else 0
+            )
+            self.backfill_ticks = [tick - i * interval for i in range(backfill, 0, -1)]
+            self.caught_up_ticks += backfill
+            skipped = missed - backfill
+            if skipped:
+                self.skipped_ticks += skipped
+                logger.warning(
+                    f"Collection cycle overran the {interval}s interval, skipped {skipped} tick(s)"
+                )
+
+        self._next_tick = tick + interval
+        return tick, max(0.0, tick - now)
+
+    def wait_for_tick(self, interval: float, stop_event) -> float | None:
+        """
+        Block until the next tick is due.
+
+        Args:
+            interval: Loop interval in seconds
+            stop_event: threading.Event that aborts the wait
+
+        Returns:
+            The scheduled tick time for the cycle, or None if stop_event was
+            set. Missed ticks to fill are in ``backfill_ticks``.
+        """
+        tick, delay = self.schedule(interval)
+        if delay > 0 and stop_event.wait(delay):
+            return None
+        if stop_event.is_set():
+            return None
+        now = self._wall_clock()
+        self.ticks += 1
+        self.last_lag = max(0.0, now - tick)
+        self.last_tick = tick
+        return tick
+
+    def get_stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "interval": self._interval,
+            "ticks": self.ticks,
+            "skipped_ticks": self.skipped_ticks,
+            "caught_up_ticks": self.caught_up_ticks,
+            "last_tick": self.last_tick,
+            "last_lag_seconds": round(self.last_lag, 3),
+        }
+
+    def get_metrics(self) -> dict:
+        """Scheduler health as numeric fields for the metrics writer."""
+        return {
+            "ticks_total": self.ticks,
+            "skipped_ticks_total": self.skipped_ticks,
+            "caught_up_ticks_total": self.caught_up_ticks,
+            "tick_lag_seconds": round(self.last_lag, 3),
+        }
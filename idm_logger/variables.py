@@ -11,9 +11,10 @@ Types:
 """
 
 from typing import List, Dict, Optional, Any
-import requests
 import logging
 
+from . import vm_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -93,7 +94,7 @@ class Variable:
             query_url = f"{metrics_url}/api/v1/query"
             params = {"query": self.query}
 
-            response = requests.get(query_url, params=params, timeout=10)
+            response = vm_client.get(query_url, params=params, timeout=10)
             response.raise_for_status()
 
             data = response.json()
@@ -0,0 +1,129 @@
+# SPDX-License-Identifier: MIT
+"""
+Vectorised NumPy decoding of Modbus register blocks.
+
+Alternative to the struct based BlockDecoder (see sensor_addresses.py),
+enabled with ``modbus.decoder: numpy``. A block response is converted into
+one ``uint16`` array. All 32-bit fields of one type are gathered with a
+single fancy-indexing operation and reinterpreted with ``.view()``. The
+register array uses the codec's endianness, so for IDM (big endian bytes,
+low word first) the little endian view also performs the word swap.
+Scaling and range checks of float sensors are applied to the whole block
+at once. Rounding uses Python's ``round()`` like ``decode_value``: it
+rounds the exact binary value, whereas ``np.round`` scales by a power of
+ten first and can land on the other side of a .5 boundary. Integer, enum
+and binary sensors only go through their ``decode_value`` conversion.
+
+scripts/benchmark_decoder.py compares both decoders with per-sensor
+decoding.
+"""
+
+import logging
+
+from .sensor_addresses import _convert, _FloatSensorAddress
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# NumPy dtype per struct format character
+_DTYPES = {"f": "f4", "h": "i2", "H": "u2", "i": "i4", "I": "u4"}
+
+
+class NumpyBlockDecoder:
+    """Decodes all sensors of a register block with vectorised NumPy operations."""
+
+    def __init__(self, sensors: list, start: int, count: int):
+        self.start = start
+        self.count = count
+        endian = sensors[0].codec.endian if sensors else "<"
+        self._register_dtype = np.dtype(endian + "u2")
+
+        by_type = {}
+        # Sensors whose codec does not match the block (decoded one by one)
+        self._extra = []
+        for sensor in sensors:
+            codec = sensor.codec
+            if codec.endian != endian:
+                self._extra.append(sensor)
+                continue
+            by_type.setdefault(codec.value_struct.format[1:], []).append(sensor)
+
+        # (value dtype, register index array, sensors, float conversion or None)
+        self._groups = []
+        for fmt, group in by_type.items():
+            dtype = np.dtype(endian + _DTYPES[fmt])
+            offsets = np.array([s.address - start for s in group], dtype=np.intp)
+            if dtype.itemsize == 4:
+                # Register pairs; the array view reinterprets each row as one value
+                index = np.stack([offsets, offsets + 1], axis=1)
+            else:
+                index = offsets
+            floats = None
+            if fmt == "f" and all(isinstance(s, _FloatSensorAddress) for s in group):
+                floats = self._float_params(group)
+            self._groups.append((dtype, index, group, floats))
+
+    @staticmethod
+    def _float_params(sensors):
+        def bound(value):
+            return np.nan if value is None else float(value)
+
+        return {
+            "scale": np.array([float(s.scale) for s in sensors]),
+            "digits": [s.decimal_digits for s in sensors],
+            "min": np.array([bound(s.min_value) for s in sensors]),
+            "max": np.array([bound(s.max_value) for s in sensors]),
+            # decode_value treats -1 as "not available" if min_value is 0
+            "unavailable": np.array([s.min_value == 0.0 for s in sensors]),
+        }
+
+    def decode_values(self, registers: list[int]) -> list[tuple]:
+        """
+        Returns (sensor, success, value) for one block response.
+
+        Raises:
+            ValueError: If the response does not match the block size
+        """
+        registers = np.asarray(registers, dtype=self._register_dtype)
+        if registers.shape != (self.count,):
+            raise ValueError(
+                f"Expected {self.count} registers, got {registers.shape[0]}"
+            )
+
+        result = []
+        for dtype, index, sensors, floats in self._groups:
+            raw = registers[index].view(dtype).reshape(-1)
+            if floats is None:
+                for sensor, value in zip(sensors, raw.tolist()):
+                    result.append((sensor, *_convert(sensor, value)))
+                continue
+
+            scaled = (raw.astype(np.float64) * floats["scale"]).tolist()
+            values = np.array(
+                [round(v, d) for v, d in zip(scaled, floats["digits"])],
+                dtype=np.float64,
+            )
+            with np.errstate(invalid="ignore"):
+                valid = ~(
+                    (floats["unavailable"] & (values == -1))
+                    | (values < floats["min"])
+                    | (values > floats["max"])
+                )
+            for sensor, ok, value, unavailable in zip(
+                sensors, valid.tolist(), values.tolist(), floats["unavailable"]
+            ):
+                if unavailable and value == -1:
+                    value = 0.0
+                result.append((sensor, ok, value))
+
+        for sensor in self._extra:
+            offset = sensor.address - self.start
+            raw = sensor.codec.decode(registers[offset : offset + sensor.size].tolist())
+            result.append((sensor, *_convert(sensor, raw)))
+        return result
@@ -0,0 +1,136 @@
+# SPDX-License-Identifier: MIT
+"""
+Shared HTTP client for the VictoriaMetrics calls of the web UI.
+
+All requests go through one pooled ``requests.Session``, so connections to
+VictoriaMetrics are reused instead of opened per request. Identical GET
+requests that run at the same time (a dashboard loading in several
+browsers) are coalesced: the first one goes upstream, the others wait for
+it and get the same response (single-flight). If the shared request
+fails, the waiting callers get a VMRequestError chained from its error.
+"""
+
+import logging
+import threading
+from collections.abc import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """The pooled session (web.vm_pool_size connections per host)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = config.get("web.vm_pool_size", 16)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+class VMRequestError(requests.RequestException):
+    """A shared VictoriaMetrics request failed (raised in the waiting callers)."""
+
+
+class _Call:
+    __slots__ = ("done", "error", "result")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.shared = 0
+
+    def do(self, key, fn: Callable):
+        """
+        Result of ``fn()``, or of the call with the same key in flight.
+
+        The caller running the call gets its exceptions as raised, the
+        callers sharing it a VMRequestError chained from them (each caller
+        its own exception object, so tracebacks do not pile up).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise VMRequestError(
+                    f"Shared request failed: {call.error}"
+                ) from call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
+
+
+single_flight = SingleFlight()
+
+
+def _freeze(params) -> tuple:
+    if not params:
+        return ()
+    items = params.items() if isinstance(params, dict) else params
+    return tuple(sorted((str(k), str(v)) for k, v in items))
+
+
+def get(url: str, params=None, timeout: float = 10) -> requests.Response:
+    """
+    GET through the pooled session, coalesced with identical requests in
+    flight. The body is read before the response is shared; treat it as
+    read-only.
+    """
+
+    def fetch():
+        response = get_session().get(url, params=params, timeout=timeout)
+        response.content  # noqa: B018 - load the body once for all callers
+        return response
+
+    return single_flight.do((url, _freeze(params)), fetch)
+
+
+def get_stats() -> dict:
+    return single_flight.get_stats()
@@ -7,6 +7,8 @@ from flask import (
     abort,
     send_from_directory,
     send_file,
+    Response,
+    stream_with_context,
 )
 from flask_socketio import SocketIO
 from waitress import serve
@@ -40,18 +42,25 @@ from .expression_parser import ExpressionParser
 from .websocket_handler import websocket_handler
 from .sharing import SharingManager
 from .paste import upload
+from . import export
+from . import vm_client
+from .query_cache import RangeQueryCache, parse_step, parse_time
+from .downsampling import METHODS as DOWNSAMPLE_METHODS
+from .downsampling import DownsampleCache, downsample_result
+from .latest_values import LatestValueStore
+from .metric_catalogue import MetricCatalogue
 from shutil import which
 import threading
 import logging
 import requests
 import functools
+import itertools
+import math
 import os
 import signal
 import ipaddress
 import time
 import re
-import pandas as pd
-import io
 from datetime import datetime
 from pathlib import Path
 
@@ -152,10 +161,16 @@ if _cors_origins == "*":
         "CORS is set to allow all origins ('*'). "
         "Consider restricting to specific origins for production."
     )
+# "threading" runs every websocket connection on its own OS thread,
+# "gevent" on greenlets (the standard library is patched in __init__.py)
+ASYNC_MODE = os.environ.get("WEB_ASYNC_MODE", "threading").lower()
+if ASYNC_MODE not in ("threading", "gevent"):
+    logger.warning(f"Unknown WEB_ASYNC_MODE '{ASYNC_MODE}', using threading")
+    ASYNC_MODE = "threading"
 socketio = SocketIO(
     app,
     cors_allowed_origins=_cors_origins,
-    async_mode="threading",
+    async_mode=ASYNC_MODE,
     logger=False,
     engineio_logger=False,
     ping_timeout=60,
@@ -194,18 +209,45 @@ variable_manager = VariableManager(config)
 expression_parser = ExpressionParser()
 
 # WebSocket Handler
-websocket_handler.init_app(app, socketio)
+websocket_handler.init_app(
+    app,
+    socketio,
+    max_rate=config.get("web.websocket_max_rate", 2.0),
+    ack_timeout=config.get("web.websocket_ack_timeout", 10.0),
+)
 
 # Sharing Manager
 sharing_manager = SharingManager(config)
 
 # Shared state
 current_data = {}
+# Latest data per heat pump in multi-device setups {device_name: data}
+device_data = {}
+# Name of the device shown in current_data (None in single-device setups)
+primary_device = None
 data_lock = threading.Lock()
+# Latest value per metric for /api/metrics/current (Modbus + ML anomaly values)
+latest_values = LatestValueStore()
 modbus_client_instance = None
 scheduler_instance = None
+tick_scheduler_instance = None
+pipeline_instance = None
 metrics_writer_instance = None
 
+# Dashboard range queries: cached step-aligned chunks of VictoriaMetrics results
+query_cache = RangeQueryCache(
+    max_bytes=int(config.get("web.query_cache.max_mb", 32) * 1024 * 1024),
+    chunk_points=config.get("web.query_cache.chunk_points", 120),
+    min_age=config.get("web.query_cache.min_age", 300),
+)
+# Range query results reduced to the width of the chart (max_points)
+downsample_cache = DownsampleCache(
+    max_entries=config.get("web.downsampling.cache_entries", 256),
+    min_age=config.get("web.query_cache.min_age", 300),
+)
+# Metric names for the dashboard editor and exports of all metrics
+metric_catalogue = MetricCatalogue(ttl=config.get("web.metric_catalogue.ttl", 300))
+
 # Cache for network security objects to avoid re-parsing on every request
 _net_sec_cache = {
     "whitelist_ref": None,
@@ -241,7 +283,7 @@ def _update_ai_status_once():
             'last_over_time({__name__=~"idm_anomaly_score.*|idm_anomaly_flag.*"}[2h])'
         )
         try:
-            response = requests.get(query_url, params={"query": query}, timeout=10)
+            response = vm_client.get(query_url, params={"query": query}, timeout=10)
         except requests.RequestException as e:
             # Log specific network error but don't crash loop
             logger.debug(f"AI status update network error: {e}")
@@ -267,6 +309,9 @@ def _update_ai_status_once():
                     val = res["value"][1]  # [timestamp, value]
                     timestamp = res["value"][0]
 
+                    if name.startswith("idm_anomaly"):
+                        latest_values.update_anomaly({name: val}, timestamp)
+
                     if "idm_anomaly_score" in name:
                         new_status["score"] = float(val)
                         new_status["last_update"] = timestamp
@@ -336,18 +381,57 @@ def get_ip_obj(ip_str):
         return None
 
 
-def update_current_data(data):
+def update_current_data(data, device=None, changed=None, timestamp=None):
+    """
+    Store the latest readings and push them to websocket clients.
+
+    Args:
+        data: Sensor values
+        device: Heat pump name in multi-device setups. Only the primary
+            device feeds current_data and the websocket broadcast.
+        changed: Keys that changed since the previous cycle. With
+            web.websocket_deltas only these are broadcast.
+        timestamp: Read time of the values (unix seconds)
+    """
+    primary = device is None or device == primary_device
+    latest_values.update_snapshot(data, timestamp, device=device, primary=primary)
+    if device is not None:
+        with data_lock:
+            device_data[device] = dict(data)
+        if not primary:
+            return
+
     with data_lock:
         current_data.clear()
         current_data.update(data)
 
     # Broadcast updates via WebSocket
+    if not config.get("web.websocket_deltas", False):
+        changed = None
     try:
-        websocket_handler.broadcast_metrics(data)
+        websocket_handler.broadcast_metrics(data, changed, timestamp)
     except Exception as e:
         logger.error(f"Failed to broadcast metrics: {e}")
 
 
+def update_derived_values(values, device=None, timestamp=None):
+    """
+    Store the derived metrics of a snapshot for /api/metrics/current.
+
+    Args:
+        values: {name: value} from DerivedMetrics.evaluate()
+        device: Heat pump name in multi-device setups
+        timestamp: Read time of the snapshot (unix seconds)
+    """
+    latest_values.update_snapshot(
+        values,
+        timestamp,
+        device=device,
+        primary=device is None or device == primary_device,
+        source="derived",
+    )
+
+
 def login_required(view):
     @functools.wraps(view)
     def wrapped_view(**kwargs):
@@ -642,21 +726,64 @@ def get_data():
     ---
     tags:
       - Data
+    parameters:
+      - name: device
+        in: query
+        type: string
+        required: false
+        description: Heat pump name (multi-device setups)
     responses:
       200:
         description: Current sensor readings
+      404:
+        description: Unknown device
     """
+    device = request.args.get("device")
     with data_lock:
+        if device:
+            if device not in device_data:
+                return jsonify({"error": "Unknown device"}), 404
+            return jsonify(device_data[device])
         return jsonify(current_data)
 
 
+@app.route("/api/devices")
+@login_required
+def get_devices():
+    """
+    List the polled heat pumps.
+    ---
+    tags:
+      - Data
+    responses:
+      200:
+        description: Device names and the primary device
+    """
+    with data_lock:
+        return jsonify(
+            {
+                "primary": primary_device,
+                "devices": [
+                    {"name": name, "sensors": len(data)}
+                    for name, data in device_data.items()
+                ],
+            }
+        )
+
+
 @app.route("/api/metrics/current")
 @login_required
 def get_current_metrics():
     """
-    Get current values for all metrics from VictoriaMetrics.
-    Returns the latest value for each metric.
+    Get current values for all metrics.
+    Returns the latest value for each metric from the in-memory store, or
+    from VictoriaMetrics while the collector has no data yet. Metrics of
+    further heat pumps are keyed as name{device="..."}.
     """
+    cached = latest_values.get_json()
+    if cached is not None:
+        return app.response_class(cached, mimetype="application/json")
+
     try:
         metrics_url = config.data.get("metrics", {}).get(
             "url", "http://victoriametrics:8428/write"
@@ -666,7 +793,7 @@ def get_current_metrics():
 
         # Query for latest values of all idm_heatpump and idm_anomaly metrics
         query = '{__name__=~"idm_heatpump.*|idm_anomaly.*"}'
-        response = requests.get(query_url, params={"query": query}, timeout=10)
+        response = vm_client.get(query_url, params={"query": query}, timeout=10)
 
         if response.status_code != 200:
             logger.error(f"VictoriaMetrics query failed: {response.status_code}")
@@ -689,6 +816,8 @@ def get_current_metrics():
                 # Remove labels for display, keep value
                 try:
                     num_value = float(value)
+                    if not math.isfinite(num_value):
+                        continue
                     metrics[name] = {
                         "value": num_value,
                         "timestamp": item.get("value", [None, None])[0],
@@ -787,8 +916,12 @@ def chart_api(dashboard_id, chart_id):
 @login_required
 def get_available_metrics():
     """
-    Get list of all available metrics from VictoriaMetrics.
+    Get list of all available metrics.
     Groups metrics by type (temp, power, pressure, etc.)
+
+    Served from the metric catalogue: the names stored in VictoriaMetrics
+    (refreshed every web.metric_catalogue.ttl seconds), or the sensors
+    defined by the configuration while VictoriaMetrics has none.
     """
     try:
         metrics_url = config.data.get("metrics", {}).get(
@@ -796,85 +929,7 @@ def get_available_metrics():
         )
         # Build base URL correctly
         base_url = metrics_url.replace("/write", "").replace("/api/v1/write", "")
-
-        # Use series endpoint to get all metrics with idm_heatpump_ prefix
-        query_url = f"{base_url}/api/v1/series"
-        params = {
-            "match[]": '{__name__=~"idm_heatpump.*|idm_anomaly_.*"}',
-            "limit": "1000",
-        }
-
-        logger.debug(f"Fetching metrics from: {query_url} with params: {params}")
-
-        response = requests.get(query_url, params=params, timeout=10)
-
-        if response.status_code != 200:
-            logger.error(
-                f"VictoriaMetrics returned {response.status_code}: {response.text}"
-            )
-            return jsonify(
-                {"error": f"Failed to query metrics: {response.status_code}"}
-            ), 500
-
-        data = response.json()
-        # series endpoint returns array of objects with __name__ field
-        if isinstance(data, dict):
-            series_data = data.get("data", [])
-        else:
-            series_data = data
-
-        # Extract unique metric names
-        metric_names = set()
-        for series in series_data:
-            if isinstance(series, dict) and "__name__" in series:
-                metric_names.add(series["__name__"])
-
-        metric_names = sorted(metric_names)
-        logger.debug(f"Found {len(metric_names)} unique metrics")
-
-        # Group metrics by type
-        grouped = {
-            "temperature": [],
-            "power": [],
-            "pressure": [],
-            "energy": [],
-            "flow": [],
-            "status": [],
-            "mode": [],
-            "control": [],
-            "state": [],
-            "ai": [],
-            "other": [],
-        }
-
-        for name in metric_names:
-            # Remove 'idm_heatpump_' prefix for display
-            display_name = name.replace("idm_heatpump_", "")
-
-            if name.startswith("idm_anomaly_"):
-                grouped["ai"].append({"name": name, "display": name})
-            elif display_name.startswith("temp_"):
-                grouped["temperature"].append({"name": name, "display": display_name})
-            elif display_name.startswith("power_"):
-                grouped["power"].append({"name": name, "display": display_name})
-            elif display_name.startswith("pressure_"):
-                grouped["pressure"].append({"name": name, "display": display_name})
-            elif display_name.startswith("energy_"):
-                grouped["energy"].append({"name": name, "display": display_name})
-            elif display_name.startswith("flow_"):
-                grouped["flow"].append({"name": name, "display": display_name})
-            elif display_name.startswith("status_"):
-                grouped["status"].append({"name": name, "display": display_name})
-            elif display_name.startswith("mode_"):
-                grouped["mode"].append({"name": name, "display": display_name})
-            elif display_name.startswith("control_"):
-                grouped["control"].append({"name": name, "display": display_name})
-            elif display_name.startswith("state_"):
-                grouped["state"].append({"name": name, "display": display_name})
-            else:
-                grouped["other"].append({"name": name, "display": display_name})
-
-        return jsonify(grouped)
+        return jsonify(metric_catalogue.get_grouped(base_url))
     except Exception as e:
         logger.error(f"Failed to fetch available metrics: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -891,11 +946,22 @@ def get_ai_status():
     return jsonify(status)
 
 
+class VMQueryError(Exception):
+    """VictoriaMetrics answered a query with an error status."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
 @app.route("/api/metrics/query_range", methods=["GET"])
 @login_required
 def query_metrics_range():
     """
     Proxy request to VictoriaMetrics /api/v1/query_range
+
+    With max_points, every series is downsampled to about that many points
+    (downsample=lttb or minmax, default web.downsampling.method).
     """
     try:
         metrics_url = config.data.get("metrics", {}).get(
@@ -912,13 +978,57 @@ def query_metrics_range():
             "step": request.args.get("step"),
         }
 
-        response = requests.get(query_url, params=params, timeout=10)
-        if response.status_code != 200:
-            logger.error(f"VictoriaMetrics query failed: {response.text}")
+        def fetch(start=None, end=None):
+            args = dict(params)
+            if start is not None:
+                args.update(start=start, end=end)
+            response = vm_client.get(query_url, params=args, timeout=10)
+            if response.status_code != 200:
+                raise VMQueryError(response.text, response.status_code)
+            return response.json()
+
+        start = parse_time(params["start"])
+        end = parse_time(params["end"])
+        step = parse_step(params["step"])
+
+        def run_query():
+            if (
+                config.get("web.query_cache.enabled", True)
+                and params["query"]
+                and None not in (start, end, step)
+            ):
+                return query_cache.query(params["query"], start, end, step, fetch)
+            return fetch()
+
+        max_points = request.args.get("max_points", type=int)
+        method = request.args.get(
+            "downsample", config.get("web.downsampling.method", "lttb")
+        )
+        if max_points is not None and (
+            max_points < 3 or method not in DOWNSAMPLE_METHODS
+        ):
             return jsonify(
-                {"status": "error", "error": response.text}
-            ), response.status_code
-        return jsonify(response.json())
+                {"status": "error", "error": "Invalid max_points or downsample"}
+            ), 400
+
+        try:
+            if max_points is None:
+                result = run_query()
+            else:
+                key = (*params.values(), max_points, method)
+                result = downsample_cache.get(key)
+                if result is None:
+                    result = downsample_result(run_query(), max_points, method)
+                    if (
+                        end is not None
+                        and result.get("status") == "success"
+                        and not result.get("isPartial")
+                    ):
+                        downsample_cache.put(key, result, end)
+        except VMQueryError as e:
+            logger.error(f"VictoriaMetrics query failed: {e}")
+            return jsonify({"status": "error", "error": str(e)}), e.status_code
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Metrics query failed: {e}")
         return jsonify({"status": "error", "error": str(e)}), 500
@@ -928,7 +1038,7 @@ def query_metrics_range():
 @login_required
 def export_metrics_data():
     """
-    Export metrics data in various formats (CSV, Excel, JSON).
+    Export metrics data in various formats (CSV, Excel, JSON lines).
 
     Expects JSON:
     {
@@ -936,10 +1046,14 @@ def export_metrics_data():
         "metrics": ["metric1", "metric2", ...] or "all",
         "start": timestamp or ISO string,
         "end": timestamp or ISO string,
-        "step": "1m" (optional, default: auto),
+        "step": "1m" (optional; the last sample at or before every step,
+                      "raw" exports every sample),
         "dashboard_name": "Dashboard Name" (optional, for filename)
     }
 
+    Samples are streamed from VictoriaMetrics' export API and sent to the
+    client while they are read; JSON is exported as JSON lines.
+
     Returns: File download with appropriate MIME type
     """
     try:
@@ -961,6 +1075,14 @@ def export_metrics_data():
         # Validate time range
         if not start or not end:
             return jsonify({"error": "start and end timestamps are required"}), 400
+        try:
+            start_ts = export.parse_timestamp(start)
+            end_ts = export.parse_timestamp(end)
+        except ValueError:
+            return jsonify({"error": "Invalid start or end timestamp"}), 400
+        step_seconds = parse_step(step)
+        if step_seconds is None and step not in (None, "", "raw"):
+            return jsonify({"error": f"Invalid step: {step}"}), 400
 
         # Get VictoriaMetrics URL
         metrics_url = config.data.get("metrics", {}).get(
@@ -970,176 +1092,67 @@ def export_metrics_data():
 
         # Build metrics list
         if metrics == "all":
-            # Query all available idm metrics
-            query_url = f"{base_url}/api/v1/query"
-            query = '{__name__=~"idm_heatpump.*|idm_anomaly.*"}'
-            response = requests.get(query_url, params={"query": query}, timeout=10)
-
-            if response.status_code != 200:
+            # Only the metrics with samples in the range
+            try:
+                metrics = export.list_metrics(base_url, start_ts, end_ts)
+            except (requests.RequestException, ValueError) as e:
+                logger.error(f"Failed to fetch available metrics: {e}")
                 return jsonify({"error": "Failed to fetch available metrics"}), 500
 
-            result_data = response.json()
-            if result_data.get("status") != "success":
-                return jsonify({"error": "Failed to query metrics"}), 500
-
-            metrics = [
-                item.get("metric", {}).get("__name__", "")
-                for item in result_data.get("data", {}).get("result", [])
-            ]
-            metrics = [m for m in metrics if m]  # Filter empty names
-
         if not metrics:
             return jsonify({"error": "No metrics selected"}), 400
 
-        # Fetch data for each metric
-        all_data = []
-        query_range_url = f"{base_url}/api/v1/query_range"
-
-        for metric in metrics:
-            params = {
-                "query": metric,
-                "start": start,
-                "end": end,
-                "step": step,
-            }
-
-            response = requests.get(query_range_url, params=params, timeout=30)
-            if response.status_code != 200:
-                logger.warning(f"Failed to fetch {metric}: {response.status_code}")
-                continue
-
-            metric_data = response.json()
-            if metric_data.get("status") != "success":
-                continue
-
-            results = metric_data.get("data", {}).get("result", [])
-            for result in results:
-                metric_name = result.get("metric", {}).get("__name__", metric)
-                values = result.get("values", [])
-
-                for timestamp, value in values:
-                    try:
-                        all_data.append(
-                            {
-                                "timestamp": datetime.fromtimestamp(float(timestamp)),
-                                "metric": metric_name,
-                                "value": float(value),
-                            }
-                        )
-                    except (ValueError, TypeError) as e:
-                        logger.warning(f"Invalid data point: {e}")
-                        continue
-
-        if not all_data:
+        rows = export.stream_samples(base_url, metrics, start_ts, end_ts, step_seconds)
+        # Read up to the first sample so an empty export can still be answered
+        # with an error
+        first = next(rows, None)
+        if first is None:
             return jsonify(
                 {"error": "No data found for selected metrics and time range"}
             ), 404
-
-        # Create DataFrame
-        df = pd.DataFrame(all_data)
-        df = df.sort_values(["timestamp", "metric"])
+        rows = itertools.chain([first], rows)
 
         # Generate filename
         timestamp_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         safe_name = re.sub(r"[^a-zA-Z0-9_-]", "_", dashboard_name)
+        filename = f"{safe_name}_export_{timestamp_str}"
 
         # Export based on format
+        cleanup = None
         if export_format == "csv":
-            # CSV export
-            output = io.StringIO()
-            df.to_csv(output, index=False, date_format="%Y-%m-%d %H:%M:%S")
-            output.seek(0)
-
-            return send_file(
-                io.BytesIO(output.getvalue().encode("utf-8")),
-                mimetype="text/csv",
-                as_attachment=True,
-                download_name=f"{safe_name}_export_{timestamp_str}.csv",
-            )
+            body = export.csv_chunks(rows)
+            mimetype = "text/csv"
+            filename += ".csv"
 
         elif export_format == "excel":
-            # Excel export
-            output = io.BytesIO()
-
-            with pd.ExcelWriter(output, engine="openpyxl") as writer:
-                # Overview sheet with all data
-                df.to_excel(writer, sheet_name="All Data", index=False)
-
-                # Create separate sheet for each metric
-                for metric in df["metric"].unique():
-                    metric_df = df[df["metric"] == metric][
-                        ["timestamp", "value"]
-                    ].copy()
-                    # Sanitize sheet name (max 31 chars, no special chars)
-                    sheet_name = re.sub(r"[^a-zA-Z0-9_]", "_", metric)[:31]
-                    metric_df.to_excel(writer, sheet_name=sheet_name, index=False)
-
-                # Summary statistics sheet
-                summary_data = []
-                for metric in df["metric"].unique():
-                    metric_values = df[df["metric"] == metric]["value"]
-                    summary_data.append(
-                        {
-                            "Metric": metric,
-                            "Count": len(metric_values),
-                            "Min": metric_values.min(),
-                            "Max": metric_values.max(),
-                            "Mean": metric_values.mean(),
-                            "Median": metric_values.median(),
-                            "Std Dev": metric_values.std(),
-                        }
-                    )
-
-                summary_df = pd.DataFrame(summary_data)
-                summary_df.to_excel(writer, sheet_name="Summary", index=False)
-
-            output.seek(0)
-
-            return send_file(
-                output,
-                mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                as_attachment=True,
-                download_name=f"{safe_name}_export_{timestamp_str}.xlsx",
+            # Written to a temporary file first (xlsx is a zip archive)
+            path, _ = export.write_excel(rows)
+            body = export.file_chunks(path)
+            # Also runs when the client disconnects before the end
+            cleanup = functools.partial(export.remove_file, path)
+            mimetype = (
+                "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
+            filename += ".xlsx"
 
-        elif export_format == "json":
-            # JSON export
-            # Group by metric for better structure
-            json_data = {
-                "export_info": {
-                    "dashboard": dashboard_name,
-                    "exported_at": datetime.now().isoformat(),
-                    "time_range": {"start": start, "end": end, "step": step},
-                    "total_data_points": len(df),
-                },
-                "metrics": {},
+        else:
+            info = {
+                "dashboard": dashboard_name,
+                "exported_at": datetime.now().isoformat(),
+                "time_range": {"start": start, "end": end, "step": step},
             }
-
-            for metric in df["metric"].unique():
-                metric_df = df[df["metric"] == metric]
-                json_data["metrics"][metric] = {
-                    "data": [
-                        {
-                            "timestamp": row["timestamp"].isoformat(),
-                            "value": row["value"],
-                        }
-                        for _, row in metric_df.iterrows()
-                    ],
-                    "statistics": {
-                        "count": len(metric_df),
-                        "min": float(metric_df["value"].min()),
-                        "max": float(metric_df["value"].max()),
-                        "mean": float(metric_df["value"].mean()),
-                        "median": float(metric_df["value"].median()),
-                    },
-                }
-
-            return send_file(
-                io.BytesIO(jsonify(json_data).get_data()),
-                mimetype="application/json",
-                as_attachment=True,
-                download_name=f"{safe_name}_export_{timestamp_str}.json",
-            )
+            body = export.jsonl_chunks(rows, info)
+            mimetype = "application/x-ndjson"
+            filename += ".jsonl"
+
+        response = Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
+        if cleanup:
+            response.call_on_close(cleanup)
+        return response
 
     except Exception as e:
         logger.error(f"Export failed: {e}", exc_info=True)
@@ -1188,11 +1201,9 @@ def evaluate_expression():
         if not is_valid:
             return jsonify({"status": "error", "error": error_msg}), 400
 
-        # Set query results
-        expression_parser.set_query_results(queries)
-
-        # Evaluate expression
-        results = expression_parser.evaluate_expression_series(expression)
+        # Evaluate expression (results are passed per request, the parser is
+        # shared between threads)
+        results = expression_parser.evaluate_expression_series(expression, queries)
 
         return jsonify({"status": "success", "data": {"values": results}})
     except Exception as e:
@@ -1231,6 +1242,25 @@ def ml_alert_endpoint():
 
         score = data.get("score", 0.0)
         threshold = data.get("threshold", 0.7)
+
+        # Keep the anomaly values for /api/metrics/current
+        try:
+            latest_values.update_anomaly(
+                {
+                    "idm_anomaly_score": float(score),
+                    "idm_anomaly_flag": int(
+                        data.get("is_anomaly", float(score) > float(threshold))
+                    ),
+                },
+                data.get("timestamp"),
+            )
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid score"}), 400
+
+        # Periodic score update without an alert
+        if data.get("type") == "score":
+            return jsonify({"status": "success", "message": "Score recorded"}), 200
+
         message = data.get("message", f"ML Alert: Score {score}")
         extra_data = data.get("data", {})
         mode = extra_data.get("mode", "unknown")
@@ -1294,6 +1324,15 @@ def status_check():
             "modbus_connected": modbus_client_instance is not None,
             "scheduler_running": scheduler_instance is not None
             and config.get("web.write_enabled"),
+            "collection": tick_scheduler_instance.get_stats()
+            if tick_scheduler_instance
+            else None,
+            "pipeline": pipeline_instance.get_stats() if pipeline_instance else None,
+            "query_cache": query_cache.get_stats(),
+            "downsample_cache": downsample_cache.get_stats(),
+            "vm_requests": vm_client.get_stats(),
+            "metric_catalogue": metric_catalogue.get_stats(),
+            "latest_values": latest_values.get_stats(),
         }
     )
 
@@ -2185,7 +2224,12 @@ def delete_database():
         )
         base_url = metrics_url.replace("/write", "")
         delete_url = f"{base_url}/api/v1/admin/tsdb/delete_series"
-        response = requests.post(delete_url, params={"match[]": '{__name__!=""}'})
+        response = vm_client.get_session().post(
+            delete_url, params={"match[]": '{__name__!=""}'}
+        )
+        query_cache.clear()
+        downsample_cache.clear()
+        metric_catalogue.invalidate()
         if response.status_code == 204 or response.status_code == 200:
             return jsonify(
                 {"success": True, "message": "Datenbank erfolgreich bereinigt"}
@@ -2625,10 +2669,11 @@ def run_web(modbus_client, scheduler):
         try:
             if websocket_enabled:
                 logger.info(
-                    f"Starting web server with WebSocket support on {host}:{port}"
+                    f"Starting web server with WebSocket support on {host}:{port} "
+                    f"({ASYNC_MODE})"
                 )
-                # Use socketio.run for WebSocket support
-                # Note: For production, use gunicorn with eventlet or gunicorn with --worker-class socketio.GunicornWorker
+                # Werkzeug (threading) or the gevent WSGI server, depending
+                # on WEB_ASYNC_MODE
                 socketio.run(
                     app,
                     host=host,
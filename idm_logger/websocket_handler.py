@@ -3,47 +3,123 @@ WebSocket Handler for real-time data updates.
 
 This module provides WebSocket support for pushing real-time metric updates
 to connected clients without requiring polling.
+
+Each client gets at most one ``metrics`` frame per cycle with the values that
+changed since the last frame it was sent::
+
+    {"t": 1700000000, "u": [0, 21.5, 3, 1]}
+
+``u`` holds flat (index, value) pairs. The indices are assigned per session
+on subscription and returned in the ``subscribed`` event
+(``"index": {metric: index}``). Frames are limited to ``max_rate`` per
+second and client, and the next frame is only sent once the client has
+acknowledged the previous one (or ``ack_timeout`` passed). Values changing
+in the meantime are coalesced, so a slow client gets the latest values
+instead of a backlog.
 """
 
+import functools
 import logging
-from typing import Dict, Set
+import threading
+import time
 from flask_socketio import emit, join_room, leave_room
 from flask import request
 
 logger = logging.getLogger(__name__)
 
+# Max frames per second and client
+MAX_RATE = 2.0
+# Seconds to wait for the acknowledgement of a frame before sending the next
+ACK_TIMEOUT = 10.0
+
+
+class _Client:
+    """Delivery state of one session."""
+
+    __slots__ = (
+        "flush_scheduled",
+        "in_flight",
+        "index",
+        "last_emit",
+        "pending",
+        "sent",
+        "seq",
+        "timestamp",
+    )
+
+    def __init__(self):
+        # metric -> index, stable for the session
+        self.index: dict[str, int] = {}
+        # index -> last value sent / changed value not sent yet
+        self.sent: dict[int, object] = {}
+        self.pending: dict[int, object] = {}
+        self.timestamp = None
+        self.last_emit = float("-inf")
+        # Send time of the frame not acknowledged yet
+        self.in_flight = None
+        self.seq = 0
+        self.flush_scheduled = False
+
 
 class WebSocketHandler:
     """Handler for WebSocket connections and real-time updates."""
 
-    def __init__(self, app=None, socketio=None):
+    def __init__(
+        self,
+        app=None,
+        socketio=None,
+        max_rate: float = MAX_RATE,
+        ack_timeout: float = ACK_TIMEOUT,
+    ):
         """
         Initialize the WebSocket handler.
 
         Args:
             app: Flask application instance
             socketio: SocketIO instance
+            max_rate: Max metric frames per second and client
+            ack_timeout: Seconds to wait for a frame acknowledgement
         """
         self.socketio = socketio
         self.app = app
-        self.subscriptions: Dict[str, Set[str]] = {}  # metric -> set of session ids
-        self.dashboard_subscriptions: Dict[
-            str, Set[str]
+        self.max_rate = max_rate
+        self.ack_timeout = ack_timeout
+        self.subscriptions: dict[str, set[str]] = {}  # metric -> set of session ids
+        self.dashboard_subscriptions: dict[
+            str, set[str]
         ] = {}  # dashboard_id -> set of session ids
+        self.clients: dict[str, _Client] = {}  # session id -> delivery state
+        self._lock = threading.RLock()
+
+        self.frames_sent = 0
+        self.values_sent = 0
+        self.frames_deferred = 0
 
         if app:
             self.init_app(app, socketio)
 
-    def init_app(self, app, socketio):
+    def init_app(
+        self,
+        app,
+        socketio,
+        max_rate: float | None = None,
+        ack_timeout: float | None = None,
+    ):
         """
         Initialize with Flask app.
 
         Args:
             app: Flask application instance
             socketio: SocketIO instance
+            max_rate: Max metric frames per second and client
+            ack_timeout: Seconds to wait for a frame acknowledgement
         """
         self.app = app
         self.socketio = socketio
+        if max_rate is not None:
+            self.max_rate = max_rate
+        if ack_timeout is not None:
+            self.ack_timeout = ack_timeout
 
         # Register event handlers
         self._register_handlers()
@@ -80,11 +156,20 @@ class WebSocketHandler:
 
             logger.info(f"Client {sid} subscribing to metrics: {metrics}")
 
+            # The client learns the indices before the first frame using them
+            index = self.assign_indices(sid, metrics)
+            emit(
+                "subscribed",
+                {"metrics": metrics, "dashboard_id": dashboard_id, "index": index},
+            )
+
             # Subscribe to metrics
+            with self._lock:
+                for metric in metrics:
+                    if metric not in self.subscriptions:
+                        self.subscriptions[metric] = set()
+                    self.subscriptions[metric].add(sid)
             for metric in metrics:
-                if metric not in self.subscriptions:
-                    self.subscriptions[metric] = set()
-                self.subscriptions[metric].add(sid)
                 join_room(metric)
 
             # Subscribe to dashboard room
@@ -94,8 +179,6 @@ class WebSocketHandler:
                 self.dashboard_subscriptions[dashboard_id].add(sid)
                 join_room(f"dashboard_{dashboard_id}")
 
-            emit("subscribed", {"metrics": metrics, "dashboard_id": dashboard_id})
-
         @self.socketio.on("unsubscribe")
         def handle_unsubscribe(data):
             """
@@ -111,9 +194,16 @@ class WebSocketHandler:
             logger.info(f"Client {sid} unsubscribing from metrics: {metrics}")
 
             # Unsubscribe from metrics
-            for metric in metrics:
-                if metric in self.subscriptions:
-                    self.subscriptions[metric].discard(sid)
+            with self._lock:
+                client = self.clients.get(sid)
+                for metric in metrics:
+                    if metric in self.subscriptions:
+                        self.subscriptions[metric].discard(sid)
+                    index = client.index.get(metric) if client else None
+                    if index is not None:
+                        # Sent in full again on a new subscription
+                        client.sent.pop(index, None)
+                        client.pending.pop(index, None)
 
             # Unsubscribe from dashboard room
             if dashboard_id:
@@ -135,11 +225,13 @@ class WebSocketHandler:
         Args:
             sid: Session ID to clean up
         """
-        # Remove from metric subscriptions
-        for metric in list(self.subscriptions.keys()):
-            self.subscriptions[metric].discard(sid)
-            if not self.subscriptions[metric]:
-                del self.subscriptions[metric]
+        with self._lock:
+            self.clients.pop(sid, None)
+            # Remove from metric subscriptions
+            for metric in list(self.subscriptions.keys()):
+                self.subscriptions[metric].discard(sid)
+                if not self.subscriptions[metric]:
+                    del self.subscriptions[metric]
 
         # Remove from dashboard subscriptions
         for dashboard_id in list(self.dashboard_subscriptions.keys()):
@@ -162,25 +254,150 @@ class WebSocketHandler:
         data = {"metric": metric, "value": value, "timestamp": timestamp}
         self.socketio.emit("metric_update", data, room=metric)
 
-    def broadcast_metrics(self, data: Dict):
+    def assign_indices(self, sid: str, metrics) -> dict[str, int]:
+        """
+        Frame indices of metrics for a session (assigned on first use).
+
+        Returns:
+            {metric: index}
+        """
+        with self._lock:
+            client = self.clients.get(sid)
+            if client is None:
+                client = self.clients[sid] = _Client()
+            for metric in metrics:
+                if metric not in client.index:
+                    client.index[metric] = len(client.index)
+            return {metric: client.index[metric] for metric in metrics}
+
+    def broadcast_metrics(
+        self, data: dict, changed: set[str] | None = None, timestamp=None
+    ):
         """
-        Broadcast multiple metric updates to subscribed clients.
+        Send changed metric values to subscribed clients, one frame per client.
 
         Args:
             data: Dictionary of metric values {metric_name: value, ...}
+            changed: If given, only these metrics are considered (deltas)
+            timestamp: Read time of the values (unix seconds, defaults to now)
         """
-        import time
-
-        timestamp = int(time.time())
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        now = time.monotonic()
+        frames = []
+        flushes = []
+
+        with self._lock:
+            touched = set()
+            for metric, sids in self.subscriptions.items():
+                if metric not in data:
+                    continue
+                if changed is not None and metric not in changed:
+                    continue
+                value = data[metric]
+                for sid in sids:
+                    client = self.clients.get(sid)
+                    if client is None:
+                        continue
+                    index = client.index[metric]
+                    if index in client.sent and client.sent[index] == value:
+                        # Changed back before the pending value was sent
+                        client.pending.pop(index, None)
+                    else:
+                        client.pending[index] = value
+                        touched.add(sid)
+
+            for sid in touched:
+                client = self.clients[sid]
+                client.timestamp = timestamp
+                frame = self._next_frame(sid, client, now, flushes)
+                if frame:
+                    frames.append((sid, *frame))
+
+        self._schedule_flushes(flushes)
+        for sid, seq, frame in frames:
+            self._emit_frame(sid, seq, frame)
+
+    def _next_frame(self, sid: str, client: _Client, now: float, flushes: list):
+        """
+        Take the pending values of a client as a frame, if it may get one now.
 
-        for metric, value in data.items():
-            # Skip internal fields or non-metric data if any
-            if not isinstance(metric, str):
-                continue
+        Called with the lock held. Otherwise the values stay pending: they
+        are sent on the acknowledgement of the frame in flight, or by a
+        delayed flush once the rate limit allows. A client needing a delayed
+        flush is added to ``flushes`` (once until that flush ran); the caller
+        starts it with _schedule_flushes() after releasing the lock.
 
-            if metric in self.subscriptions and self.subscriptions[metric]:
-                payload = {"metric": metric, "value": value, "timestamp": timestamp}
-                self.socketio.emit("metric_update", payload, room=metric)
+        Returns:
+            (seq, frame) or None
+        """
+        if not client.pending:
+            return None
+        if client.in_flight is not None and now - client.in_flight < self.ack_timeout:
+            self.frames_deferred += 1
+            return None
+        wait = client.last_emit + 1.0 / self.max_rate - now if self.max_rate else 0
+        if wait > 0:
+            self.frames_deferred += 1
+            if not client.flush_scheduled:
+                client.flush_scheduled = True
+                flushes.append((sid, wait))
+            return None
+
+        updates = []
+        for index, value in client.pending.items():
+            updates.append(index)
+            updates.append(value)
+        client.sent.update(client.pending)
+        client.pending.clear()
+        client.last_emit = now
+        client.in_flight = now
+        client.seq += 1
+        self.frames_sent += 1
+        self.values_sent += len(updates) // 2
+        return client.seq, {"t": client.timestamp, "u": updates}
+
+    def _emit_frame(self, sid: str, seq: int, frame: dict):
+        try:
+            self.socketio.emit(
+                "metrics",
+                frame,
+                to=sid,
+                callback=functools.partial(self._on_ack, sid, seq),
+            )
+        except Exception:
+            logger.debug(f"Failed to send metrics to {sid}", exc_info=True)
+
+    def _schedule_flushes(self, flushes: list):
+        """Start the delayed flushes requested by _next_frame (lock released)."""
+        for sid, wait in flushes:
+            self.socketio.start_background_task(self._delayed_flush, sid, wait)
+
+    def _flush(self, sid: str):
+        flushes = []
+        with self._lock:
+            client = self.clients.get(sid)
+            frame = client and self._next_frame(sid, client, time.monotonic(), flushes)
+        self._schedule_flushes(flushes)
+        if frame:
+            self._emit_frame(sid, *frame)
+
+    def _on_ack(self, sid: str, seq: int, *args):
+        """The client processed frame seq: send what changed meanwhile."""
+        with self._lock:
+            client = self.clients.get(sid)
+            if client is None or client.seq != seq:
+                return
+            client.in_flight = None
+        self._flush(sid)
+
+    def _delayed_flush(self, sid: str, delay: float):
+        self.socketio.sleep(delay)
+        with self._lock:
+            client = self.clients.get(sid)
+            if client is None:
+                return
+            client.flush_scheduled = False
+        self._flush(sid)
 
     def broadcast_dashboard_update(self, dashboard_id: str, data: dict):
         """
@@ -208,6 +425,10 @@ class WebSocketHandler:
                 dashboard_id: len(sids)
                 for dashboard_id, sids in self.dashboard_subscriptions.items()
             },
+            "clients": len(self.clients),
+            "frames_sent": self.frames_sent,
+            "values_sent": self.values_sent,
+            "frames_deferred": self.frames_deferred,
         }
 
 
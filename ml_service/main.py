@@ -508,6 +508,33 @@ def get_top_features(model, data, n=3):
         return []
 
 
+def push_score(score: float, is_anomaly: bool, mode: str):
+    """
+    Push the latest score to IDM Logger so its current values include it
+    without querying VictoriaMetrics. Best effort, no retries.
+    """
+    if not INTERNAL_API_KEY:
+        return
+
+    payload = {
+        "type": "score",
+        "score": round(score, 4),
+        "threshold": ANOMALY_THRESHOLD,
+        "is_anomaly": is_anomaly,
+        "timestamp": time.time(),
+        "data": {"mode": mode},
+    }
+    try:
+        requests.post(
+            f"{IDM_LOGGER_URL}/api/internal/ml_alert",
+            json=payload,
+            headers={"X-Internal-Secret": INTERNAL_API_KEY},
+            timeout=2,
+        )
+    except requests.exceptions.RequestException as e:
+        logger.debug(f"Failed to push score: {e}")
+
+
 def send_anomaly_alert(score: float, data: dict, mode: str, top_features: list):
     """
     Send anomaly alert to IDM Logger notification system.
@@ -669,6 +696,7 @@ def job():
 
         # Write metrics
         write_metrics(score, is_anomaly, len(data), processing_time, mode)
+        push_score(score, is_anomaly, mode)
 
         # Send alert if anomaly detected AND confirmed (debounce) AND warmed up
         if is_anomaly and model_trained:
@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: MIT
+"""
+Benchmark the Modbus block decoders.
+
+Compares per-sensor decoding (sensor.decode), the struct based
+BlockDecoder and the vectorised NumpyBlockDecoder on the read plan of all
+sensors (common sensors, all heating circuits and zones).
+
+Usage:
+    python scripts/benchmark_decoder.py [--cycles 2000] [--block-size 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.read_planner import group_sensors
+from idm_logger.sensor_addresses import (
+    BINARY_SENSOR_ADDRESSES,
+    COMMON_SENSORS,
+    BlockDecoder,
+    HeatingCircuit,
+    heating_circuit_sensors,
+    zone_sensors,
+)
+from idm_logger.vector_decoder import NUMPY_AVAILABLE, NumpyBlockDecoder
+
+
+def build_blocks(block_size, zones):
+    sensors = list(COMMON_SENSORS) + list(BINARY_SENSOR_ADDRESSES.values())
+    for circuit in HeatingCircuit:
+        sensors += heating_circuit_sensors(circuit)
+    for zone in range(zones):
+        sensors += zone_sensors(zone)
+    sensors = [s for s in sensors if s.read_supported]
+
+    rng = random.Random(0)
+    blocks = []
+    for group in group_sensors(sensors, set(), block_size, 5):
+        start = min(s.address for s in group)
+        count = max(s.address + s.size for s in group) - start
+        registers = [rng.randrange(0x4000) for _ in range(count)]
+        blocks.append((group, start, count, registers))
+    return sensors, blocks
+
+
+def per_sensor(blocks):
+    for group, start, _, registers in blocks:
+        for sensor in group:
+            offset = sensor.address - start
+            sensor.decode(registers[offset : offset + sensor.size])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--block-size", type=int, default=50)
+    parser.add_argument("--zones", type=int, default=10)
+    args = parser.parse_args()
+
+    sensors, blocks = build_blocks(args.block_size, args.zones)
+    print(f"{len(sensors)} sensors in {len(blocks)} blocks, {args.cycles} cycles")
+
+    candidates = {"per-sensor": lambda: per_sensor(blocks)}
+
+    struct_decoders = [(BlockDecoder(g, s, c), r) for g, s, c, r in blocks]
+    candidates["struct"] = lambda: [d.decode_values(r) for d, r in struct_decoders]
+
+    if NUMPY_AVAILABLE:
+        numpy_decoders = [(NumpyBlockDecoder(g, s, c), r) for g, s, c, r in blocks]
+        candidates["numpy"] = lambda: [d.decode_values(r) for d, r in numpy_decoders]
+    else:
+        print("NumPy not installed, skipping numpy decoder")
+
+    baseline = None
+    for name, func in candidates.items():
+        seconds = min(timeit.repeat(func, number=args.cycles, repeat=3))
+        per_cycle = seconds / args.cycles * 1e6
+        baseline = baseline or per_cycle
+        print(f"{name:>12}: {per_cycle:8.1f} us/cycle ({baseline / per_cycle:4.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
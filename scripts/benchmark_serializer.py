@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: MIT
+"""
+Benchmark the metrics line protocol serializers.
+
+Compares the plain encode_influx() with LineProtocolSerializer (cached
+prefixes, type dispatch, reused buffer), with and without skipping
+unchanged fields, on batches shaped like real polling cycles.
+
+Usage:
+    python scripts/benchmark_serializer.py [--batches 2000] [--sensors 300]
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.metrics_formats import (
+    LineProtocolSerializer,
+    encode_influx,
+)
+
+
+def build_batches(count, sensors, changing):
+    rng = random.Random(0)
+    values = {}
+    for i in range(sensors):
+        kind = i % 3
+        values[f"sensor_{i}"] = (
+            round(rng.uniform(-20, 80), 2) if kind == 0 else rng.randrange(10)
+        )
+        if kind == 2:
+            values[f"sensor_{i}_str"] = "Heizbetrieb"
+
+    keys = [k for k in values if not k.endswith("_str")]
+    batches = []
+    for n in range(count):
+        data = dict(values)
+        for key in rng.sample(keys, int(len(keys) * changing)):
+            data[key] = round(rng.uniform(-20, 80), 2)
+        batches.append([(data, "wp1", 1700000000.0 + n * 60, "idm_heatpump")])
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batches", type=int, default=2000)
+    parser.add_argument("--sensors", type=int, default=300)
+    parser.add_argument(
+        "--changing", type=float, default=0.1, help="Share of values changing"
+    )
+    args = parser.parse_args()
+
+    batches = build_batches(args.batches, args.sensors, args.changing)
+    print(f"{args.batches} batches of {args.sensors} sensors")
+
+    serializer = LineProtocolSerializer()
+    skipping = LineProtocolSerializer(skip_unchanged=True)
+    candidates = {
+        "encode_influx": lambda: [encode_influx(b) for b in batches],
+        "serializer": lambda: [serializer.encode(b) for b in batches],
+        "skip unchanged": lambda: [skipping.encode(b) for b in batches],
+    }
+
+    baseline = None
+    for name, func in candidates.items():
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        per_batch = seconds / args.batches * 1e6
+        baseline = baseline or per_batch
+        print(f"{name:>15}: {per_batch:8.1f} us/batch ({baseline / per_batch:4.2f}x)")
+
+    size = sum(len(encode_influx(b)) for b in batches)
+    fresh = LineProtocolSerializer(skip_unchanged=True)
+    skipped = sum(len(fresh.encode(b)) for b in batches)
+    print(f"payload with skip unchanged: {skipped / size:.0%} of full size")
+
+
+if __name__ == "__main__":
+    main()
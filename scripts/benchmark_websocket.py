@@ -0,0 +1,179 @@
+# SPDX-License-Identifier: MIT
+"""
+Benchmark websocket connections per server async mode.
+
+Starts a small socket.io server with the real WebSocketHandler for each
+mode (threading, gevent) in a subprocess, pushes one snapshot per second,
+connects --clients socket.io clients subscribed to --metrics metrics and
+reports the threads and memory of the server process and the frames the
+clients received.
+
+Usage:
+    python scripts/benchmark_websocket.py [--clients 200] [--duration 10]
+
+Requires gevent and the socket.io client (python-socketio with
+websocket-client) in addition to the requirements of the logger.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+def serve(port, metrics):
+    # idm_logger/__init__.py patches the standard library for
+    # WEB_ASYNC_MODE=gevent, it has to be imported first
+    import idm_logger  # noqa: F401, I001
+    from flask import Flask
+    from flask_socketio import SocketIO
+
+    from idm_logger.websocket_handler import WebSocketHandler
+
+    mode = os.environ.get("WEB_ASYNC_MODE", "threading")
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode=mode, logger=False, engineio_logger=False)
+    handler = WebSocketHandler(app, socketio)
+    names = [f"sensor_{i}" for i in range(metrics)]
+
+    def broadcast():
+        n = 0
+        while True:
+            socketio.sleep(1)
+            n += 1
+            handler.broadcast_metrics({name: n + i for i, name in enumerate(names)})
+
+    socketio.start_background_task(broadcast)
+    socketio.run(
+        app,
+        host="127.0.0.1",
+        port=port,
+        allow_unsafe_werkzeug=True,
+        log_output=False,
+    )
+
+
+def process_status(pid):
+    """Threads and resident memory (MiB) of a process from /proc."""
+    status = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            status[key] = value.strip()
+    return int(status["Threads"]), int(status["VmRSS"].split()[0]) / 1024
+
+
+def wait_for_port(port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def run_clients(url, count, metrics, duration):
+    import socketio
+
+    names = [f"sensor_{i}" for i in range(metrics)]
+    frames = [0]
+    lock = threading.Lock()
+    clients = []
+
+    def on_frame(frame):
+        with lock:
+            frames[0] += 1
+
+    started = time.monotonic()
+    for _ in range(count):
+        client = socketio.Client(reconnection=False)
+        client.on("metrics", on_frame)
+        client.connect(url, transports=["websocket"])
+        client.emit("subscribe", {"metrics": names})
+        clients.append(client)
+    connect_seconds = time.monotonic() - started
+
+    with lock:
+        frames[0] = 0
+    time.sleep(duration)
+    with lock:
+        received = frames[0]
+    return clients, connect_seconds, received
+
+
+def benchmark(mode, port, args):
+    env = dict(os.environ, WEB_ASYNC_MODE=mode)
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            __file__,
+            "--serve",
+            str(port),
+            "--metrics",
+            str(args.metrics),
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    clients = []
+    try:
+        wait_for_port(port)
+        time.sleep(1)
+        idle_threads, idle_rss = process_status(server.pid)
+        clients, connect_seconds, received = run_clients(
+            f"http://127.0.0.1:{port}", args.clients, args.metrics, args.duration
+        )
+        threads, rss = process_status(server.pid)
+    finally:
+        # Disconnecting waits for the close handshake, in parallel
+        closing = [threading.Thread(target=c.disconnect) for c in clients]
+        for thread in closing:
+            thread.start()
+        for thread in closing:
+            thread.join()
+        server.terminate()
+        server.wait()
+
+    expected = args.clients * args.duration
+    print(
+        f"{mode:>9}: {threads:5d} threads (idle {idle_threads}), "
+        f"{rss:6.1f} MiB RSS (idle {idle_rss:.1f}), "
+        f"+{(rss - idle_rss) / args.clients * 1024:5.0f} KiB/client, "
+        f"connect {connect_seconds:5.2f}s, "
+        f"frames {received}/{expected}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--metrics", type=int, default=80, help="Metrics per client")
+    parser.add_argument("--duration", type=int, default=10, help="Seconds measured")
+    parser.add_argument("--modes", default="threading,gevent")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.metrics)
+        return
+
+    print(
+        f"{args.clients} clients, {args.metrics} metrics each, "
+        f"1 snapshot/s for {args.duration}s"
+    )
+    for i, mode in enumerate(args.modes.split(",")):
+        benchmark(mode, args.port + i, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: MIT
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.alerts import AlertManager
+from idm_logger.modbus import ModbusClient
+from idm_logger.sensor_addresses import _UCharSensorAddress
+from idm_logger.websocket_handler import WebSocketHandler
+
+
+class FakeDevice:
+    """Holding registers backed by a dict, every read succeeds."""
+
+    def __init__(self):
+        self.registers = {}
+
+    def read_holding_registers(self, address, count, device_id=1):
+        rr = MagicMock()
+        rr.isError.return_value = False
+        rr.registers = [
+            self.registers.get(a, 0) for a in range(address, address + count)
+        ]
+        return rr
+
+
+@pytest.fixture
+def device():
+    device = FakeDevice()
+    with (
+        patch("idm_logger.modbus.ModbusTcpClient") as mock_client_cls,
+        patch("idm_logger.modbus.db") as mock_db,
+    ):
+        mock_db.get_setting.return_value = None
+        mock_instance = mock_client_cls.return_value
+        mock_instance.is_socket_open.return_value = True
+        mock_instance.read_holding_registers.side_effect = device.read_holding_registers
+        yield device
+
+
+def _client():
+    client = ModbusClient("localhost", 502)
+    # Two blocks: 100-102 and 200
+    client.sensors = {
+        s.name: s
+        for s in [
+            _UCharSensorAddress(address=a, name=f"s{a}", unit=None)
+            for a in (100, 101, 102, 200)
+        ]
+    }
+    client.binary_sensors = {}
+    return client
+
+
+def test_unchanged_blocks_are_not_decoded(device):
+    client = _client()
+    data = client.read_sensors()
+    assert client.full_refresh
+    assert client.changed_sensors == set(data)
+
+    with patch.object(client, "_decode_block", wraps=client._decode_block) as decode:
+        assert client.read_sensors() == data
+        assert decode.call_count == 0
+    assert not client.full_refresh
+    assert client.changed_sensors == set()
+
+    # Only the block containing the modified register is decoded again
+    device.registers[101] = 7
+    with patch.object(client, "_decode_block", wraps=client._decode_block) as decode:
+        data = client.read_sensors()
+        assert decode.call_count == 1
+    assert data["s101"] == 7
+    assert client.changed_sensors == {"s101"}
+
+
+def test_periodic_full_refresh(device):
+    client = _client()
+    client.read_sensors()
+
+    with (
+        patch("idm_logger.modbus.FULL_REFRESH_INTERVAL", 0),
+        patch.object(client, "_decode_block", wraps=client._decode_block) as decode,
+    ):
+        data = client.read_sensors()
+        assert decode.call_count == 2
+    assert client.full_refresh
+    assert client.changed_sensors == set(data)
+
+
+def test_websocket_sends_only_changed_metrics():
+    socketio = MagicMock()
+    handler = WebSocketHandler()
+    handler.socketio = socketio
+    handler.assign_indices("sid1", ["a", "b"])
+    handler.subscriptions = {"a": {"sid1"}, "b": {"sid1"}}
+
+    handler.broadcast_metrics({"a": 1, "b": 2}, changed={"b"})
+
+    socketio.emit.assert_called_once()
+    assert socketio.emit.call_args.args[1]["u"] == [1, 2]
+
+
+def test_alerts_only_reevaluated_for_changed_sensors():
+    alert = {
+        "id": "1",
+        "name": "High",
+        "type": "threshold",
+        "sensor": "temp",
+        "condition": ">",
+        "threshold": 50,
+        "message": "",
+        "enabled": True,
+        "interval_seconds": 0,
+        "last_triggered": 0,
+    }
+    with (
+        patch("idm_logger.alerts.db") as mock_db,
+        patch("idm_logger.alerts.notification_manager") as notifications,
+        patch("idm_logger.alerts.config") as mock_config,
+    ):
+        mock_db.get_alerts.return_value = []
+        mock_config.get.side_effect = lambda key, default=None: (
+            True if key == "alerts.only_changed" else default
+        )
+        manager = AlertManager()
+        manager.alerts = [alert]
+
+        manager.check_alerts({"temp": 60}, changed={"other"})
+        notifications.send_all.assert_not_called()
+
+        manager.check_alerts({"temp": 60}, changed={"temp"})
+        notifications.send_all.assert_called_once()
+
+
+def test_mqtt_publish_on_change():
+    from idm_logger.mqtt import MQTTPublisher
+
+    settings = {
+        "mqtt.enabled": True,
+        "mqtt.topic_prefix": "idm/heatpump",
+        "mqtt.publish_on_change": True,
+    }
+    with (
+        patch("idm_logger.mqtt.config") as mock_config,
+        patch("idm_logger.mqtt.mqtt.Client"),
+    ):
+        mock_config.get.side_effect = lambda key, default=None: settings.get(
+            key, default
+        )
+        publisher = MQTTPublisher()
+        publisher.client = MagicMock()
+        publisher.connected = True
+
+        data = {"temp": 20.5, "mode": 1, "mode_str": "Heating"}
+        publisher.publish_data(data, changed={"mode", "mode_str"})
+
+        topics = [c.args[0] for c in publisher.client.publish.call_args_list]
+        assert topics == ["idm/heatpump/mode", "idm/heatpump/state"]
+        first = publisher.client.publish.call_args_list[0]
+        assert first.kwargs["retain"] is True
+        assert json.loads(first.args[1])["value_str"] == "Heating"
+
+        # Nothing changed: nothing published
+        publisher.client.publish.reset_mock()
+        publisher.publish_data(data, changed=set())
+        publisher.client.publish.assert_not_called()
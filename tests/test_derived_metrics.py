@@ -0,0 +1,146 @@
+# SPDX-License-Identifier: MIT
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.derived_metrics import DerivedMetrics
+
+COP = {
+    "name": "cop",
+    "expression": "A/B",
+    "inputs": {"A": "power_current", "B": "power_current_draw"},
+}
+ENERGY = {
+    "name": "energy_consumed",
+    "expression": "A",
+    "inputs": {"A": "power_current_draw"},
+    "operator": "integral",
+    "max_gap": 120,
+}
+
+
+@pytest.fixture
+def settings():
+    values = {"derived_metrics": []}
+    with patch("idm_logger.derived_metrics.config") as mock_config:
+        mock_config.get.side_effect = lambda key, default=None: values.get(key, default)
+        yield values
+
+
+def test_expression_metrics(settings, tmp_path):
+    settings["derived_metrics"] = [
+        COP,
+        # Derived metrics can use earlier ones
+        {"name": "cop_pct", "expression": "A*100", "inputs": {"A": "cop"}},
+    ]
+    derived = DerivedMetrics(str(tmp_path / "state.json"))
+
+    values = derived.evaluate({"power_current": 6.0, "power_current_draw": 2.0})
+    assert values == {"cop": 3.0, "cop_pct": 300.0}
+    # Missing inputs and division by zero produce no value
+    assert derived.evaluate({"power_current": 6.0}) == {}
+    assert derived.evaluate({"power_current": 6.0, "power_current_draw": 0}) == {}
+
+
+def test_integral_is_trapezoidal_and_skips_gaps(settings, tmp_path):
+    settings["derived_metrics"] = [ENERGY]
+    derived = DerivedMetrics(str(tmp_path / "state.json"))
+
+    assert derived.evaluate({"power_current_draw": 2.0}, "wp1", 0) == {
+        "energy_consumed": 0.0
+    }
+    # (2 + 4) / 2 kW for 60 s = 0.05 kWh
+    values = derived.evaluate({"power_current_draw": 4.0}, "wp1", 60)
+    assert values["energy_consumed"] == pytest.approx(0.05)
+    # Gap longer than max_gap: total is kept, the segment is skipped
+    values = derived.evaluate({"power_current_draw": 4.0}, "wp1", 600)
+    assert values["energy_consumed"] == pytest.approx(0.05)
+    values = derived.evaluate({"power_current_draw": 4.0}, "wp1", 690)
+    assert values["energy_consumed"] == pytest.approx(0.15)
+    # State is kept per device
+    assert derived.evaluate({"power_current_draw": 1.0}, "wp2", 690) == {
+        "energy_consumed": 0.0
+    }
+
+
+def test_rate_and_moving_average(settings, tmp_path):
+    settings["derived_metrics"] = [
+        {
+            "name": "outside_trend",
+            "expression": "A",
+            "inputs": {"A": "temp_outside"},
+            "operator": "rate",
+            "unit": "h",
+        },
+        {
+            "name": "outside_avg",
+            "expression": "A",
+            "inputs": {"A": "temp_outside"},
+            "operator": "moving_average",
+            "window": 120,
+        },
+    ]
+    derived = DerivedMetrics(str(tmp_path / "state.json"))
+
+    assert derived.evaluate({"temp_outside": 1.0}, None, 0) == {"outside_avg": 1.0}
+    values = derived.evaluate({"temp_outside": 2.0}, None, 60)
+    assert values == {"outside_trend": 60.0, "outside_avg": 1.5}
+    values = derived.evaluate({"temp_outside": 6.0}, None, 120)
+    # The sample at 0 left the 120 s window
+    assert values == {"outside_trend": 240.0, "outside_avg": 4.0}
+
+
+def test_invalid_definitions_are_skipped(settings, tmp_path):
+    settings["derived_metrics"] = [
+        {"name": "Bad Name", "expression": "A", "inputs": {"A": "x"}},
+        {"name": "no_input", "expression": "A+B", "inputs": {"A": "x"}},
+        {"name": "syntax", "expression": "A+", "inputs": {"A": "x"}},
+        {"name": "call", "expression": "__import__('os')", "inputs": {}},
+        {"name": "op", "expression": "A", "inputs": {"A": "x"}, "operator": "max"},
+        # Sensor names, including other circuits, zones and binary sensors
+        {"name": "temp_outside", "expression": "A", "inputs": {"A": "x"}},
+        {
+            "name": "temp_flow_current_circuit_g",
+            "expression": "A",
+            "inputs": {"A": "x"},
+        },
+        {"name": "humidity_zone_10_room_8", "expression": "A", "inputs": {"A": "x"}},
+        {"name": "failure_heat_pump", "expression": "A", "inputs": {"A": "x"}},
+        {"name": "ok", "expression": "A", "inputs": {"A": "x"}},
+    ]
+    derived = DerivedMetrics(str(tmp_path / "state.json"))
+    assert derived.get_stats()["metrics"] == ["ok"]
+
+
+def test_config_change_keeps_state(settings, tmp_path):
+    settings["derived_metrics"] = [ENERGY]
+    derived = DerivedMetrics(str(tmp_path / "state.json"))
+    derived.evaluate({"power_current_draw": 2.0}, None, 0)
+    derived.evaluate({"power_current_draw": 2.0}, None, 60)
+
+    settings["derived_metrics"] = [ENERGY, COP]
+    values = derived.evaluate({"power_current_draw": 2.0}, None, 120)
+    assert values["energy_consumed"] == pytest.approx(4.0 / 60)
+
+
+def test_integral_state_survives_restart(settings, tmp_path):
+    state_file = str(tmp_path / "state.json")
+    settings["derived_metrics"] = [ENERGY]
+    derived = DerivedMetrics(state_file)
+    derived.evaluate({"power_current_draw": 3.0}, "wp1", 0)
+    derived.evaluate({"power_current_draw": 3.0}, "wp1", 60)
+    derived.save_state()
+
+    with open(state_file) as f:
+        saved = json.load(f)
+    assert saved["energy_consumed"][0]["device"] == "wp1"
+
+    restarted = DerivedMetrics(state_file)
+    values = restarted.evaluate({"power_current_draw": 3.0}, "wp1", 120)
+    assert values["energy_consumed"] == pytest.approx(0.1)
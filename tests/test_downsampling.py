@@ -0,0 +1,100 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+
+import numpy as np
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.downsampling import (
+    DownsampleCache,
+    downsample_result,
+    downsample_values,
+    lttb_indices,
+    minmax_indices,
+)
+
+
+def _series(n=10000):
+    rng = np.random.default_rng(0)
+    x = np.arange(n, dtype=float) * 60
+    y = np.sin(x / 20000) + rng.random(n) * 0.1
+    y[1234] = 10.0
+    y[8765] = -10.0
+    return x, y
+
+
+def test_lttb_keeps_shape():
+    x, y = _series()
+    indices = lttb_indices(x, y, 500)
+    assert len(indices) == 500
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert np.all(np.diff(indices) > 0)
+    # Spikes span the largest triangles
+    assert 1234 in indices and 8765 in indices
+
+
+def test_minmax_keeps_extremes_per_bucket():
+    x, y = _series()
+    indices = minmax_indices(x, y, 500)
+    assert len(indices) <= 500
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert 1234 in indices and 8765 in indices
+    # Min and max of each of the 249 time buckets
+    buckets = np.minimum((x - x[0]) * 249 // (x[-1] - x[0]), 248)
+    kept = np.zeros(len(x), dtype=bool)
+    kept[indices] = True
+    for bucket in range(249):
+        in_bucket = buckets == bucket
+        assert y[in_bucket & kept].max() == y[in_bucket].max()
+        assert y[in_bucket & kept].min() == y[in_bucket].min()
+
+
+def test_short_series_unchanged():
+    values = [[0, "1"], [60, "2"], [120, "3"]]
+    assert downsample_values(values, 10) is values
+    assert downsample_values(values, 3, "minmax") is values
+
+
+def test_result_keeps_original_pairs_and_drops_nan():
+    values = [[i * 60, str(float(i % 7))] for i in range(1000)]
+    values[500][1] = "NaN"
+    result = {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [{"metric": {"__name__": "a"}, "values": values}],
+        },
+    }
+    reduced = downsample_result(result, 100)
+    points = reduced["data"]["result"][0]["values"]
+    assert len(points) == 100
+    assert all(p in values for p in points)
+    assert [500 * 60, "NaN"] not in points
+    assert reduced["data"]["result"][0]["metric"] == {"__name__": "a"}
+    # The input is not modified
+    assert len(result["data"]["result"][0]["values"]) == 1000
+
+    error = {"status": "error", "error": "bad query"}
+    assert downsample_result(error, 100) is error
+
+
+def test_cache_expires_recent_ranges():
+    now = [100000.0]
+    cache = DownsampleCache(
+        max_entries=2, recent_ttl=30, min_age=300, clock=lambda: now[0]
+    )
+    cache.put(("old",), {"r": 1}, end=50000)
+    cache.put(("recent",), {"r": 2}, end=now[0])
+    assert cache.get(("recent",)) == {"r": 2}
+
+    now[0] += 31
+    assert cache.get(("recent",)) is None
+    assert cache.get(("old",)) == {"r": 1}
+
+    # LRU beyond max_entries
+    cache.put(("a",), {}, end=0)
+    cache.put(("b",), {}, end=0)
+    assert cache.get(("old",)) is None
+    assert cache.get_stats()["entries"] == 2
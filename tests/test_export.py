@@ -0,0 +1,168 @@
+# SPDX-License-Identifier: MIT
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger import export
+
+# Raw samples per metric: [(unix seconds, value)]
+SAMPLES = {
+    "idm_heatpump_temp": [(0, 1.0), (30, 1.5), (60, 2.0), (150, 3.0), (240, 4.0)],
+    "idm_heatpump_power": [(10, 10.0), (70, 11.0), (130, 12.0), (200, 13.0)],
+}
+
+
+def _fake_get(calls):
+    """/api/v1/export for SAMPLES, honouring match[], start and end."""
+
+    def get(url, params=None, stream=False, timeout=None):
+        calls.append(params)
+        name = params["match[]"].split('"')[1]
+        start, end = float(params["start"]), float(params["end"])
+        points = [(t, v) for t, v in SAMPLES[name] if start <= t <= end]
+        lines = []
+        if points:
+            # Split into two blocks like VictoriaMetrics may do
+            for block in (points[1:], points[:1]):
+                lines.append(
+                    json.dumps(
+                        {
+                            "metric": {"__name__": name, "device": "wp1"},
+                            "timestamps": [t * 1000 for t, _ in block],
+                            "values": [v for _, v in block],
+                        }
+                    ).encode()
+                )
+        response = MagicMock()
+        response.iter_lines.return_value = lines
+        response.__enter__.return_value = response
+        return response
+
+    return get
+
+
+@pytest.fixture
+def vm():
+    calls = []
+    with (
+        patch("idm_logger.export.vm_client.get_session") as get_session,
+        ThreadPoolExecutor(max_workers=2) as executor,
+    ):
+        get_session.return_value.get.side_effect = _fake_get(calls)
+        yield calls, executor
+
+
+def test_merges_metrics_in_time_order(vm):
+    calls, executor = vm
+    rows = list(
+        export.stream_samples(
+            "http://vm",
+            list(SAMPLES),
+            0,
+            240,
+            window=100,
+            executor=executor,
+        )
+    )
+    assert [ts for ts, _, _ in rows] == sorted(ts for ts, _, _ in rows)
+    assert len(rows) == 9
+    assert rows[0] == (0.0, 'idm_heatpump_temp{device="wp1"}', 1.0)
+    # Three windows per metric
+    assert len(calls) == 6
+    assert {c["end"] for c in calls} == {"99.999", "199.999", "240.000"}
+
+
+def test_step_takes_last_sample_at_or_before_each_step(vm):
+    _, executor = vm
+    rows = list(
+        export.stream_samples(
+            "http://vm",
+            ["idm_heatpump_temp"],
+            0,
+            240,
+            step=60,
+            window=100,
+            executor=executor,
+        )
+    )
+    # Like a range query: no sample in (60, 120], 150 belongs to 180
+    assert [(ts, value) for ts, _, value in rows] == [
+        (0, 1.0),
+        (60, 2.0),
+        (180, 3.0),
+        (240, 4.0),
+    ]
+
+
+def test_csv_and_json_lines():
+    rows = [(0.0, "a", 1.0), (0.0, "b", 2.0), (60.0, "a", 3.0)]
+    csv_text = "".join(export.csv_chunks(iter(rows)))
+    assert csv_text.splitlines()[0] == "timestamp,metric,value"
+    assert len(csv_text.splitlines()) == 4
+
+    lines = [
+        json.loads(line)
+        for line in "".join(export.jsonl_chunks(iter(rows), {"x": 1})).splitlines()
+    ]
+    assert lines[0] == {"export_info": {"x": 1}}
+    assert lines[1]["metric"] == "a"
+    assert lines[-1]["statistics"]["a"] == {
+        "count": 2,
+        "min": 1.0,
+        "max": 3.0,
+        "mean": 2.0,
+    }
+
+
+def test_excel_workbook():
+    from openpyxl import load_workbook
+
+    rows = [(0.0, 'x{device="wp1"}', 1.0), (60.0, 'x{device="wp1"}', 3.0)]
+    path, total = export.write_excel(iter(rows))
+    try:
+        assert total == 2
+        workbook = load_workbook(path, read_only=True)
+        assert workbook.sheetnames == ["All Data", "x_device__wp1__", "Summary"]
+        summary = list(workbook["Summary"].values)
+        assert summary[1] == ('x{device="wp1"}', 2, 1, 3, 2)
+        workbook.close()
+    finally:
+        os.remove(path)
+
+
+def test_excel_file_is_removed_when_the_response_closes():
+    from idm_logger import web
+
+    paths = []
+    write_excel = export.write_excel
+
+    def recording_write_excel(rows):
+        path, total = write_excel(rows)
+        paths.append(path)
+        return path, total
+
+    web.app.config["TESTING"] = True
+    with (
+        patch.object(export, "stream_samples", return_value=iter([(0.0, "x", 1.0)])),
+        patch.object(export, "write_excel", side_effect=recording_write_excel),
+        web.app.test_client() as client,
+    ):
+        with client.session_transaction() as sess:
+            sess["logged_in"] = True
+        response = client.post(
+            "/api/export/data",
+            json={"format": "excel", "metrics": ["x"], "start": 60, "end": 120},
+            buffered=False,
+        )
+        assert response.status_code == 200
+        assert os.path.exists(paths[0])
+        # Closed without reading the body, as when the client disconnects
+        response.close()
+    assert not os.path.exists(paths[0])
@@ -0,0 +1,69 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+
+import numpy as np
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.expression_parser import ExpressionParser, compile_expression
+
+QUERIES = {
+    "A": [[1000, "10"], [2000, "20"], [3000, "30"]],
+    "B": [[1000, "2"], [2000, "0"], [4000, "8"]],
+    "C": [[1000, "5"], [2000, "10"], [3000, "15"], [4000, "20"]],
+}
+
+
+def test_series_are_outer_joined():
+    parser = ExpressionParser()
+    # 2000: division by zero, 3000: no B, 4000: no A
+    assert parser.evaluate_expression_series("A/B", QUERIES) == [(1000, 5.0)]
+    assert parser.evaluate_expression_series("(A+B)/C", QUERIES) == [
+        (1000, 2.4),
+        (2000, 2.0),
+    ]
+    assert parser.evaluate_expression_series("C*-2", QUERIES) == [
+        (1000, -10.0),
+        (2000, -20.0),
+        (3000, -30.0),
+        (4000, -40.0),
+    ]
+
+
+def test_functions():
+    parser = ExpressionParser()
+    parser.set_query_results(QUERIES)
+    assert parser.evaluate_expression_series("avg(A,C)") == [
+        (1000, 7.5),
+        (2000, 15.0),
+        (3000, 22.5),
+    ]
+    assert parser.evaluate_expression_series("max(A, min(B, C))")[0] == (1000, 10.0)
+    assert parser.evaluate_expression_series("abs(B-C)")[-1] == (4000, 12.0)
+    assert parser.evaluate_expression("sum(A,B,C)", 1000) == 17.0
+    assert parser.evaluate_expression("A/B", 2000) is None
+
+
+def test_invalid_expressions():
+    parser = ExpressionParser()
+    assert parser.validate_expression("(A+B)/2") == (True, "")
+    assert not parser.validate_expression("A +")[0]
+    assert not parser.validate_expression("A**2")[0]
+    assert not parser.validate_expression("open(A)")[0]
+    assert not parser.validate_expression("A.real")[0]
+    assert parser.evaluate_expression_series("foo(A)", QUERIES) == []
+    # Unknown query label
+    assert parser.evaluate_expression_series("A+D", QUERIES) == []
+
+
+def test_compiled_once_and_vectorised():
+    compiled = compile_expression("(A+B)/C")
+    assert compile_expression("(A+B)/C") is compiled
+    assert compiled.labels == {"A", "B", "C"}
+    n = 50000
+    arrays = {"A": np.arange(n, dtype=float), "B": np.ones(n), "C": np.full(n, 2.0)}
+    result = compiled(arrays)
+    assert result.shape == (n,)
+    assert result[-1] == n / 2
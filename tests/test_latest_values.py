@@ -0,0 +1,79 @@
+# SPDX-License-Identifier: MIT
+import json
+import os
+import sys
+import time
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.latest_values import LatestValueStore
+
+
+def test_empty_store_has_no_response():
+    store = LatestValueStore()
+    assert not store.has_data
+    assert store.get_json() is None
+    # Anomaly values alone do not replace the VictoriaMetrics fallback
+    store.update_anomaly({"idm_anomaly_score": 0.5})
+    assert store.get() is None
+
+
+def test_snapshot_uses_series_names():
+    store = LatestValueStore()
+    store.update_snapshot(
+        {"temp": 21.5, "pump": True, "mode": 2, "mode_str": "Heizen", "name": "x"},
+        timestamp=100.0,
+    )
+    assert store.get() == {
+        "idm_heatpump_temp": {"value": 21.5, "timestamp": 100.0},
+        "idm_heatpump_pump": {"value": 1.0, "timestamp": 100.0},
+        "idm_heatpump_mode": {"value": 2.0, "timestamp": 100.0},
+    }
+
+    store.update_snapshot({"temp": 22.0}, timestamp=160.0)
+    assert store.get() == {"idm_heatpump_temp": {"value": 22.0, "timestamp": 160.0}}
+
+
+def test_anomaly_values_are_merged():
+    store = LatestValueStore(anomaly_max_age=600)
+    now = time.time()
+    store.update_snapshot({"temp": 21.5}, timestamp=now)
+    store.update_anomaly({"idm_anomaly_score": 0.9}, timestamp=now)
+    # Older values (e.g. from the VictoriaMetrics poll) do not overwrite it
+    store.update_anomaly({"idm_anomaly_score": 0.1}, timestamp=now - 60)
+    store.update_anomaly({"idm_anomaly_flag": 1}, timestamp=now - 3600)
+
+    metrics = json.loads(store.get_json())
+    assert metrics["idm_anomaly_score"]["value"] == 0.9
+    assert "idm_anomaly_flag" not in metrics
+    assert store.get_json() is store.get_json()
+
+
+def test_devices_and_derived_values():
+    store = LatestValueStore()
+    store.update_snapshot({"temp": 21.5}, 100.0, device="wp1")
+    store.update_snapshot({"temp": 30.0}, 100.0, device="wp2", primary=False)
+    store.update_snapshot({"cop": 4.2}, 100.0, device="wp1", source="derived")
+    # A new Modbus snapshot does not drop the derived values
+    store.update_snapshot({"temp": 22.0}, 160.0, device="wp1")
+
+    assert store.get() == {
+        "idm_heatpump_temp": {"value": 22.0, "timestamp": 160.0, "device": "wp1"},
+        "idm_heatpump_cop": {"value": 4.2, "timestamp": 100.0, "device": "wp1"},
+        'idm_heatpump_temp{device="wp2"}': {
+            "value": 30.0,
+            "timestamp": 100.0,
+            "device": "wp2",
+        },
+    }
+
+
+def test_non_finite_values_are_left_out():
+    store = LatestValueStore()
+    store.update_snapshot({"temp": float("nan"), "flow": float("inf"), "ok": 1})
+    store.update_anomaly({"idm_anomaly_score": "NaN"})
+
+    # No NaN/Infinity literals, which are not valid JSON
+    assert "NaN" not in store.get_json()
+    assert list(store.get()) == ["idm_heatpump_ok"]
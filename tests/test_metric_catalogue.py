@@ -0,0 +1,131 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger import metric_catalogue
+from idm_logger.metric_catalogue import MetricCatalogue, defined_metrics
+
+
+@pytest.fixture
+def settings():
+    settings = {"idm.circuits": ["A"], "idm.zones": [], "derived_metrics": []}
+    with (
+        patch("idm_logger.metric_catalogue.config") as catalogue_config,
+        patch("idm_logger.devices.config") as devices_config,
+    ):
+        for mock_config in (catalogue_config, devices_config):
+            mock_config.get.side_effect = lambda key, default=None: settings.get(
+                key, default
+            )
+        yield settings
+
+
+def _response(names):
+    response = MagicMock()
+    response.json.return_value = {"status": "success", "data": names}
+    return response
+
+
+def test_defined_metrics_follow_configuration(settings):
+    metrics = defined_metrics()
+    assert metrics["idm_heatpump_temp_outside"] == "°C"
+    assert "idm_heatpump_temp_flow_current_circuit_a" in metrics
+    assert "idm_heatpump_temp_flow_current_circuit_b" not in metrics
+    assert "idm_anomaly_score" in metrics
+
+    settings["idm.circuits"] = ["A", "B"]
+    settings["derived_metrics"] = [{"name": "cop", "expression": "A / B"}]
+    metrics = defined_metrics()
+    assert "idm_heatpump_temp_flow_current_circuit_b" in metrics
+    assert "idm_heatpump_cop" in metrics
+
+
+def test_stored_names_cached_until_ttl(settings):
+    now = [1000.0]
+    catalogue = MetricCatalogue(ttl=300, clock=lambda: now[0])
+    names = ["idm_heatpump_temp_outside", "idm_heatpump_power_current"]
+    with (
+        patch.object(
+            metric_catalogue.vm_client, "get", return_value=_response(names)
+        ) as get,
+        patch.object(metric_catalogue.threading, "Thread") as thread,
+    ):
+        grouped = catalogue.get_grouped("http://vm")
+        assert grouped["temperature"] == [
+            {
+                "name": "idm_heatpump_temp_outside",
+                "display": "temp_outside",
+                "unit": "°C",
+            }
+        ]
+        assert [m["name"] for m in grouped["power"]] == ["idm_heatpump_power_current"]
+        assert catalogue.get_stats()["stored"] == 2
+        assert get.call_count == 1
+
+        # Stale: served as is while a background refresh runs
+        now[0] += 301
+        assert catalogue.get_grouped("http://vm") is grouped
+        thread.assert_called_once()
+        thread.call_args.kwargs["target"](*thread.call_args.kwargs["args"])
+        assert get.call_count == 2
+        assert catalogue.get_stats()["refreshes"] == 2
+
+        # A different VictoriaMetrics is looked up right away
+        catalogue.get_grouped("http://other")
+        assert get.call_count == 3
+
+
+def test_falls_back_to_defined_metrics(settings):
+    now = [1000.0]
+    catalogue = MetricCatalogue(clock=lambda: now[0])
+    with patch.object(
+        metric_catalogue.vm_client,
+        "get",
+        side_effect=requests.ConnectionError("down"),
+    ) as get:
+        grouped = catalogue.get_grouped("http://vm")
+        assert "idm_heatpump_temp_flow_current_circuit_a" in [
+            m["name"] for m in grouped["temperature"]
+        ]
+        assert catalogue.get_stats()["stored"] is None
+        # Not retried on every request
+        assert get.call_count == 1
+
+        # Config changes rebuild the defined metrics
+        settings["idm.circuits"] = ["A", "B"]
+        grouped = catalogue.get_grouped("http://vm")
+        assert "idm_heatpump_temp_flow_current_circuit_b" in [
+            m["name"] for m in grouped["temperature"]
+        ]
+        assert get.call_count == 1
+
+
+def test_refresh_running_during_invalidate_is_discarded(settings):
+    now = [1000.0]
+    catalogue = MetricCatalogue(ttl=300, clock=lambda: now[0])
+    with (
+        patch.object(
+            metric_catalogue.vm_client,
+            "get",
+            return_value=_response(["idm_heatpump_old"]),
+        ) as get,
+        patch.object(metric_catalogue.threading, "Thread") as thread,
+    ):
+        catalogue.get_grouped("http://vm")
+        now[0] += 301
+        catalogue.get_grouped("http://vm")
+        # The database is cleared while the background refresh runs
+        catalogue.invalidate()
+        thread.call_args.kwargs["target"](*thread.call_args.kwargs["args"])
+        assert catalogue.get_stats()["stored"] is None
+
+        get.return_value = _response(["idm_heatpump_new"])
+        grouped = catalogue.get_grouped("http://vm")
+        assert [m["name"] for m in grouped["other"]] == ["idm_heatpump_new"]
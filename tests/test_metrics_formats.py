@@ -0,0 +1,213 @@
+# SPDX-License-Identifier: MIT
+import gzip
+import json
+import os
+import struct
+import sys
+from enum import IntEnum
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.metrics import HttpSink, MetricsWriter
+from idm_logger.metrics_formats import (
+    LineProtocolSerializer,
+    encode_influx,
+    encode_remote_write,
+    encode_vm_import,
+)
+
+ITEMS = [
+    ({"temp": 20.5, "mode": True, "mode_str": "On"}, "wp1", 1700000000.0),
+    ({"temp": 21.0}, "wp1", 1700000060.0),
+    ({"temp": 7}, None, 1700000060.0, "idm_logger"),
+]
+
+
+def _parse(data: bytes) -> list:
+    """Minimal protobuf reader: [(field number, value)]."""
+    fields = []
+    pos = 0
+
+    def varint():
+        nonlocal pos
+        result = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return result
+
+    while pos < len(data):
+        key = varint()
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            fields.append((number, varint()))
+        elif wire_type == 1:
+            fields.append((number, struct.unpack("<d", data[pos : pos + 8])[0]))
+            pos += 8
+        else:
+            length = varint()
+            fields.append((number, data[pos : pos + length]))
+            pos += length
+    return fields
+
+
+def test_influx_has_per_sample_timestamps():
+    assert encode_influx(ITEMS).splitlines() == [
+        "idm_heatpump,device=wp1 temp=20.5,mode=1 1700000000000000000",
+        "idm_heatpump,device=wp1 temp=21.0 1700000060000000000",
+        "idm_logger temp=7 1700000060000000000",
+    ]
+
+
+def test_serializer_matches_encode_influx():
+    items = ITEMS + [
+        {"legacy": 1.5, "text": "x"},
+        ({"a b": 1, "c,d": 2.25}, "wp 2", None),
+    ]
+    serializer = LineProtocolSerializer()
+    for _ in range(2):
+        assert serializer.encode(items) == encode_influx(items)
+
+
+def test_serializer_handles_numeric_subclasses():
+    class Mode(IntEnum):
+        HEATING = 2
+
+    class Reading(float):
+        pass
+
+    serializer = LineProtocolSerializer()
+    assert serializer.encode([{"a": Reading(1.5), "b": Mode.HEATING}]) == (
+        "idm_heatpump a=1.5,b=2"
+    )
+
+
+def test_serializer_skips_unchanged_fields_until_refresh():
+    clock = MagicMock(return_value=0.0)
+    serializer = LineProtocolSerializer(
+        skip_unchanged=True, refresh_interval=240, clock=clock
+    )
+    assert serializer.encode([{"a": 1, "b": 2.5}]) == "idm_heatpump a=1,b=2.5"
+
+    clock.return_value = 60.0
+    assert serializer.encode([{"a": 1, "b": 3.0}]) == "idm_heatpump b=3.0"
+    # Series are tracked separately
+    assert serializer.encode([({"a": 1}, "wp2")]) == "idm_heatpump,device=wp2 a=1"
+    assert serializer.encode([{"a": 1, "b": 3.0}]) == ""
+
+    clock.return_value = 240.0
+    assert serializer.encode([{"a": 1, "b": 3.0}]) == "idm_heatpump a=1,b=3.0"
+    assert serializer.get_stats()["fields_skipped"] == 3
+
+
+def test_lost_batches_resend_unchanged_fields():
+    with patch("idm_logger.metrics.requests.Session") as mock_session:
+        session = MagicMock()
+        session.post.return_value.status_code = 400
+        mock_session.return_value = session
+        sink = HttpSink(
+            "vm", "http://vm:8428/write", compression="none", skip_unchanged=True
+        )
+
+    # Rejected: the values were not delivered
+    assert not sink._send_data([({"a": 1, "b": 2}, None, 60.0)])
+    session.post.return_value.status_code = 204
+    assert sink._send_data([({"a": 1, "b": 3}, None, 120.0)])
+    assert session.post.call_args.kwargs["data"] == "idm_heatpump a=1,b=3 120000000000"
+
+
+def test_unchanged_batches_are_not_failures():
+    with patch("idm_logger.metrics.requests.Session") as mock_session:
+        session = MagicMock()
+        session.post.return_value.status_code = 204
+        mock_session.return_value = session
+        sink = HttpSink(
+            "vm",
+            "http://vm:8428/write",
+            compression="none",
+            skip_unchanged=True,
+            batch_size=100,
+            flush_interval=2.0,
+        )
+    try:
+        for ts in (60.0, 120.0, 180.0, 240.0):
+            sink._flush([({"a": 1, "b": 2}, None, ts)])
+    finally:
+        sink.stop()
+
+    # Only the first batch had anything to send
+    assert session.post.call_count == 1
+    assert sink.failed_batches == 0
+    assert sink.batch_size == 100
+    assert sink.flush_interval == 2.0
+
+
+def test_vm_import_groups_values_per_series():
+    lines = [json.loads(line) for line in encode_vm_import(ITEMS).splitlines()]
+    assert lines[0] == {
+        "metric": {"__name__": "idm_heatpump_temp", "device": "wp1"},
+        "values": [20.5, 21.0],
+        "timestamps": [1700000000000, 1700000060000],
+    }
+    assert {line["metric"]["__name__"] for line in lines} == {
+        "idm_heatpump_temp",
+        "idm_heatpump_mode",
+        "idm_logger_temp",
+    }
+
+
+def test_remote_write_protobuf():
+    request = _parse(encode_remote_write(ITEMS))
+    assert len(request) == 3
+    series = _parse(request[0][1])
+    labels = [dict(_parse(value)) for number, value in series if number == 1]
+    samples = [dict(_parse(value)) for number, value in series if number == 2]
+    assert labels == [
+        {1: b"__name__", 2: b"idm_heatpump_temp"},
+        {1: b"device", 2: b"wp1"},
+    ]
+    assert samples == [{1: 20.5, 2: 1700000000000}, {1: 21.0, 2: 1700000060000}]
+
+
+@pytest.fixture
+def writer():
+    settings = {"metrics.spool.enabled": False, "metrics.format": "vm_import"}
+    with (
+        patch("idm_logger.metrics.requests.Session") as mock_session,
+        patch("idm_logger.metrics.config") as mock_config,
+    ):
+        mock_config.get.side_effect = lambda key, default=None: settings.get(
+            key, default
+        )
+        session = MagicMock()
+        session.post.return_value.status_code = 204
+        mock_session.return_value = session
+        writer = MetricsWriter()
+        writer.stop()
+        yield writer, session
+
+
+def test_write_stamps_samples_at_read_time(writer):
+    writer, _ = writer
+    with patch("idm_logger.metrics.time.time", return_value=1234.5):
+        writer.write({"temp": 1})
+    assert writer.queue.get_nowait() == ({"temp": 1}, None, 1234.5, "idm_heatpump")
+
+
+def test_large_batches_are_gzipped(writer):
+    writer, session = writer
+    batch = [({f"sensor{i}": i for i in range(100)}, None, 1700000000.0)]
+    assert writer._send_data(batch)
+
+    args, kwargs = session.post.call_args
+    assert args[0] == "http://victoriametrics:8428/api/v1/import"
+    assert kwargs["headers"]["Content-Encoding"] == "gzip"
+    body = gzip.decompress(kwargs["data"]).decode()
+    assert len(body.splitlines()) == 100
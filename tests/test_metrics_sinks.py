@@ -0,0 +1,167 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.metrics import HttpSink, MetricsWriter, create_sink
+from idm_logger.metrics_sinks import PYARROW_AVAILABLE, MetricsSink, ParquetSink
+
+
+class RecordingSink(MetricsSink):
+    type = "recording"
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.batches = []
+        self.start()
+
+    def _send_data(self, data):
+        self.batches.append(list(data))
+        return True
+
+
+def _wait_for(condition, timeout=3.0):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def test_sink_batches_by_size_and_interval():
+    sink = RecordingSink("rec", batch_size=3, flush_interval=0.2, adaptive=False)
+    try:
+        for i in range(4):
+            sink.write({"temp": i}, timestamp=100.0 + i)
+        _wait_for(lambda: len(sink.batches) == 2)
+        assert [len(b) for b in sink.batches] == [3, 1]
+        assert sink.batches[0][0] == ({"temp": 0}, None, 100.0, "idm_heatpump")
+    finally:
+        sink.stop()
+
+
+def test_adaptive_batching_follows_latency():
+    sink = RecordingSink("rec", batch_size=10, flush_interval=1.0)
+    sink.stop()
+
+    with patch("idm_logger.metrics_sinks.time.monotonic", side_effect=[0.0, 2.0]):
+        sink._flush([{"temp": 1}])
+    assert (sink.batch_size, sink.flush_interval) == (20, 2.0)
+    assert not sink._keeping_up()
+
+    # Fast again: shrinks back towards the configured batching
+    for _ in range(20):
+        sink._flush([{"temp": 1}] * 5)
+    assert (sink.batch_size, sink.flush_interval) == (10, 1.0)
+    assert sink._keeping_up()
+
+    metrics = sink.get_metrics()
+    assert metrics["batches_total"] == 21
+    assert metrics["samples_sent_total"] == 101
+    assert metrics["flush_latency_seconds_count"] == 21
+    assert metrics["flush_latency_seconds_le_0_005"] == 20
+    assert metrics["batch_samples_le_5"] == 21
+    assert sink.latency_histogram.quantile(0.99) == 2.5
+    assert sink.get_status()["batching"]["latency_p95"] == 0.005
+
+
+def test_idle_flush_sends_immediately():
+    sink = RecordingSink("rec", batch_size=50, flush_interval=10.0)
+    try:
+        sink.write({"temp": 1})
+        _wait_for(lambda: len(sink.batches) == 1)
+    finally:
+        sink.stop()
+
+
+def test_full_queue_counts_drops():
+    sink = RecordingSink("rec", queue_size=1)
+    sink.stop()
+    assert sink.write({"temp": 1})
+    assert not sink.write({"temp": 2})
+    assert sink.get_metrics()["dropped_total"] == 1
+
+
+@pytest.fixture
+def settings():
+    settings = {"metrics.spool.enabled": False}
+    with (
+        patch("idm_logger.metrics.requests.Session") as mock_session,
+        patch("idm_logger.metrics.config") as mock_config,
+    ):
+        mock_config.get.side_effect = lambda key, default=None: settings.get(
+            key, default
+        )
+        session = MagicMock()
+        session.post.return_value.status_code = 204
+        mock_session.return_value = session
+        yield settings
+
+
+def test_writer_fans_out_to_sinks(settings):
+    settings["metrics.sinks"] = [
+        {
+            "name": "remote",
+            "type": "remote_write",
+            "url": "http://prom:9090/api/v1/write",
+            "batch_size": 10,
+            "spool": False,
+        },
+        {"name": "bad", "type": "unknown"},
+    ]
+    writer = MetricsWriter()
+    writer.stop()
+
+    assert [sink.name for sink in writer.sinks] == ["remote"]
+    remote = writer.sinks[0]
+    assert remote.batch_size == 10
+    assert remote.spool is None
+
+    with patch("idm_logger.metrics.time.time", return_value=1234.5):
+        writer.write({"temp": 1})
+    sample = ({"temp": 1}, None, 1234.5, "idm_heatpump")
+    assert writer.queue.get_nowait() == sample
+    assert remote.queue.get_nowait() == sample
+
+    assert "remote" in writer.get_status()["sinks"]
+    assert "sink_remote_queue_size" in writer.get_metrics()
+
+
+def test_endpoint_follows_configured_url(settings):
+    sink = HttpSink("prom", "http://prom:9090/api/v1/write", format="vm_import")
+    sink.stop()
+    assert sink._endpoint("remote_write") == "http://prom:9090/api/v1/write"
+    assert sink._endpoint("vm_import") == "http://prom:9090/api/v1/import"
+    assert sink._endpoint("influx") == "http://prom:9090/write"
+
+
+def test_create_sink_rejects_invalid_entries(settings):
+    assert create_sink({"type": "victoriametrics"}) is None
+    assert create_sink({"name": "../x", "type": "parquet"}) is None
+    assert (
+        create_sink({"name": "vm", "type": "victoriametrics", "url": "x", "foo": 1})
+        is None
+    )
+
+
+@pytest.mark.skipif(not PYARROW_AVAILABLE, reason="pyarrow not installed")
+def test_parquet_sink_rotates_hourly(tmp_path):
+    import pyarrow.parquet as pq
+
+    sink = ParquetSink(directory=str(tmp_path))
+    sink.stop()
+    hour = 1700000000 // 3600 * 3600
+    assert sink._send_data([({"temp": 1.5, "mode": True}, "wp1", hour + 10.0)])
+    assert sink._send_data([({"temp": 2.0}, "wp1", hour + 3600.0)])
+    sink._close_file()
+
+    files = sorted(f for f in os.listdir(tmp_path) if f.endswith(".parquet"))
+    assert len(files) == 2
+    table = pq.read_table(tmp_path / files[0])
+    assert table.column("field").to_pylist() == ["temp", "mode"]
+    assert table.column("value").to_pylist() == [1.5, 1.0]
@@ -0,0 +1,141 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import requests
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.metrics import MetricsWriter
+from idm_logger.metrics_spool import MetricsSpool
+
+
+def test_append_read_commit(tmp_path):
+    spool = MetricsSpool(str(tmp_path), segment_bytes=64)
+    for i in range(10):
+        spool.append(f"idm_heatpump temp={i}")
+    assert spool.segments > 1
+
+    batches, position = spool.read(max_bytes=60)
+    assert batches == [f"idm_heatpump temp={i}".encode() for i in range(len(batches))]
+    spool.commit(position, len(batches))
+
+    rest, position = spool.read()
+    assert len(batches) + len(rest) == 10
+    assert rest[-1] == b"idm_heatpump temp=9"
+    spool.commit(position, len(rest))
+    assert spool.pending_bytes == 0
+    assert spool.records_replayed == 10
+
+
+def test_recovery_after_restart(tmp_path):
+    spool = MetricsSpool(str(tmp_path))
+    for i in range(3):
+        spool.append(f"m v={i}")
+    batches, position = spool.read(max_bytes=1)
+    spool.commit(position, len(batches))
+    spool.close()
+
+    # Simulate a record torn by a crash
+    segment = next(f for f in os.listdir(tmp_path) if f.endswith(".seg"))
+    with open(tmp_path / segment, "ab") as f:
+        f.write(b"\x00\x00\x00\x10\x00")
+
+    restored = MetricsSpool(str(tmp_path))
+    assert restored.read()[0] == [b"m v=1", b"m v=2"]
+    restored.append("m v=3")
+    assert restored.read()[0] == [b"m v=1", b"m v=2", b"m v=3"]
+
+
+def test_corrupt_record_is_skipped(tmp_path):
+    spool = MetricsSpool(str(tmp_path))
+    for i in range(3):
+        spool.append(f"m v={i}")
+    spool.close()
+
+    # Flip a payload byte of the middle record (8 byte header + 5 bytes each)
+    segment = tmp_path / next(f for f in os.listdir(tmp_path) if f.endswith(".seg"))
+    with open(segment, "r+b") as f:
+        f.seek(13 + 8 + 4)
+        f.write(b"X")
+
+    restored = MetricsSpool(str(tmp_path))
+    batches, position = restored.read()
+    assert batches == [b"m v=0", b"m v=2"]
+    assert restored.get_stats()["records_corrupt"] == 1
+    restored.commit(position, len(batches))
+    assert restored.pending_bytes == 0
+
+
+def test_size_cap_drops_oldest_segments(tmp_path):
+    spool = MetricsSpool(str(tmp_path), segment_bytes=40, max_bytes=100)
+    for i in range(20):
+        spool.append(f"m value={i:04d}")
+    assert sum(os.path.getsize(tmp_path / f) for f in os.listdir(tmp_path)) <= 200
+    assert spool.bytes_dropped > 0
+    batches, _ = spool.read()
+    assert batches[-1] == b"m value=0019"
+
+
+def _response(status):
+    response = MagicMock()
+    response.status_code = status
+    return response
+
+
+def test_writer_spools_while_unreachable_and_replays_in_order(tmp_path):
+    settings = {"metrics.spool.directory": str(tmp_path)}
+    with (
+        patch("idm_logger.metrics.requests.Session") as mock_session,
+        patch("idm_logger.metrics.config") as mock_config,
+    ):
+        mock_config.get.side_effect = lambda key, default=None: settings.get(
+            key, default
+        )
+        session = MagicMock()
+        mock_session.return_value = session
+        writer = MetricsWriter()
+        writer.stop()
+
+        session.post.side_effect = requests.ConnectionError("down")
+        assert not writer._send_data({"temp": 1})
+        assert writer.spool.pending_bytes > 0
+
+        # While backing off, new batches go straight to the spool
+        session.post.reset_mock()
+        assert not writer._send_data({"temp": 2})
+        session.post.assert_not_called()
+
+        # VictoriaMetrics is back: the backlog is delivered in order
+        session.post.side_effect = None
+        session.post.return_value = _response(204)
+        writer._retry_at = 0
+        writer._replay()
+        payload = session.post.call_args.kwargs["data"]
+        assert payload == b"idm_heatpump temp=1\nidm_heatpump temp=2"
+        assert writer.spool.pending_bytes == 0
+        assert writer.get_metrics()["spool_records_replayed_total"] == 2
+
+        # No backlog: direct delivery
+        assert writer._send_data({"temp": 3})
+
+
+def test_writer_drops_rejected_batches(tmp_path):
+    settings = {"metrics.spool.directory": str(tmp_path)}
+    with (
+        patch("idm_logger.metrics.requests.Session") as mock_session,
+        patch("idm_logger.metrics.config") as mock_config,
+    ):
+        mock_config.get.side_effect = lambda key, default=None: settings.get(
+            key, default
+        )
+        session = MagicMock()
+        session.post.return_value = _response(400)
+        mock_session.return_value = session
+        writer = MetricsWriter()
+        writer.stop()
+
+        assert not writer._send_data({"temp": 1})
+        assert writer.spool.pending_bytes == 0
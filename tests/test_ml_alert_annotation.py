@@ -10,6 +10,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 class TestMLAlertAnnotation(unittest.TestCase):
     def setUp(self):
+        # C extensions cannot be imported twice: keep pandas loaded across tests
+        import pandas  # noqa: F401
+
         # Save original modules to restore later
         self._original_modules = sys.modules.copy()
 
@@ -99,6 +102,30 @@ class TestMLAlertAnnotation(unittest.TestCase):
         self.assertEqual(kwargs["tags"], ["ai", "anomaly", "heating"])
         self.assertEqual(kwargs["color"], "#ef4444")
 
+    def test_score_update_feeds_current_metrics(self):
+        headers = {"X-Internal-Secret": "secret", "Content-Type": "application/json"}
+        payload = {"type": "score", "score": 0.3, "threshold": 0.7, "timestamp": 1e12}
+
+        response = self.client.post(
+            "/api/internal/ml_alert", data=json.dumps(payload), headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.web.notification_manager.send_all.assert_not_called()
+        self.web.annotation_manager.add_annotation.assert_not_called()
+
+        self.web.update_current_data({"temp_outside": 5.5}, timestamp=1e12)
+        with self.client.session_transaction() as session:
+            session["logged_in"] = True
+        with patch.object(self.web.vm_client, "get") as mock_get:
+            metrics = self.client.get("/api/metrics/current").get_json()
+        mock_get.assert_not_called()
+
+        self.assertEqual(
+            metrics["idm_heatpump_temp_outside"], {"value": 5.5, "timestamp": 1e12}
+        )
+        self.assertEqual(metrics["idm_anomaly_score"]["value"], 0.3)
+        self.assertEqual(metrics["idm_anomaly_flag"]["value"], 0.0)
+
 
 if __name__ == "__main__":
     unittest.main()
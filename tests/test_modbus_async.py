@@ -0,0 +1,206 @@
+# SPDX-License-Identifier: MIT
+import asyncio
+import os
+import struct
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.modbus_async import PipelinedModbusEngine
+from idm_logger.read_planner import ReadBlock
+from idm_logger.sensor_addresses import _UCharSensorAddress
+
+
+class FakeModbusServer:
+    """
+    Tiny Modbus TCP server answering function code 3.
+
+    Register values equal their address. Requests touching bad registers get
+    an "illegal data address" exception. With serialise=True requests are
+    processed strictly one after another, otherwise concurrently.
+    """
+
+    def __init__(self, delay=0.02, serialise=False, bad_registers=()):
+        self.delay = delay
+        self.serialise = serialise
+        self.bad_registers = set(bad_registers)
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait(5)
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle, "127.0.0.1", 0)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        ready.set()
+        self.loop.run_forever()
+
+    async def _respond(self, writer, header, address, count):
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        await asyncio.sleep(self.delay)
+        self._in_flight -= 1
+        tid, _, _, uid = header
+        if any(a in self.bad_registers for a in range(address, address + count)):
+            pdu = struct.pack(">BB", 0x83, 2)
+        else:
+            pdu = struct.pack(">BB", 3, count * 2) + b"".join(
+                struct.pack(">H", a) for a in range(address, address + count)
+            )
+        writer.write(struct.pack(">HHHB", tid, 0, len(pdu) + 1, uid) + pdu)
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                raw = await reader.readexactly(7)
+                header = struct.unpack(">HHHB", raw)
+                body = await reader.readexactly(header[2] - 1)
+                _, address, count = struct.unpack(">BHH", body)
+                if self.serialise:
+                    await self._respond(writer, header, address, count)
+                else:
+                    asyncio.ensure_future(self._respond(writer, header, address, count))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.server.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+
+
+def _blocks(count, size=2):
+    return [
+        ReadBlock(
+            sensors=[
+                _UCharSensorAddress(
+                    address=100 + i * 10 + j, name=f"s{i}_{j}", unit=None
+                )
+                for j in range(size)
+            ]
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def concurrent_server():
+    server = FakeModbusServer(delay=0.02)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def serial_server():
+    server = FakeModbusServer(delay=0.02, serialise=True)
+    yield server
+    server.stop()
+
+
+def test_pipelined_reads_overlap(concurrent_server):
+    engine = PipelinedModbusEngine(
+        "127.0.0.1", concurrent_server.port, pipeline_depth=4, timeout=2
+    )
+    try:
+        assert engine.connect()
+        blocks = _blocks(12)
+
+        # First cycle is sequential to measure the baseline
+        results = engine.read_blocks(blocks)
+        assert engine.pipeline_depth == 4
+        assert all(err is None for _, _, err, _ in results)
+        assert [rr.registers for _, rr, _, _ in results][1] == [110, 111]
+
+        start = time.perf_counter()
+        results = engine.read_blocks(blocks)
+        elapsed = time.perf_counter() - start
+
+        assert [b for b, _, _, _ in results] == blocks
+        assert all(not rr.isError() for _, rr, _, _ in results)
+        assert concurrent_server.max_in_flight > 1
+        # 12 requests at 20ms each would take 240ms sequentially
+        assert elapsed < 0.2
+        assert engine.pipeline_depth == 4
+    finally:
+        engine.stop()
+
+
+def test_falls_back_when_device_serialises(serial_server):
+    engine = PipelinedModbusEngine(
+        "127.0.0.1", serial_server.port, pipeline_depth=4, timeout=2
+    )
+    try:
+        assert engine.connect()
+        blocks = _blocks(8)
+        for _ in range(5):
+            engine.read_blocks(blocks)
+
+        assert engine.pipeline_depth == 1
+        assert engine.get_stats()["fallback_reason"] == "device serialises requests"
+    finally:
+        engine.stop()
+
+
+def test_illegal_address_returns_exception_response():
+    server = FakeModbusServer(delay=0.0, bad_registers={101})
+    engine = PipelinedModbusEngine("127.0.0.1", server.port, timeout=2)
+    try:
+        assert engine.connect()
+        results = engine.read_blocks(_blocks(2))
+
+        _, bad_rr, err, _ = results[0]
+        assert err is None
+        assert bad_rr.isError()
+        assert bad_rr.exception_code == 2
+        assert not results[1][1].isError()
+    finally:
+        engine.stop()
+        server.stop()
+
+
+def test_modbus_client_uses_async_engine(concurrent_server):
+    from idm_logger.modbus import ModbusClient
+
+    class FakeSettings:
+        def get_setting(self, key, default=None):
+            return default
+
+        def set_setting(self, key, value):
+            pass
+
+    with (
+        patch("idm_logger.modbus.MODBUS_ENGINE", "async"),
+        patch("idm_logger.modbus.db", FakeSettings()),
+    ):
+        client = ModbusClient("127.0.0.1", concurrent_server.port)
+        client.sensors = {
+            s.name: s
+            for s in [
+                _UCharSensorAddress(address=a, name=f"s{a}", unit=None)
+                for a in (100, 101, 200, 300)
+            ]
+        }
+        client.binary_sensors = {}
+        try:
+            with patch.object(client.client, "read_holding_registers") as sync_read:
+                data = client.read_sensors()
+            assert data == {"s100": 100, "s101": 101, "s200": 200, "s300": 300}
+            assert client.get_connection_stats()["engine"]["requests"] > 0
+            sync_read.assert_not_called()
+        finally:
+            client.close()
+            client._engine.stop()
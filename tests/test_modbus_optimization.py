@@ -11,9 +11,11 @@ from idm_logger.modbus import ModbusClient
 from idm_logger.sensor_addresses import _FloatSensorAddress
 
 
+# The read plan cache must not touch the real settings database
+@patch("idm_logger.modbus.db")
 class TestModbusOptimization(unittest.TestCase):
     @patch("idm_logger.modbus.ModbusTcpClient")
-    def test_block_creation(self, mock_client):
+    def test_block_creation(self, mock_client, mock_db):
         # Create instance with mocked client
         client = ModbusClient("localhost", 502)
 
@@ -71,7 +73,8 @@ class TestModbusOptimization(unittest.TestCase):
         self.assertEqual(blocks[2], [s6])
 
     @patch("idm_logger.modbus.ModbusTcpClient")
-    def test_read_requests(self, mock_client_cls):
+    def test_read_requests(self, mock_client_cls, mock_db):
+        mock_db.get_setting.return_value = None
         # Setup mock instance
         mock_instance = mock_client_cls.return_value
         mock_instance.connect.return_value = True
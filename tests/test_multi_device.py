@@ -0,0 +1,142 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger import devices as devices_module
+from idm_logger.devices import DeviceConfig, DevicePool, load_device_configs
+from idm_logger.metrics import MetricsWriter
+
+
+def _config(values):
+    return lambda key, default=None: values.get(key, default)
+
+
+def test_legacy_single_device_fallback():
+    values = {"idm.host": "10.0.0.1", "idm.port": 502, "idm.circuits": ["A"]}
+    with patch.object(devices_module, "config") as mock_config:
+        mock_config.get.side_effect = _config(values)
+        configs = load_device_configs()
+
+    assert len(configs) == 1
+    assert configs[0].name is None
+    assert configs[0].host == "10.0.0.1"
+    assert configs[0].circuits == ["A"]
+
+
+def test_device_list_skips_invalid_entries():
+    values = {
+        "idm.circuits": ["A"],
+        "idm.devices": [
+            {"name": "wp1", "host": "10.0.0.1"},
+            {"name": "wp1", "host": "10.0.0.2"},
+            {"name": "bad name", "host": "10.0.0.3"},
+            {"name": "nohost"},
+            {"name": "wp2", "host": "10.0.0.4", "port": 5020, "circuits": ["B"]},
+        ],
+    }
+    with patch.object(devices_module, "config") as mock_config:
+        mock_config.get.side_effect = _config(values)
+        configs = load_device_configs()
+
+    assert [c.name for c in configs] == ["wp1", "wp2"]
+    assert configs[0].circuits == ["A"]
+    assert configs[1].port == 5020
+    assert configs[1].circuits == ["B"]
+
+
+def test_pool_polls_devices_concurrently():
+    barrier = threading.Barrier(3, timeout=2)
+
+    def make_client(name, **kwargs):
+        client = MagicMock()
+        client.name = name
+
+        def read_sensors():
+            # Deadlocks (times out) unless all devices are read in parallel
+            barrier.wait()
+            return {"temp": len(name)}
+
+        client.read_sensors.side_effect = read_sensors
+        return client
+
+    with patch.object(devices_module, "ModbusClient", side_effect=make_client):
+        pool = DevicePool(
+            [
+                DeviceConfig(name=n, host=f"h{i}")
+                for i, n in enumerate(["a", "bb", "ccc"])
+            ]
+        )
+
+    start = time.monotonic()
+    results = pool.read_all()
+    assert time.monotonic() - start < 2
+    assert [(c.name, d) for c, d in results] == [
+        ("a", {"temp": 1}),
+        ("bb", {"temp": 2}),
+        ("ccc", {"temp": 3}),
+    ]
+    assert pool.primary.name == "a"
+    pool.close()
+
+
+def test_pool_isolates_device_errors():
+    def make_client(name, **kwargs):
+        client = MagicMock()
+        client.name = name
+        if name == "broken":
+            client.read_sensors.side_effect = ConnectionError("offline")
+        else:
+            client.read_sensors.return_value = {"temp": 20}
+        return client
+
+    with patch.object(devices_module, "ModbusClient", side_effect=make_client):
+        pool = DevicePool(
+            [DeviceConfig(name="broken", host="h1"), DeviceConfig(name="ok", host="h2")]
+        )
+
+    results = {c.name: d for c, d in pool.read_all()}
+    assert results == {"broken": {}, "ok": {"temp": 20}}
+    pool.close()
+
+
+@pytest.fixture
+def mock_session():
+    with patch("idm_logger.metrics.requests.Session") as mock:
+        session = MagicMock()
+        session.post.return_value.status_code = 204
+        mock.return_value = session
+        yield session
+
+
+def test_metrics_device_tag(mock_session):
+    writer = MetricsWriter()
+    writer._send_data([({"temp": 20}, "wp 1"), {"temp": 21}])
+
+    lines = mock_session.post.call_args.kwargs["data"].splitlines()
+    assert lines == ["idm_heatpump,device=wp\\ 1 temp=20", "idm_heatpump temp=21"]
+    writer.stop()
+
+
+def test_web_keeps_per_device_data():
+    from idm_logger import web
+
+    with (
+        patch.object(web, "primary_device", "wp1"),
+        patch.object(web, "device_data", {}),
+        patch.object(web, "current_data", {}),
+        patch.object(web.websocket_handler, "broadcast_metrics") as broadcast,
+    ):
+        web.update_current_data({"temp": 1}, "wp1")
+        web.update_current_data({"temp": 2}, "wp2")
+
+        assert web.device_data == {"wp1": {"temp": 1}, "wp2": {"temp": 2}}
+        assert web.current_data == {"temp": 1}
+        broadcast.assert_called_once_with({"temp": 1}, None, None)
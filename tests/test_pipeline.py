@@ -0,0 +1,131 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+import threading
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.pipeline import Consumer, Snapshot, SnapshotBus
+
+
+def test_snapshot_is_immutable_copy():
+    data = {"temp": 20}
+    snapshot = Snapshot.create(data, "wp1", {"temp"}, 60.0)
+    data["temp"] = 21
+
+    assert snapshot.data["temp"] == 20
+    assert snapshot.changed == frozenset({"temp"})
+    with pytest.raises(TypeError):
+        snapshot.data["temp"] = 22
+
+
+def test_slow_consumer_does_not_block_others():
+    release = threading.Event()
+    started = threading.Event()
+    fast_done = threading.Event()
+    received = []
+
+    def slow(snapshot):
+        started.set()
+        release.wait(5)
+
+    def fast(snapshot):
+        received.append(snapshot.data["n"])
+        if len(received) == 5:
+            fast_done.set()
+
+    bus = SnapshotBus()
+    bus.consumers["slow"] = Consumer("slow", slow, queue_size=2, policy="drop_oldest")
+    bus.consumers["fast"] = Consumer("fast", fast, queue_size=10)
+
+    bus.publish(Snapshot.create({"n": 0}))
+    assert started.wait(5)
+    for n in range(1, 5):
+        bus.publish(Snapshot.create({"n": n}))
+
+    assert fast_done.wait(5)
+    assert received == [0, 1, 2, 3, 4]
+    # The slow consumer holds one snapshot in its handler and 2 queued,
+    # the older ones were dropped
+    assert bus.consumers["slow"].dropped == 2
+
+    release.set()
+    bus.stop()
+    stats = bus.get_stats()["slow"]
+    assert stats["processed"] == 3
+    assert "pipeline_slow_dropped_total" in bus.get_metrics()
+
+
+def test_drop_newest_and_block_policies():
+    release = threading.Event()
+    started = threading.Event()
+
+    def handler(snapshot):
+        started.set()
+        release.wait(5)
+
+    newest = Consumer("newest", handler, queue_size=1, policy="drop_newest")
+    newest.offer(Snapshot.create({"n": 0}))
+    assert started.wait(5)
+    assert newest.offer(Snapshot.create({"n": 1}))
+    assert not newest.offer(Snapshot.create({"n": 2}))
+    assert newest.dropped == 1
+
+    started.clear()
+    blocking = Consumer(
+        "block", handler, queue_size=1, policy="block", block_timeout=0.05
+    )
+    blocking.offer(Snapshot.create({"n": 0}))
+    assert started.wait(5)
+    assert blocking.offer(Snapshot.create({"n": 1}))
+    assert not blocking.offer(Snapshot.create({"n": 2}))
+
+    release.set()
+    newest.stop()
+    blocking.stop()
+    assert newest.processed == 2
+    assert blocking.processed == 2
+
+
+def test_dropped_changes_are_carried_over():
+    release = threading.Event()
+    started = threading.Event()
+    handled = []
+
+    def handler(snapshot):
+        started.set()
+        release.wait(5)
+        handled.append(snapshot)
+
+    consumer = Consumer("mqtt", handler, queue_size=1, policy="drop_oldest")
+    consumer.offer(Snapshot.create({"n": 0}, "wp1", {"a"}))
+    assert started.wait(5)
+    consumer.offer(Snapshot.create({"n": 1}, "wp1", {"b"}))
+    # Drops n=1, whose change of "b" must not be lost
+    consumer.offer(Snapshot.create({"n": 2}, "wp1", {"c"}))
+    assert consumer.dropped == 1
+
+    release.set()
+    consumer.stop()
+    assert [s.data["n"] for s in handled] == [0, 2]
+    assert handled[1].changed == frozenset({"b", "c"})
+
+
+def test_handler_errors_are_counted():
+    done = threading.Event()
+
+    def handler(snapshot):
+        if snapshot.data.get("fail"):
+            raise RuntimeError("boom")
+        done.set()
+
+    consumer = Consumer("alerts", handler)
+    consumer.offer(Snapshot.create({"fail": True}))
+    consumer.offer(Snapshot.create({"fail": False}))
+    assert done.wait(5)
+    consumer.stop()
+    assert consumer.errors == 1
+    assert consumer.processed == 1
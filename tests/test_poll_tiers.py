@@ -0,0 +1,186 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.modbus import ModbusClient
+from idm_logger.poll_tiers import PollTiers
+from idm_logger.read_planner import DEFAULT_TIER, ReadPlanner
+from idm_logger.sensor_addresses import (
+    SensorFeatures,
+    UnitOfEnergy,
+    UnitOfTemperature,
+    _FloatSensorAddress,
+    _UCharSensorAddress,
+)
+
+
+def _temp(address):
+    return _FloatSensorAddress(
+        address=address, name=f"temp{address}", unit=UnitOfTemperature.CELSIUS
+    )
+
+
+def _energy(address):
+    return _FloatSensorAddress(
+        address=address, name=f"energy{address}", unit=UnitOfEnergy.KILO_WATT_HOUR
+    )
+
+
+def _setpoint(address):
+    return _UCharSensorAddress(
+        address=address,
+        name=f"mode{address}",
+        unit=None,
+        supported_features=SensorFeatures.SET_POWER,
+    )
+
+
+def _tiers(**kwargs):
+    kwargs.setdefault("enabled", True)
+    kwargs.setdefault("intervals", {})
+    kwargs.setdefault("overrides", {})
+    return PollTiers(**kwargs)
+
+
+def test_default_classification():
+    tiers = _tiers()
+    assert tiers.tier_of(_temp(1000)) == "fast"
+    assert tiers.tier_of(_energy(1002)) == "energy"
+    assert tiers.tier_of(_setpoint(1004)) == "slow"
+    assert (
+        tiers.tier_of(_UCharSensorAddress(address=1005, name="x", unit=None))
+        == DEFAULT_TIER
+    )
+    # Disabled: everything in one tier
+    assert _tiers(enabled=False).tier_of(_temp(1000)) == DEFAULT_TIER
+
+
+def test_overrides_by_name_and_pattern():
+    tiers = _tiers(overrides={"temp1000": "slow", "energy*": "fast", "temp1": "nope"})
+    assert tiers.tier_of(_temp(1000)) == "slow"
+    assert tiers.tier_of(_energy(1002)) == "fast"
+    # Unknown tiers fall back to the default tier
+    assert tiers.tier_of(_temp(1)) == DEFAULT_TIER
+
+
+def test_due_tiers():
+    with patch("idm_logger.poll_tiers.base_interval", return_value=60):
+        tiers = _tiers(intervals={"fast": 10, "slow": 300})
+        all_tiers = {"fast", "slow", DEFAULT_TIER}
+        assert tiers.tick_interval() == 10
+
+        assert tiers.due(all_tiers, 0) == all_tiers
+        tiers.mark_read(all_tiers, 0)
+        assert tiers.due(all_tiers, 4) == set()
+        # Half a tick of tolerance for loop jitter
+        assert tiers.due(all_tiers, 9.5) == {"fast"}
+        tiers.mark_read({"fast"}, 9.5)
+        assert tiers.due(all_tiers, 60) == {"fast", DEFAULT_TIER}
+
+        disabled = _tiers(enabled=False)
+        disabled.mark_read(all_tiers, 0)
+        assert disabled.due(all_tiers, 1) == all_tiers
+
+
+def test_planner_keeps_tiers_in_separate_blocks():
+    tiers = _tiers()
+    sensors = [_temp(1000), _energy(1002), _temp(1004), _setpoint(1006)]
+    planner = ReadPlanner(max_block_size=50, max_gap=5)
+    blocks = planner.build(sensors, set(), tier_of=tiers.tier_of)
+
+    assert planner.tiers == {"fast", "energy", "slow"}
+    for block in blocks:
+        assert {tiers.tier_of(s) for s in block.sensors} == {block.tier}
+    fast = [b for b in blocks if b.tier == "fast"]
+    assert len(fast) == 1 and len(fast[0].sensors) == 2
+
+    assert [b.tier for b in planner.due_blocks({"energy"})] == ["energy"]
+    assert len(planner.due_blocks()) == len(blocks)
+
+    # A persisted plan is only reused with the same tier assignment
+    exported = planner.to_dict()
+    by_name = {s.name: s for s in sensors}
+    assert ReadPlanner().from_dict(exported, by_name, tier_of=tiers.tier_of)
+    assert not ReadPlanner().from_dict(
+        exported, by_name, tier_of=lambda sensor: DEFAULT_TIER
+    )
+
+
+@pytest.fixture
+def device():
+    registers = {}
+    requests = []
+
+    def read_holding_registers(address, count, device_id=1):
+        requests.append(address)
+        rr = MagicMock()
+        rr.isError.return_value = False
+        rr.registers = [registers.get(a, 0) for a in range(address, address + count)]
+        return rr
+
+    with (
+        patch("idm_logger.modbus.ModbusTcpClient") as mock_client_cls,
+        patch("idm_logger.modbus.db") as mock_db,
+    ):
+        mock_db.get_setting.return_value = None
+        mock_instance = mock_client_cls.return_value
+        mock_instance.is_socket_open.return_value = True
+        mock_instance.read_holding_registers.side_effect = read_holding_registers
+        yield registers, requests
+
+
+def test_modbus_client_reads_only_due_tiers(device):
+    registers, requests = device
+    client = ModbusClient("localhost", 502)
+    client._tiers = _tiers(intervals={"fast": 5, "slow": 300})
+    fast = _UCharSensorAddress(address=100, name="fast", unit=None)
+    slow = _setpoint(200)
+    client._tiers.overrides = {"fast": "fast"}
+    client.sensors = {"fast": fast, slow.name: slow}
+    client.binary_sensors = {}
+
+    with patch("idm_logger.modbus.time.time", return_value=1000.0):
+        data = client.read_sensors()
+    assert sorted(requests) == [100, 200]
+    assert client.poll_interval == 5
+
+    requests.clear()
+    registers[100] = 3
+    registers[200] = 4
+    with patch("idm_logger.modbus.time.time", return_value=1005.0):
+        data = client.read_sensors()
+    # Only the fast tier is read, the setpoint keeps its last value
+    assert requests == [100]
+    assert data == {"fast": 3, slow.name: 0}
+    assert client.changed_sensors == {"fast"}
+    assert client.get_connection_stats()["poll_tiers"]["enabled"]
+
+
+def test_due_tiers_are_read_in_one_round(device):
+    _, requests = device
+    client = ModbusClient("localhost", 502)
+    client._tiers = _tiers(intervals={"fast": 5, "slow": 300})
+    client._tiers.overrides = {"fast": "fast"}
+    slow = _setpoint(200)
+    client.sensors = {
+        "fast": _UCharSensorAddress(address=100, name="fast", unit=None),
+        slow.name: slow,
+    }
+    client.binary_sensors = {}
+
+    with (
+        patch("idm_logger.modbus.time.time", return_value=1000.0),
+        patch.object(client, "_execute_reads", wraps=client._execute_reads) as reads,
+    ):
+        client.read_sensors()
+    # Blocks stay separate per tier but go out together (pipelined with
+    # modbus.engine: async)
+    reads.assert_called_once()
+    assert sorted(b.tier for b in reads.call_args.args[0]) == ["fast", "slow"]
+    assert sorted(requests) == [100, 200]
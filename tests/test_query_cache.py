@@ -0,0 +1,125 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.query_cache import RangeQueryCache, parse_step, parse_time
+
+STEP = 60.0
+NOW = 100020.0
+
+
+class FakeVM:
+    """query_range with one series whose value is the timestamp."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        values = []
+        ts = start
+        while ts <= end:
+            values.append([ts, str(ts)])
+            ts += STEP
+        return {
+            "status": "success",
+            "data": {
+                "resultType": "matrix",
+                "result": [{"metric": {"__name__": "temp"}, "values": values}],
+            },
+        }
+
+
+def _timestamps(result):
+    return [point[0] for point in result["data"]["result"][0]["values"]]
+
+
+def test_parse_params():
+    assert parse_step("60") == 60.0
+    assert parse_step("5m") == 300.0
+    assert parse_step("0") is None
+    assert parse_step("1y") is None
+    assert parse_time("1700000000") == 1700000000.0
+    assert parse_time("2024-01-01T00:00:00Z") is None
+
+
+def test_refresh_fetches_only_the_tail():
+    cache = RangeQueryCache(chunk_points=10, min_age=300, clock=lambda: NOW)
+    vm = FakeVM()
+
+    first = cache.query("temp", NOW - 6000, NOW, STEP, vm)
+    assert _timestamps(first) == [NOW - 6000 + i * STEP for i in range(101)]
+    # Whole chunks are fetched so they can be cached
+    assert vm.calls == [(93600.0, NOW)]
+
+    refreshed = cache.query("temp", NOW - 5990, NOW + 10, STEP, vm)
+    assert _timestamps(refreshed) == _timestamps(first)
+    # Only chunks ending within min_age are fetched again
+    assert vm.calls[1] == (99600.0, NOW)
+    assert cache.get_stats()["hits"] == 10
+
+
+def test_historical_range_is_served_from_memory():
+    cache = RangeQueryCache(chunk_points=10, min_age=300, clock=lambda: NOW)
+    vm = FakeVM()
+    cache.query("temp", 60000, 61000, STEP, vm)
+    result = cache.query("temp", 60100, 60900, STEP, vm)
+    assert len(vm.calls) == 1
+    assert _timestamps(result)[0] == 60060.0
+    assert _timestamps(result)[-1] == 60900.0
+    # Other steps and queries are cached separately
+    cache.query("temp", 60000, 61000, 2 * STEP, vm)
+    cache.query("other", 60000, 61000, STEP, vm)
+    assert len(vm.calls) == 3
+
+
+def test_lru_eviction_by_size():
+    cache = RangeQueryCache(
+        max_bytes=1500, chunk_points=10, min_age=300, clock=lambda: NOW
+    )
+    vm = FakeVM()
+    cache.query("temp", 0, 6000, STEP, vm)
+    stats = cache.get_stats()
+    assert stats["bytes"] <= 1500
+    assert stats["evictions"] > 0
+
+    # The oldest chunks were evicted, the newest are still cached
+    cache.query("temp", 5400, 5940, STEP, vm)
+    assert len(vm.calls) == 1
+    cache.query("temp", 0, 500, STEP, vm)
+    assert len(vm.calls) == 2
+
+
+def test_errors_are_not_cached():
+    cache = RangeQueryCache(chunk_points=10, min_age=300, clock=lambda: NOW)
+    error = {"status": "error", "error": "bad query"}
+    assert cache.query("x(", 0, 600, STEP, lambda s, e: error) == error
+    assert cache.get_stats()["chunks"] == 0
+
+
+def test_range_dependent_queries_bypass_the_cache():
+    cache = RangeQueryCache(chunk_points=10, min_age=300, clock=lambda: NOW)
+    vm = FakeVM()
+    for query in ("running_sum(temp)", "range_max(temp)", "temp @ end()"):
+        cache.query(query, 0, 6000, STEP, vm)
+        cache.query(query, 0, 6000, STEP, vm)
+
+    # Passed through with the requested range, nothing stored
+    assert vm.calls == [(0, 6000)] * 6
+    assert cache.get_stats()["chunks"] == 0
+    assert cache.get_stats()["bypassed"] == 6
+
+
+def test_lookbehind_windows_are_cached():
+    cache = RangeQueryCache(chunk_points=10, min_age=300, clock=lambda: NOW)
+    vm = FakeVM()
+    for query in ("rate(temp[5m])", "avg_over_time(temp[1h:5m])", "temp offset 1h"):
+        cache.query(query, 60000, 61000, STEP, vm)
+        cache.query(query, 60100, 60900, STEP, vm)
+
+    # One fetch per query, the second range comes from memory
+    assert len(vm.calls) == 3
+    assert cache.get_stats()["bypassed"] == 0
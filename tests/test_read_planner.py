@@ -0,0 +1,216 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.modbus import ModbusClient
+from idm_logger.read_planner import ReadPlanner
+from idm_logger.sensor_addresses import _FloatSensorAddress, _UCharSensorAddress
+
+
+def _sensors(addresses):
+    return [_UCharSensorAddress(address=a, name=f"s{a}", unit=None) for a in addresses]
+
+
+class FakeDevice:
+    """Minimal Modbus device that rejects requests touching bad registers."""
+
+    def __init__(self, bad_registers=()):
+        self.bad_registers = set(bad_registers)
+        self.requests = []
+
+    def read_holding_registers(self, address, count, device_id=1):
+        self.requests.append((address, count))
+        rr = MagicMock()
+        if any(a in self.bad_registers for a in range(address, address + count)):
+            rr.isError.return_value = True
+            rr.exception_code = 2
+        else:
+            rr.isError.return_value = False
+            rr.registers = list(range(address, address + count))
+        return rr
+
+
+class TestReadPlanner(unittest.TestCase):
+    def test_split_in_half_on_failure(self):
+        planner = ReadPlanner(max_block_size=50, max_gap=5)
+        planner.build(_sensors(range(100, 108)), set())
+        self.assertEqual(len(planner.blocks), 1)
+
+        halves = planner.record_failure(planner.blocks[0], illegal_address=True)
+
+        self.assertEqual(len(halves), 2)
+        self.assertEqual([b.key for b in planner.blocks], [(100, 104), (104, 108)])
+        self.assertEqual(halves[0].parent, (100, 108))
+
+    def test_single_sensor_marked_bad_and_skipped(self):
+        planner = ReadPlanner(bad_retry_cycles=3)
+        planner.build(_sensors([100]), set())
+        block = planner.blocks[0]
+
+        self.assertEqual(planner.record_failure(block, illegal_address=True), [])
+        self.assertTrue(block.bad)
+        self.assertIn(100, planner.bad_addresses)
+        self.assertEqual(planner.due_blocks(), [])
+
+        # Retried after bad_retry_cycles cycles
+        for _ in range(3):
+            planner.end_cycle()
+        self.assertEqual(planner.due_blocks(), [block])
+
+        planner.record_success(block, 0.01)
+        self.assertFalse(block.bad)
+        self.assertNotIn(100, planner.bad_addresses)
+
+    def test_remerge_after_successes_with_backoff(self):
+        planner = ReadPlanner(remerge_after=2)
+        planner.build(_sensors(range(100, 104)), set())
+        planner.record_failure(planner.blocks[0], illegal_address=False)
+        self.assertEqual(len(planner.blocks), 2)
+
+        for _ in range(2):
+            for block in planner.blocks:
+                planner.record_success(block, 0.01)
+            planner.end_cycle()
+
+        self.assertEqual([b.key for b in planner.blocks], [(100, 104)])
+
+        # Merged block fails again: next merge needs twice as many successes
+        planner.record_failure(planner.blocks[0], illegal_address=True)
+        for _ in range(2):
+            for block in planner.blocks:
+                planner.record_success(block, 0.01)
+            planner.end_cycle()
+        self.assertEqual(len(planner.blocks), 2)
+
+        for _ in range(2):
+            for block in planner.blocks:
+                planner.record_success(block, 0.01)
+            planner.end_cycle()
+        self.assertEqual(len(planner.blocks), 1)
+
+
+class FakeSettings:
+    """Dict-backed stand-in for the settings table."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get_setting(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set_setting(self, key, value):
+        self.values[key] = value
+
+
+class TestModbusClientAdaptivePlan(unittest.TestCase):
+    def setUp(self):
+        self.settings = FakeSettings()
+        patcher = patch("idm_logger.modbus.db", self.settings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("idm_logger.modbus.ModbusTcpClient")
+    def test_binary_search_instead_of_single_reads(self, mock_client_cls):
+        device = FakeDevice(bad_registers={107})
+        mock_instance = mock_client_cls.return_value
+        mock_instance.is_socket_open.return_value = True
+        mock_instance.read_holding_registers.side_effect = device.read_holding_registers
+
+        client = ModbusClient("localhost", 502)
+        # 16 single-register sensors at 100..115, register 107 is rejected
+        client.sensors = {s.name: s for s in _sensors(range(100, 116))}
+        client.binary_sensors = {}
+
+        data = client.read_sensors()
+        self.assertEqual(len(data), 15)
+        self.assertNotIn("s107", data)
+        # Binary search: far fewer requests than one per sensor
+        self.assertLess(len(device.requests), 16)
+
+        device.requests.clear()
+        data = client.read_sensors()
+        self.assertEqual(len(data), 15)
+        # Steady state: one request per stable block, bad register skipped
+        self.assertLessEqual(len(device.requests), 4)
+        self.assertNotIn((107, 1), device.requests)
+        self.assertIn(107, client.get_connection_stats()["read_plan"]["bad_addresses"])
+
+    @patch("idm_logger.modbus.ModbusTcpClient")
+    def test_plan_persisted_across_restarts(self, mock_client_cls):
+        device = FakeDevice(bad_registers={107})
+        mock_instance = mock_client_cls.return_value
+        mock_instance.is_socket_open.return_value = True
+        mock_instance.read_holding_registers.side_effect = device.read_holding_registers
+        sensors = {s.name: s for s in _sensors(range(100, 116))}
+
+        client = ModbusClient("localhost", 502)
+        client.sensors = dict(sensors)
+        client.binary_sensors = {}
+        client.invalidate_cache()
+        client.read_sensors()
+        client.close()
+        learned = [b.key for b in client._planner.blocks]
+
+        # "Restart": a fresh client restores the learned plan before reading
+        device.requests.clear()
+        restarted = ModbusClient("localhost", 502)
+        restarted.sensors = dict(sensors)
+        restarted.binary_sensors = {}
+        restarted.invalidate_cache()
+        data = restarted.read_sensors()
+
+        self.assertEqual(len(data), 15)
+        self.assertEqual([b.key for b in restarted._planner.blocks], learned)
+        self.assertNotIn((100, 16), device.requests)
+        self.assertIn(107, restarted._planner.bad_addresses)
+
+    @patch("idm_logger.modbus.ModbusTcpClient")
+    def test_persisted_plan_ignored_after_firmware_change(self, mock_client_cls):
+        device = FakeDevice(bad_registers={107})
+        mock_instance = mock_client_cls.return_value
+        mock_instance.is_socket_open.return_value = True
+        mock_instance.read_holding_registers.side_effect = device.read_holding_registers
+        sensors = {s.name: s for s in _sensors(range(100, 116))}
+
+        client = ModbusClient("localhost", 502)
+        client.sensors = dict(sensors)
+        client.binary_sensors = {}
+        client.invalidate_cache()
+        client.read_sensors()
+        client.close()
+
+        with patch("idm_logger.modbus.config") as mock_config:
+            mock_config.get.side_effect = lambda key, default=None: (
+                "99.0" if key == "idm.firmware_version" else default
+            )
+            restarted = ModbusClient("localhost", 502)
+            restarted.sensors = dict(sensors)
+            restarted.binary_sensors = {}
+            restarted.invalidate_cache()
+            self.assertFalse(restarted._load_read_plan())
+
+    @patch("idm_logger.modbus.ModbusTcpClient")
+    def test_connection_loss_keeps_plan(self, mock_client_cls):
+        mock_instance = mock_client_cls.return_value
+        mock_instance.is_socket_open.side_effect = [True, False, False, False]
+        mock_instance.read_holding_registers.side_effect = ConnectionError("lost")
+
+        client = ModbusClient("localhost", 502)
+        client.sensors = {
+            "a": _FloatSensorAddress(address=100, name="a", unit=None),
+            "b": _FloatSensorAddress(address=102, name="b", unit=None),
+        }
+        client.binary_sensors = {}
+
+        self.assertEqual(client.read_sensors(), {})
+        self.assertEqual(mock_instance.read_holding_registers.call_count, 1)
+        self.assertEqual(len(client._planner.blocks), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+# SPDX-License-Identifier: MIT
+import math
+import os
+import random
+import struct
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.read_planner import group_sensors
+from idm_logger.sensor_addresses import (
+    BINARY_SENSOR_ADDRESSES,
+    COMMON_SENSORS,
+    BlockDecoder,
+    HeatingCircuit,
+    _decode_registers,
+    _encode_value,
+    _FloatSensorAddress,
+    heating_circuit_sensors,
+    zone_sensors,
+)
+from idm_logger.vector_decoder import NUMPY_AVAILABLE, NumpyBlockDecoder
+
+DATATYPES = ["float32", "int16", "uint16", "int32", "uint32"]
+ORDERS = [("big", "little"), ("big", "big"), ("little", "little"), ("little", "big")]
+
+
+def _reference_decode(registers, datatype, byteorder, wordorder):
+    """Decoder as implemented before the codec table (byte-by-byte)."""
+    if wordorder == "little" and len(registers) > 1:
+        registers = list(reversed(registers))
+    e = ">" if byteorder == "big" else "<"
+    byte_data = b"".join(struct.pack(f"{e}H", reg) for reg in registers)
+    fmt = {"float32": "f", "int16": "h", "uint16": "H", "int32": "i", "uint32": "I"}
+    if datatype in ("int16", "uint16"):
+        byte_data = byte_data[:2]
+    return struct.unpack(e + fmt[datatype], byte_data)[0]
+
+
+def _all_sensors():
+    sensors = list(COMMON_SENSORS)
+    for circuit in HeatingCircuit:
+        sensors += heating_circuit_sensors(circuit)
+    sensors += zone_sensors(0)
+    return sensors + list(BINARY_SENSOR_ADDRESSES.values())
+
+
+@pytest.mark.parametrize("byteorder,wordorder", ORDERS)
+@pytest.mark.parametrize("datatype", DATATYPES)
+def test_codec_matches_reference(datatype, byteorder, wordorder):
+    rng = random.Random(42)
+    size = 2 if datatype in ("float32", "int32", "uint32") else 1
+    for _ in range(200):
+        registers = [rng.randrange(0x10000) for _ in range(size)]
+        expected = _reference_decode(registers, datatype, byteorder, wordorder)
+        value = _decode_registers(registers, datatype, byteorder, wordorder)
+        if datatype == "float32" and math.isnan(expected):
+            assert math.isnan(value)
+            continue
+        assert value == expected
+        if datatype != "float32":
+            assert _encode_value(value, datatype, byteorder, wordorder) == registers
+
+
+def test_float_word_order():
+    # 21.5 = 0x41AC0000, IDM stores the low word first
+    assert _encode_value(21.5, "float32") == [0x0000, 0x41AC]
+    assert _decode_registers([0x0000, 0x41AC], "float32") == 21.5
+
+
+def test_block_decoder_matches_per_sensor_decoding():
+    rng = random.Random(1)
+    sensors = [s for s in _all_sensors() if s.read_supported]
+    blocks = group_sensors(sensors, set(), max_block_size=50, max_gap=5)
+
+    for block in blocks:
+        start = min(s.address for s in block)
+        count = max(s.address + s.size for s in block) - start
+        registers = [rng.randrange(0x10000) for _ in range(count)]
+
+        decoded = BlockDecoder(block, start, count).decode(registers)
+
+        assert len(decoded) == len(block)
+        for sensor, raw in decoded:
+            offset = sensor.address - start
+            expected = sensor.codec.decode(registers[offset : offset + sensor.size])
+            assert raw == expected or (math.isnan(raw) and math.isnan(expected))
+
+
+def test_block_decoder_rejects_short_response():
+    sensors = heating_circuit_sensors(HeatingCircuit.A)[:2]
+    decoder = BlockDecoder(sensors, sensors[0].address, 16)
+    with pytest.raises(struct.error):
+        decoder.decode([0] * 4)
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not installed")
+def test_numpy_decoder_matches_per_sensor_decoding():
+    rng = random.Random(2)
+    sensors = [s for s in _all_sensors() if s.read_supported]
+    blocks = group_sensors(sensors, set(), max_block_size=125, max_gap=5)
+
+    for block in blocks:
+        start = min(s.address for s in block)
+        count = max(s.address + s.size for s in block) - start
+        # Mostly small values so float sensors produce sane readings,
+        # plus 0xFFFF ("not available") markers
+        registers = [
+            rng.choice([0, 1, 0xFFFF, rng.randrange(0x4300)]) for _ in range(count)
+        ]
+
+        decoded = NumpyBlockDecoder(block, start, count).decode_values(registers)
+
+        assert len(decoded) == len(block)
+        for sensor, success, value in decoded:
+            offset = sensor.address - start
+            expected = sensor.decode(registers[offset : offset + sensor.size])
+            assert success == expected[0], sensor.name
+            if isinstance(value, float):
+                assert value == pytest.approx(expected[1], nan_ok=True), sensor.name
+            else:
+                assert value == expected[1], sensor.name
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not installed")
+def test_numpy_decoder_rounds_like_struct_decoder():
+    # Scaled values at .5 boundaries where np.round and round() disagree
+    cases = [(661.5, 0.001, 3), (419.5, 0.001, 3), (810.5, 0.01, 2), (583.25, 0.1, 2)]
+    sensors = [
+        _FloatSensorAddress(
+            address=100 + 2 * i, name=f"f{i}", unit=None, scale=scale, decimal_digits=d
+        )
+        for i, (_, scale, d) in enumerate(cases)
+    ]
+    registers = []
+    for raw, _, _ in cases:
+        registers += _encode_value(raw, "float32")
+
+    numpy_values = NumpyBlockDecoder(sensors, 100, len(registers)).decode_values(
+        registers
+    )
+    struct_values = BlockDecoder(sensors, 100, len(registers)).decode_values(registers)
+    assert numpy_values == struct_values
+    assert [v for _, _, v in numpy_values] == [0.661, 0.419, 8.11, 58.33]
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not installed")
+def test_numpy_decoder_rejects_short_response():
+    sensors = heating_circuit_sensors(HeatingCircuit.A)[:2]
+    decoder = NumpyBlockDecoder(sensors, sensors[0].address, 16)
+    with pytest.raises(ValueError):
+        decoder.decode_values([0] * 4)
+
+
+@pytest.mark.skipif(not NUMPY_AVAILABLE, reason="NumPy not installed")
+def test_modbus_client_numpy_decoder_switch():
+    from idm_logger.modbus import ModbusClient
+
+    sensors = heating_circuit_sensors(HeatingCircuit.A)[:3]
+    registers = {}
+    for sensor, value in zip(sensors, [21.5, 5.25, 40.0]):
+        for i, reg in enumerate(sensor.encode(value)):
+            registers[sensor.address + i] = reg
+
+    def read_holding_registers(address, count, device_id=1):
+        rr = MagicMock()
+        rr.isError.return_value = False
+        rr.registers = [registers.get(a, 0) for a in range(address, address + count)]
+        return rr
+
+    results = {}
+    for decoder in ("struct", "numpy"):
+        with (
+            patch("idm_logger.modbus.MODBUS_DECODER", decoder),
+            patch("idm_logger.modbus.ModbusTcpClient") as mock_client_cls,
+            patch("idm_logger.modbus.db") as mock_db,
+        ):
+            mock_db.get_setting.return_value = None
+            mock_instance = mock_client_cls.return_value
+            mock_instance.is_socket_open.return_value = True
+            mock_instance.read_holding_registers.side_effect = read_holding_registers
+
+            client = ModbusClient("localhost", 502)
+            client.sensors = {s.name: s for s in sensors}
+            client.binary_sensors = {}
+            results[decoder] = client.read_sensors()
+
+    assert results["numpy"] == results["struct"]
+    assert results["numpy"][sensors[0].name] == 21.5
@@ -0,0 +1,120 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger.metrics import MetricsWriter
+from idm_logger.tick_scheduler import TickScheduler
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ticks_are_aligned_to_wall_clock():
+    clock = FakeClock(1000.4)
+    ticks = TickScheduler(policy="skip", wall_clock=clock)
+
+    assert ticks.schedule(60) == (1020.0, 1020.0 - 1000.4)
+    # Cycle finished early: wait for the next boundary
+    clock.now = 1023.0
+    assert ticks.schedule(60) == (1080.0, 57.0)
+    # Interval change realigns to the new grid
+    clock.now = 1081.0
+    assert ticks.schedule(10) == (1090.0, 9.0)
+
+
+def test_skip_policy_counts_skipped_ticks():
+    clock = FakeClock(0.0)
+    ticks = TickScheduler(policy="skip", wall_clock=clock)
+    ticks.schedule(10)  # tick 0
+
+    # Cycle of tick 0 took 35s: ticks 10, 20 are dropped, 30 runs late
+    clock.now = 35.0
+    assert ticks.schedule(10) == (30.0, 0.0)
+    assert ticks.skipped_ticks == 2
+    assert ticks.schedule(10) == (40.0, 5.0)
+
+
+def test_catch_up_policy_fills_missed_ticks():
+    clock = FakeClock(0.0)
+    ticks = TickScheduler(policy="catch_up", max_catch_up=2, wall_clock=clock)
+    ticks.schedule(10)  # tick 0
+
+    clock.now = 45.0
+    # Ticks 10-40 are due: one read for 40, which also fills 20 and 30
+    assert ticks.schedule(10) == (40.0, 0.0)
+    assert ticks.backfill_ticks == [20.0, 30.0]
+    assert ticks.skipped_ticks == 1
+    assert ticks.caught_up_ticks == 2
+    assert ticks.schedule(10) == (50.0, 5.0)
+    assert ticks.backfill_ticks == []
+
+
+def test_late_ticks_keep_their_grid_time():
+    clock = FakeClock(0.0)
+    ticks = TickScheduler(policy="catch_up", max_catch_up=2, wall_clock=clock)
+    stop_event = MagicMock(spec=threading.Event)
+    stop_event.wait.return_value = False
+    stop_event.is_set.return_value = False
+    assert ticks.wait_for_tick(10, stop_event) == 0.0
+
+    clock.now = 45.0
+    # A single read stamped on the grid, no samples between grid points
+    assert ticks.wait_for_tick(10, stop_event) == 40.0
+    assert ticks.backfill_ticks == [20.0, 30.0]
+    assert ticks.wait_for_tick(10, stop_event) == 50.0
+    stop_event.wait.assert_called_with(5.0)
+
+
+def test_wall_clock_stepping_back_realigns():
+    clock = FakeClock(1000.0)
+    ticks = TickScheduler(policy="skip", wall_clock=clock)
+    ticks.schedule(10)
+    clock.now = 500.0
+    assert ticks.schedule(10) == (500.0, 0.0)
+
+
+def test_wait_for_tick():
+    clock = FakeClock(5.0)
+    ticks = TickScheduler(policy="skip", wall_clock=clock)
+    stop_event = MagicMock(spec=threading.Event)
+    stop_event.wait.return_value = False
+    stop_event.is_set.return_value = False
+
+    assert ticks.wait_for_tick(10, stop_event) == 10.0
+    stop_event.wait.assert_called_once_with(5.0)
+    assert ticks.get_stats()["ticks"] == 1
+
+    stop_event.wait.return_value = True
+    assert ticks.wait_for_tick(10, stop_event) is None
+
+
+def test_metrics_are_stamped_with_tick_time():
+    with patch("idm_logger.metrics.requests.Session") as mock_session:
+        session = MagicMock()
+        session.post.return_value.status_code = 204
+        mock_session.return_value = session
+        writer = MetricsWriter()
+
+        writer._send_data(
+            [
+                ({"temp": 20}, "wp1", 1700000000.0, "idm_heatpump"),
+                ({"skipped_ticks_total": 1}, None, 1700000000.0, "idm_logger"),
+            ]
+        )
+        writer.stop()
+
+    lines = session.post.call_args.kwargs["data"].splitlines()
+    assert lines == [
+        "idm_heatpump,device=wp1 temp=20 1700000000000000000",
+        "idm_logger skipped_ticks_total=1 1700000000000000000",
+    ]
@@ -0,0 +1,88 @@
+# SPDX-License-Identifier: MIT
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import pytest
+import requests
+
+# Add the project directory to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from idm_logger import vm_client
+from idm_logger.vm_client import SingleFlight, VMRequestError
+
+
+def _run_concurrently(flight, key, fn, callers=5):
+    """Start callers that all hit the call in flight, then release it."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        leader = pool.submit(flight.do, key, blocking)
+        started.wait(5)
+        followers = [pool.submit(flight.do, key, fn) for _ in range(callers - 1)]
+        while flight.get_stats()["shared"] < callers - 1:
+            time.sleep(0.01)
+        release.set()
+        return [leader, *followers]
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    fn = MagicMock(return_value={"status": "success"})
+
+    futures = _run_concurrently(flight, "q", fn)
+
+    results = [f.result() for f in futures]
+    assert fn.call_count == 1
+    assert all(r is results[0] for r in results)
+    assert flight.get_stats() == {"calls": 1, "shared": 4, "in_flight": 0}
+
+    # Later calls go upstream again
+    flight.do("q", fn)
+    assert fn.call_count == 2
+
+
+def test_errors_are_shared_and_not_kept():
+    flight = SingleFlight()
+    fn = MagicMock(side_effect=requests.ConnectionError("down"))
+
+    leader, *followers = _run_concurrently(flight, "q", fn, callers=3)
+
+    with pytest.raises(requests.ConnectionError) as error:
+        leader.result()
+    for future in followers:
+        # A new exception per caller, still a requests error
+        with pytest.raises(VMRequestError) as shared:
+            future.result()
+        assert isinstance(shared.value, requests.RequestException)
+        assert shared.value.__cause__ is error.value
+    assert fn.call_count == 1
+
+    fn.side_effect = None
+    fn.return_value = 1
+    assert flight.do("q", fn) == 1
+
+
+def test_get_uses_pooled_session_and_keys_by_params():
+    session = MagicMock()
+    with patch.object(vm_client, "get_session", return_value=session):
+        response = vm_client.get("http://vm/api/v1/query", params={"query": "a"})
+
+    assert response is session.get.return_value
+    session.get.assert_called_once_with(
+        "http://vm/api/v1/query", params={"query": "a"}, timeout=10
+    )
+    # Same request whatever the order and type of the parameters
+    assert vm_client._freeze({"query": "a", "time": 1}) == vm_client._freeze(
+        {"time": "1", "query": "a"}
+    )
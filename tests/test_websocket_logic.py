@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 import sys
 import os
+import threading
 
 # Add the project directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -74,31 +75,138 @@ class TestWebSocketHandler:
         assert "test_sid" in handler.subscriptions["metric1"]
         assert "test_sid" in handler.subscriptions["metric2"]
 
-    def test_broadcast_metrics(self, handler, mock_socketio):
-        # Setup subscriptions
-        handler.subscriptions["temp_outdoor"] = {"sid1"}
-        handler.subscriptions["power_total"] = {"sid1", "sid2"}
-
-        data = {"temp_outdoor": 12.5, "power_total": 1500, "unused_metric": 0}
+    def test_subscribe_returns_index(self, handler, mock_socketio):
+        subscribe_handler = mock_socketio.handlers["subscribe"]
 
-        handler.broadcast_metrics(data)
+        with app.test_request_context("/"):
+            from flask import request as flask_request
 
-        # Verify emit calls
-        # We expect emit for temp_outdoor and power_total
-        assert mock_socketio.emit.call_count == 2
+            flask_request.sid = "test_sid"
+            flask_request.namespace = "/"
 
-        # Check arguments
-        emitted_metrics = []
+            subscribe_handler({"metrics": ["metric1", "metric2"]})
+            subscribe_handler({"metrics": ["metric3", "metric1"]})
+
+        # Indices are stable for the session
+        assert handler.clients["test_sid"].index == {
+            "metric1": 0,
+            "metric2": 1,
+            "metric3": 2,
+        }
+        calls = websocket_handler_module.emit.call_args_list
+        assert calls[-1].args == (
+            "subscribed",
+            {
+                "metrics": ["metric3", "metric1"],
+                "dashboard_id": None,
+                "index": {"metric3": 2, "metric1": 0},
+            },
+        )
+
+    def _subscribe(self, handler, sid, metrics):
+        handler.assign_indices(sid, metrics)
+        for metric in metrics:
+            handler.subscriptions.setdefault(metric, set()).add(sid)
+
+    def _frames(self, mock_socketio):
+        frames = {}
         for call in mock_socketio.emit.call_args_list:
             args, kwargs = call
-            event = args[0]
-            payload = args[1]
-            room = kwargs.get("room")
+            assert args[0] == "metrics"
+            frames.setdefault(kwargs["to"], []).append(args[1])
+        return frames
 
-            assert event == "metric_update"
-            assert payload["metric"] == room
-            emitted_metrics.append(payload["metric"])
+    def test_broadcast_metrics(self, handler, mock_socketio):
+        self._subscribe(handler, "sid1", ["temp_outdoor", "power_total"])
+        self._subscribe(handler, "sid2", ["power_total"])
 
-        assert "temp_outdoor" in emitted_metrics
-        assert "power_total" in emitted_metrics
-        assert "unused_metric" not in emitted_metrics
+        data = {"temp_outdoor": 12.5, "power_total": 1500, "unused_metric": 0}
+
+        handler.broadcast_metrics(data, timestamp=100)
+
+        # One frame per client
+        assert mock_socketio.emit.call_count == 2
+        frames = self._frames(mock_socketio)
+        assert frames["sid1"] == [{"t": 100, "u": [0, 12.5, 1, 1500]}]
+        assert frames["sid2"] == [{"t": 100, "u": [0, 1500]}]
+
+    def test_only_changed_values_are_sent(self, handler, mock_socketio):
+        handler.max_rate = 0  # unlimited
+        self._subscribe(handler, "sid1", ["a", "b"])
+
+        handler.broadcast_metrics({"a": 1, "b": 2}, timestamp=100)
+        handler._on_ack("sid1", 1)
+        handler.broadcast_metrics({"a": 1, "b": 2}, timestamp=101)
+        handler.broadcast_metrics({"a": 1, "b": 3}, timestamp=102)
+
+        assert self._frames(mock_socketio)["sid1"] == [
+            {"t": 100, "u": [0, 1, 1, 2]},
+            {"t": 102, "u": [1, 3]},
+        ]
+
+    def test_slow_client_gets_coalesced_frame(self, handler, mock_socketio):
+        handler.max_rate = 0
+        self._subscribe(handler, "sid1", ["a", "b"])
+
+        handler.broadcast_metrics({"a": 1, "b": 1}, timestamp=100)
+        # Not acknowledged yet: values are coalesced
+        handler.broadcast_metrics({"a": 2, "b": 1}, timestamp=101)
+        handler.broadcast_metrics({"a": 3, "b": 2}, timestamp=102)
+        assert mock_socketio.emit.call_count == 1
+
+        # The acknowledgement callback sends the latest values
+        callback = mock_socketio.emit.call_args.kwargs["callback"]
+        callback()
+        assert self._frames(mock_socketio)["sid1"][1] == {"t": 102, "u": [0, 3, 1, 2]}
+        assert handler.get_stats()["frames_deferred"] == 2
+
+    def test_rate_limit_defers_frame(self, handler, mock_socketio):
+        handler.max_rate = 1
+        self._subscribe(handler, "sid1", ["a"])
+
+        handler.broadcast_metrics({"a": 1}, timestamp=100)
+        handler._on_ack("sid1", 1)
+        handler.broadcast_metrics({"a": 2}, timestamp=100)
+
+        assert mock_socketio.emit.call_count == 1
+        # Flushed by a background task once the rate limit allows
+        task, sid, delay = mock_socketio.start_background_task.call_args.args
+        assert sid == "sid1" and 0 < delay <= 1
+        handler.clients["sid1"].last_emit -= 1
+        task(sid, 0)
+        assert self._frames(mock_socketio)["sid1"][1] == {"t": 100, "u": [0, 2]}
+
+    def test_disconnect_removes_client(self, handler):
+        self._subscribe(handler, "sid1", ["a"])
+        handler._cleanup_subscriptions("sid1")
+        assert "sid1" not in handler.clients
+        assert "a" not in handler.subscriptions
+
+    def test_delayed_flush_is_started_once_outside_the_lock(
+        self, handler, mock_socketio
+    ):
+        handler.max_rate = 1
+        self._subscribe(handler, "sid1", ["a"])
+        lock_free = []
+
+        def probe():
+            acquired = handler._lock.acquire(timeout=0.1)
+            if acquired:
+                handler._lock.release()
+            lock_free.append(acquired)
+
+        def start_background_task(task, *args):
+            # Another thread must be able to take the lock meanwhile
+            thread = threading.Thread(target=probe)
+            thread.start()
+            thread.join()
+
+        mock_socketio.start_background_task.side_effect = start_background_task
+
+        handler.broadcast_metrics({"a": 1}, timestamp=100)
+        handler._on_ack("sid1", 1)
+        handler.broadcast_metrics({"a": 2}, timestamp=101)
+        handler.broadcast_metrics({"a": 3}, timestamp=102)
+
+        assert mock_socketio.start_background_task.call_count == 1
+        assert lock_free == [True]